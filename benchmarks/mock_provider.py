@@ -0,0 +1,84 @@
+import random
+import threading
+import time
+
+from typing import Union, List
+
+from translator.providers import Provider
+
+
+class ThrottledError(Exception):
+    status_code = 429
+
+
+class MockProvider(Provider):
+    """
+    Local provider that simulates a remote translation API without any network access.
+    Configure it through the class attributes (or MockProvider.configure) since engines instantiate providers
+    without arguments
+    """
+    latency: float = 0.05  # Seconds per request
+    latency_per_char: float = 0.0  # Extra seconds per character sent
+    error_rate: float = 0.0  # Probability that a request raises an error
+    max_requests_per_second: float = None  # Above this rate requests raise a 429 ThrottledError
+
+    # Shared between every instance, this is what the remote side would observe
+    stats = {"requests": 0, "chars": 0, "errors": 0, "throttled": 0}
+    _stats_lock = threading.Lock()
+    _window_start = time.monotonic()
+    _window_requests = 0
+
+    def __init__(self):
+        self.translator = self
+
+    @classmethod
+    def configure(cls, latency: float = 0.05, latency_per_char: float = 0.0, error_rate: float = 0.0,
+                  max_requests_per_second: float = None):
+        cls.latency = latency
+        cls.latency_per_char = latency_per_char
+        cls.error_rate = error_rate
+        cls.max_requests_per_second = max_requests_per_second
+        cls.reset_stats()
+
+    @classmethod
+    def reset_stats(cls):
+        with cls._stats_lock:
+            cls.stats = {"requests": 0, "chars": 0, "errors": 0, "throttled": 0}
+            cls._window_start = time.monotonic()
+            cls._window_requests = 0
+
+    @classmethod
+    def _is_throttled(cls) -> bool:
+        if not cls.max_requests_per_second:
+            return False
+        now = time.monotonic()
+        if now - cls._window_start >= 1:
+            cls._window_start = now
+            cls._window_requests = 0
+        cls._window_requests += 1
+        return cls._window_requests > cls.max_requests_per_second
+
+    def _do_translate(self, input_data: Union[str, List[str]],
+                      src: str, dest: str,
+                      fail_translation_code: str = "P1OP1_F",
+                      **kwargs) -> Union[str, List[str]]:
+        num_chars = len(input_data) if isinstance(input_data, str) else sum(len(text) for text in input_data)
+        with self._stats_lock:
+            MockProvider.stats["requests"] += 1
+            MockProvider.stats["chars"] += num_chars
+            throttled = self._is_throttled()
+            if throttled:
+                MockProvider.stats["throttled"] += 1
+
+        time.sleep(self.latency + self.latency_per_char * num_chars)
+
+        if throttled:
+            raise ThrottledError("429 Too Many Requests")
+        if random.random() < self.error_rate:
+            with self._stats_lock:
+                MockProvider.stats["errors"] += 1
+            raise ConnectionError("Simulated provider error")
+
+        if isinstance(input_data, list):
+            return [f"[{dest}] {text}" for text in input_data]
+        return f"[{dest}] {input_data}"
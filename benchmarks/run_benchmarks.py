@@ -0,0 +1,159 @@
+"""
+Throughput benchmarks against the local MockProvider, no API calls are made.
+
+    python -m benchmarks.run_benchmarks --examples 2000 --latency 0.05 --max-example-per-thread 100 400
+
+Every combination of dataset shape and max_example_per_thread is run through TranslateModule.convert and
+TranslateThread.translate_converted, reporting examples/sec, requests/sec, peak RSS and peak thread count
+"""
+import argparse
+import json
+import random
+import resource
+import string
+import sys
+import threading
+import time
+
+from copy import deepcopy
+from typing import List, Dict
+
+from translator import TranslateModule, TranslateThread
+
+from .mock_provider import MockProvider
+
+
+def random_text(num_chars: int) -> str:
+    words = []
+    length = 0
+    while length < num_chars:
+        word = "".join(random.choices(string.ascii_lowercase, k=random.randint(2, 9)))
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:num_chars]
+
+
+# shape name -> function building one example from its qas_id
+DATASET_SHAPES = {
+    "short": lambda qas_id: {"qas_id": qas_id, "instruction": random_text(40), "response": random_text(80)},
+    "long": lambda qas_id: {"qas_id": qas_id, "instruction": random_text(2000), "response": random_text(6000)},
+    "list": lambda qas_id: {"qas_id": qas_id, "instruction": random_text(60),
+                            "conversation": [random_text(200) for _ in range(8)]},
+    "large_list": lambda qas_id: {"qas_id": qas_id, "instruction": random_text(60),
+                                  "conversation": [random_text(300) for _ in range(200)]},
+}
+
+
+def make_dataset(shape: str, num_examples: int) -> List[Dict]:
+    return [DATASET_SHAPES[shape](qas_id) for qas_id in range(num_examples)]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux and bytes on macOS, it is the peak of the whole process so far
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+class ThreadCountSampler():
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, threading.active_count())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_one(entry_point: str, data: List[Dict], max_example_per_thread: int, large_chunks_threshold: int) -> Dict:
+    all_fields = list(data[0].keys())
+    target_fields = [key for key in all_fields if key != "qas_id"]
+    data = deepcopy(data)
+    MockProvider.reset_stats()
+
+    with ThreadCountSampler() as sampler:
+        start_time = time.perf_counter()
+        if entry_point == "convert":
+            module = TranslateModule(provider=MockProvider)
+            result = module.convert(data, all_fields, target_fields, target_lang="vi",
+                                    max_example_per_thread=max_example_per_thread,
+                                    large_chunks_threshold=large_chunks_threshold)
+        else:
+            thread = TranslateThread(all_fields=all_fields, target_fields=target_fields, target_lang="vi",
+                                     max_example_per_thread=max_example_per_thread,
+                                     large_chunks_threshold=large_chunks_threshold,
+                                     translator=MockProvider)
+            thread.translate_converted(converted_data=data)
+            result = thread.converted_data_translated
+        elapsed = time.perf_counter() - start_time
+
+    return {"entry_point": entry_point,
+            "num_examples": len(data),
+            "num_translated": len(result),
+            "max_example_per_thread": max_example_per_thread,
+            "large_chunks_threshold": large_chunks_threshold,
+            "seconds": round(elapsed, 3),
+            "examples_per_sec": round(len(data) / elapsed, 2),
+            "requests_per_sec": round(MockProvider.stats["requests"] / elapsed, 2),
+            "requests": MockProvider.stats["requests"],
+            "chars": MockProvider.stats["chars"],
+            "errors": MockProvider.stats["errors"],
+            "throttled": MockProvider.stats["throttled"],
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "peak_threads": sampler.peak}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shapes", nargs="+", default=list(DATASET_SHAPES), choices=list(DATASET_SHAPES))
+    parser.add_argument("--examples", type=int, default=2000)
+    parser.add_argument("--entry-points", nargs="+", default=["convert", "translate_converted"],
+                        choices=["convert", "translate_converted"])
+    parser.add_argument("--max-example-per-thread", type=int, nargs="+", default=[400])
+    parser.add_argument("--large-chunks-threshold", type=int, default=20000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--latency-per-char", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--max-requests-per-second", type=float, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per run instead of a table")
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    MockProvider.configure(latency=args.latency, latency_per_char=args.latency_per_char,
+                           error_rate=args.error_rate, max_requests_per_second=args.max_requests_per_second)
+
+    results = []
+    for shape in args.shapes:
+        data = make_dataset(shape, args.examples)
+        for max_example_per_thread in args.max_example_per_thread:
+            for entry_point in args.entry_points:
+                result = run_one(entry_point, data, max_example_per_thread, args.large_chunks_threshold)
+                result["shape"] = shape
+                results.append(result)
+
+    if args.json:
+        for result in results:
+            print(json.dumps(result))
+        return results
+
+    columns = ["shape", "entry_point", "max_example_per_thread", "seconds", "examples_per_sec",
+               "requests_per_sec", "requests", "peak_rss_mb", "peak_threads"]
+    print("\n" + " | ".join(columns))
+    for result in results:
+        print(" | ".join(str(result[column]) for column in columns))
+    return results
+
+
+if __name__ == "__main__":
+    main()
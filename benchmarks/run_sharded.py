@@ -0,0 +1,80 @@
+"""
+Sharded run with several local worker processes against the local MockProvider, no API calls are made.
+
+    python -m benchmarks.run_sharded --workers 4 --shards 16 --examples 4000 --kill-one
+
+Every worker calls TranslateModule.convert_sharded on the same dataset and claims shards through leases in a
+temporary directory. With --kill-one the first worker is killed while it holds a lease, its shard is reclaimed by
+another worker once the lease expires. The shards are merged at the end and checked against the input
+"""
+import argparse
+import multiprocessing
+import random
+import shutil
+import tempfile
+import time
+
+from translator import TranslateModule, merge_shards
+
+from .mock_provider import MockProvider
+from .run_benchmarks import DATASET_SHAPES, make_dataset
+
+
+def worker(work_dir: str, args) -> None:
+    random.seed(args.seed)
+    data = make_dataset(args.shape, args.examples)
+    all_fields = list(data[0].keys())
+    target_fields = [key for key in all_fields if key != "qas_id"]
+    MockProvider.configure(latency=args.latency)
+
+    module = TranslateModule(provider=MockProvider)
+    module.convert_sharded(data, all_fields, target_fields, work_dir, args.shards,
+                           shard_by=args.shard_by,
+                           lease_timeout=args.lease_timeout,
+                           poll_interval=args.lease_timeout / 4,
+                           target_lang="vi",
+                           max_example_per_thread=args.max_example_per_thread)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--shard-by", default="hash", choices=["hash", "range"])
+    parser.add_argument("--shape", default="short", choices=list(DATASET_SHAPES))
+    parser.add_argument("--examples", type=int, default=4000)
+    parser.add_argument("--max-example-per-thread", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--lease-timeout", type=float, default=4.0)
+    parser.add_argument("--kill-one", action="store_true", help="Kill the first worker while it holds a lease")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="sharded-")
+    context = multiprocessing.get_context("spawn")
+    try:
+        start_time = time.perf_counter()
+        processes = [context.Process(target=worker, args=(work_dir, args)) for _ in range(args.workers)]
+        for process in processes:
+            process.start()
+        if args.kill_one:
+            time.sleep(min(args.lease_timeout, 3.0))
+            processes[0].kill()
+            print(f"Killed worker {processes[0].pid}")
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start_time
+
+        merged = merge_shards(work_dir, args.shards, sort_by_qas_id=True)
+        qas_ids = [example["qas_id"] for example in merged["data"]]
+        assert qas_ids == sorted(set(qas_ids)), "A shard was merged twice"
+        print(f"{len(qas_ids)}/{args.examples} examples translated by {args.workers} workers"
+              f" in {elapsed:.2f}s ({len(qas_ids) / elapsed:.1f} examples/sec),"
+              f" {len(merged['fail_idx'])} failed")
+        return merged
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
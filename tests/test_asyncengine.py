@@ -0,0 +1,46 @@
+from benchmarks.mock_provider import MockProvider
+from translator import AsyncTranslateEngine, TranslateModule
+
+
+def make_data(num_examples):
+    return [{"qas_id": idx, "question": f"Question {idx}.", "answers": [f"Answer {idx}.", ""]}
+            for idx in range(num_examples)]
+
+
+def make_engine(**kwargs):
+    return AsyncTranslateEngine(all_fields=["qas_id", "question", "answers"], target_fields=["question", "answers"],
+                                translator=MockProvider, target_lang="vi", **kwargs)
+
+
+def test_output_keeps_the_input_order():
+    MockProvider.configure(latency=0.001)
+    engine = make_engine(max_concurrency=8, num_providers=2)
+
+    engine.translate_converted(converted_data=make_data(50))
+
+    result = engine.converted_data_translated
+    assert [example["qas_id"] for example in result] == list(range(50))
+    assert result[7] == {"qas_id": 7, "question": "[vi] Question 7.", "answers": ["[vi] Answer 7.", ""]}
+    assert engine.failed_examples == []
+
+
+def test_plan_requests_are_bounded_by_max_concurrency_only():
+    engine = make_engine(max_concurrency=16, num_providers=2)
+
+    plan = engine.plan_requests(make_data(3))
+
+    # The instances are shared round-robin, num_providers does not bound the requests in flight
+    assert plan["max_in_flight"] == 16
+    # One request per example, the empty answer is not sent
+    assert plan["requests"] == [len("Question 0.") + len("Answer 0.")] * 3
+
+
+def test_async_plan_projects_the_schedule_at_max_concurrency():
+    MockProvider.configure(latency=0.0)
+    plan = TranslateModule(provider=MockProvider).plan(make_data(64), ["qas_id", "question", "answers"],
+                                                       ["question", "answers"], use_async=True,
+                                                       max_concurrency=64, request_latency=1.0)
+
+    # 64 requests on 64 slots take a single round
+    assert plan["max_in_flight"] == 64
+    assert plan["schedule_seconds"] == 1.0
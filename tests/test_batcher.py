@@ -0,0 +1,66 @@
+import pytest
+
+from translator.batcher import RequestBatcher
+
+
+def test_batches_respect_the_char_budget():
+    batcher = RequestBatcher(max_batch_chars=10, max_batch_items=100)
+    example = {"text": ["aaaa", "bbbb", "cc", "dddddd", "e"]}
+    batcher.add_example(example, ["text"])
+
+    assert list(batcher.batches()) == [[0, 1, 2], [3, 4]]
+
+
+def test_batches_respect_the_item_budget():
+    batcher = RequestBatcher(max_batch_chars=1000, max_batch_items=2)
+    batcher.add_example({"text": ["a", "b", "c", "d", "e"]}, ["text"])
+
+    assert list(batcher.batches()) == [[0, 1], [2, 3], [4]]
+
+
+def test_a_string_over_the_budget_is_sent_on_its_own():
+    batcher = RequestBatcher(max_batch_chars=10, max_batch_items=100)
+    batcher.add_example({"text": ["abc", "x" * 50, "def"]}, ["text"])
+
+    assert list(batcher.batches()) == [[0], [1], [2]]
+
+
+def test_strings_of_many_examples_and_fields_share_batches():
+    examples = [{"question": f"q{idx}", "answers": [f"a{idx}", f"b{idx}"], "source": "keep"} for idx in range(3)]
+    batcher = RequestBatcher(max_batch_chars=1000, max_batch_items=100)
+    for example in examples:
+        batcher.add_example(example, ["question", "answers"])
+
+    assert len(batcher) == 9
+    assert list(batcher.batches()) == [list(range(9))]
+
+
+def test_scatter_writes_back_into_str_and_list_fields():
+    examples = [{"question": "q0", "answers": ["a0", "", "c0"], "source": "keep"},
+                {"question": "", "answers": ["a1"], "source": "keep"}]
+    batcher = RequestBatcher()
+    for example in examples:
+        batcher.add_example(example, ["question", "answers"])
+
+    # Empty strings are not sent
+    assert batcher.texts == ["q0", "a0", "c0", "a1"]
+    batcher.scatter([text.upper() for text in batcher.texts])
+
+    assert examples == [{"question": "Q0", "answers": ["A0", "", "C0"], "source": "keep"},
+                        {"question": "", "answers": ["A1"], "source": "keep"}]
+
+
+def test_whitespace_only_strings_are_kept():
+    example = {"question": "   ", "answers": ["\n", "ok"]}
+    batcher = RequestBatcher()
+    batcher.add_example(example, ["question", "answers"])
+    batcher.scatter([text.upper() for text in batcher.texts])
+
+    assert example == {"question": "   ", "answers": ["\n", "OK"]}
+
+
+def test_scatter_needs_one_translation_per_string():
+    batcher = RequestBatcher()
+    batcher.add_example({"text": ["a", "b"]}, ["text"])
+    with pytest.raises(AssertionError):
+        batcher.scatter(["A"])
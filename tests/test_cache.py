@@ -0,0 +1,60 @@
+from translator.cache import TranslationCache
+
+
+def test_hits_and_misses_are_counted(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.sqlite"))
+    cache.set_many("Google", "en", "vi", ["hello", "world"], ["xin chào", "thế giới"])
+
+    assert cache.get_many("Google", "en", "vi", ["hello", "missing", "world"]) == ["xin chào", None, "thế giới"]
+    assert cache.stats["hits"] == 2
+    assert cache.stats["misses"] == 1
+    cache.close()
+
+
+def test_keys_depend_on_provider_and_languages(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.sqlite"))
+    cache.set("Google", "en", "vi", "hello", "xin chào")
+
+    assert cache.get("Google", "en", "fr", "hello") is None
+    assert cache.get("Bing", "en", "vi", "hello") is None
+    # The text is normalized (NFC, stripped) before hashing
+    assert cache.get("Google", "en", "vi", "  hello\n") == "xin chào"
+    cache.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.sqlite"), max_size_bytes=30, evict_ratio=1.0)
+    cache.set("Google", "en", "vi", "a", "x" * 10)
+    cache.set("Google", "en", "vi", "b", "x" * 10)
+    # Reading "a" makes "b" the least recently used entry
+    assert cache.get("Google", "en", "vi", "a") is not None
+    cache.set("Google", "en", "vi", "c", "x" * 10)
+    cache.set("Google", "en", "vi", "d", "x" * 10)
+
+    assert cache.get("Google", "en", "vi", "b") is None
+    assert cache.get("Google", "en", "vi", "a") is not None
+    assert cache.get("Google", "en", "vi", "d") is not None
+    assert cache.stats["size_bytes"] <= 30
+    cache.close()
+
+
+def test_overwriting_an_entry_does_not_grow_the_size(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.sqlite"))
+    cache.set("Google", "en", "vi", "a", "x" * 10)
+    cache.set("Google", "en", "vi", "a", "y" * 4)
+
+    assert cache.stats["size_bytes"] == 4
+    assert cache.get("Google", "en", "vi", "a") == "y" * 4
+    cache.close()
+
+
+def test_size_is_restored_when_reopened(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = TranslationCache(path)
+    cache.set_many("Google", "en", "vi", ["a", "b"], ["x" * 3, "y" * 5])
+    cache.close()
+
+    reopened = TranslationCache(path)
+    assert reopened.stats["size_bytes"] == 8
+    assert reopened.get("Google", "en", "vi", "b") == "y" * 5
+    reopened.close()
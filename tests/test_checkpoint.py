@@ -0,0 +1,44 @@
+import json
+
+from translator.checkpoint import CheckpointJournal
+
+
+def test_append_and_load(tmp_path):
+    journal = CheckpointJournal(str(tmp_path / "journal.jsonl"))
+    journal.append([{"qas_id": 0, "text": "a"}, {"qas_id": 1, "text": "b"}])
+    journal.append([{"qas_id": 2, "text": "c"}])
+
+    assert journal.completed_ids() == {0, 1, 2}
+    assert journal.load()[1] == {"qas_id": 1, "text": "b"}
+
+
+def test_resume_drops_a_torn_trailing_line(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    complete = "".join(json.dumps({"qas_id": idx, "text": "done"}) + "\n" for idx in range(3))
+    # A crash in the middle of a write leaves a partial last line
+    path.write_text(complete + '{"qas_id": 3, "te', encoding="utf-8")
+
+    journal = CheckpointJournal(str(path))
+    assert path.read_text(encoding="utf-8") == complete
+    assert journal.completed_ids() == {0, 1, 2}
+
+    # The next append starts on a line of its own instead of being glued to the torn one
+    journal.append([{"qas_id": 3, "text": "done"}])
+    assert journal.completed_ids() == {0, 1, 2, 3}
+
+
+def test_resume_from_a_single_torn_line(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    path.write_text('{"qas_id": 0, "te', encoding="utf-8")
+
+    journal = CheckpointJournal(str(path))
+    assert path.read_text(encoding="utf-8") == ""
+    assert journal.load() == {}
+
+
+def test_reset_clears_the_journal(tmp_path):
+    journal = CheckpointJournal(str(tmp_path / "journal.jsonl"))
+    journal.append([{"qas_id": 0}])
+    journal.reset()
+
+    assert journal.load() == {}
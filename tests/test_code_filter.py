@@ -0,0 +1,71 @@
+import random
+import re
+
+import pytest
+
+from translator.filters import have_code
+from translator.filters.code_filter import code_likelihood_score, CODE_LIKELIHOOD_ELEMENTS
+
+
+def reference_score(text):
+    # The implementation before the single-pass matcher: one finditer scan per element
+    text = text.lower()
+    found_elements = []
+    for element in CODE_LIKELIHOOD_ELEMENTS:
+        element = element.lower()
+        found_elements.extend(match.group() for match in re.finditer(rf'\b{re.escape(element)}\b', text))
+    return len(found_elements), found_elements
+
+
+CORPUS = [
+    "",
+    "The weather is nice today, let us go for a walk.",
+    "def main():\n    for i in range(10):\n        print(i)  # comment\n    return None",
+    "#include <stdio.h>\nint main() { printf(\"Hello, world!\"); return 0; }",
+    "public class Foo extends Bar implements Baz { private static final int x = 1; }",
+    "<html><body><ul><li>item</li></ul></body></html>",
+    "SELECT name FROM table GROUP BY name UNION SELECT 1;",
+    "module.exports = require('x'); console.log(a[0]); const f = async () => await g();",
+    "Console.WriteLine(\"C# code\"); python code: import re; regex in Ruby, ABC ABC",
+    "<</ </text></source> <source><text> // /// #### ``` ```` () ()) [[]] {{}} ;;",
+    "c c# c++ js.js java/javascript php_asm _c c_ 1c c1 café c",
+    "Điều này không phải code, nhưng có từ class và import trong câu.",
+    "x<y>z a<b c>d <li>< li> </ html> </html",
+    "self.super = lambda: None; raise ValueError; try: pass; finally: pass",
+]
+
+FRAGMENTS = sorted(set(element.lower() for element in CODE_LIKELIHOOD_ELEMENTS)) + \
+    [" ", "  ", "\n", "a", "_", "x1", "é", ".", "/", "<", ">", "#", "`", "(", ")", ";", "ABC", "C#"]
+
+
+def random_corpus(size=2000, seed=0):
+    rng = random.Random(seed)
+    return ["".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 40))) for _ in range(size)]
+
+
+@pytest.mark.parametrize("text", CORPUS)
+def test_score_matches_the_per_element_implementation(text):
+    assert code_likelihood_score(text) == reference_score(text)
+
+
+def test_score_matches_the_per_element_implementation_on_random_text():
+    for text in random_corpus():
+        assert code_likelihood_score(text) == reference_score(text), text
+
+
+def test_early_exit_gives_the_same_decision():
+    for text in CORPUS + random_corpus(size=500, seed=1):
+        for value in (text, [text, text[::-1]]):
+            assert have_code(value, early_exit=True)[0] == have_code(value)[0]
+
+
+def test_have_code_threshold():
+    code = CORPUS[4]
+    score = have_code(code)[1]
+
+    assert have_code(code, threshold=score)[0]
+    assert not have_code(code, threshold=score + 1)[0]
+    assert not have_code(CORPUS[1])[0]
+    # A list needs twice the score of a single string
+    assert not have_code([code], threshold=score)[0]
+    assert have_code([code, code], threshold=score)[0]
@@ -0,0 +1,87 @@
+import pytest
+
+from translator.filters import dedup_examples, example_fingerprint, fan_out
+
+
+def make_example(qas_id, question, answer="Some answer."):
+    return {"qas_id": qas_id, "question": question, "answers": [answer], "source": f"row-{qas_id}"}
+
+
+def test_fingerprint_ignores_whitespace_and_normalization():
+    a = make_example(0, "What is  the capital of\nFrance?")
+    b = make_example(1, "  What is the capital of France?  ")
+    c = make_example(2, "What is the capital of Spain?")
+
+    assert example_fingerprint(a, ["question", "answers"]) == example_fingerprint(b, ["question", "answers"])
+    assert example_fingerprint(a, ["question", "answers"]) != example_fingerprint(c, ["question", "answers"])
+
+
+def test_exact_dedup_keeps_the_first_example_of_each_group():
+    data = [make_example(0, "Hello there."),
+            make_example(1, "Something else."),
+            make_example(2, "Hello   there."),
+            make_example(3, "Hello there.", answer="A different answer.")]
+
+    representatives, representative_of = dedup_examples(data, ["question", "answers"])
+
+    assert [example["qas_id"] for example in representatives] == [0, 1, 3]
+    assert representative_of == {2: 0}
+
+
+def test_near_dedup_groups_almost_identical_examples():
+    pytest.importorskip("numpy")
+    base = ("Write a short story about a robot who learns to paint landscapes in the mountains and sells its "
+            "paintings at the village market every Sunday morning to the tourists passing by.")
+    data = [make_example(0, base),
+            make_example(1, base.replace("Sunday", "Saturday")),
+            make_example(2, "Explain how photosynthesis converts light energy into chemical energy in plants, "
+                            "and describe the role of chlorophyll and the Calvin cycle in the process.")]
+
+    exact, exact_of = dedup_examples(data, ["question"])
+    near, near_of = dedup_examples(data, ["question"], near_dedup=True, threshold=0.7)
+
+    assert len(exact) == 3 and exact_of == {}
+    assert [example["qas_id"] for example in near] == [0, 2]
+    assert near_of == {1: 0}
+
+
+def test_fan_out_copies_the_translation_to_every_member():
+    data = [make_example(0, "Hello there."), make_example(1, "Other."), make_example(2, "Hello there.")]
+    representatives, representative_of = dedup_examples(data, ["question", "answers"])
+    translated = [dict(example, question=f"[vi] {example['question']}", answers=["[vi] answer"])
+                  for example in representatives]
+
+    result = fan_out(translated, data, representative_of, ["question", "answers"])
+
+    assert [example["qas_id"] for example in result] == [0, 1, 2]
+    assert result[2]["question"] == "[vi] Hello there."
+    # Members keep their own non-target fields
+    assert result[2]["source"] == "row-2"
+    # A member gets its own copy of a list field
+    result[2]["answers"].append("edited")
+    assert result[0]["answers"] == ["[vi] answer"]
+
+
+def test_fan_out_skips_members_of_failed_representatives():
+    data = [make_example(0, "Hello there."), make_example(1, "Hello there.")]
+    _, representative_of = dedup_examples(data, ["question", "answers"])
+
+    assert fan_out([], data, representative_of, ["question", "answers"]) == []
+
+
+def test_convert_translates_each_group_once():
+    from benchmarks.mock_provider import MockProvider
+    from translator import TranslateModule
+
+    MockProvider.configure(latency=0.0)
+    data = [make_example(idx, f"Question number {idx % 3}.") for idx in range(9)]
+    module = TranslateModule(provider=MockProvider)
+    result = module.convert(data, ["qas_id", "question", "answers", "source"], ["question", "answers"],
+                            target_lang="vi", dedup=True, enable_batching=False)
+
+    assert [example["qas_id"] for example in result] == list(range(9))
+    assert sorted(module.duplicate_idx) == [3, 4, 5, 6, 7, 8]
+    # One request per target field of each of the 3 representatives
+    assert MockProvider.stats["requests"] == 6
+    assert result[4]["question"] == result[1]["question"]
+    assert result[4]["source"] == "row-4"
@@ -0,0 +1,88 @@
+import os
+import time
+
+from translator.distributed import LeaseCoordinator
+
+
+def age(path, seconds):
+    # Move the mtime back instead of sleeping past the lease timeout
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_a_live_lease_is_not_claimed_twice(tmp_path):
+    worker_a = LeaseCoordinator(str(tmp_path), num_shards=1, lease_timeout=60, worker_id="a")
+    worker_b = LeaseCoordinator(str(tmp_path), num_shards=1, lease_timeout=60, worker_id="b")
+
+    assert worker_a.claim() == 0
+    assert worker_b.claim() is None
+    assert worker_a._lease_owner(0) == "a"
+
+
+def test_an_expired_lease_is_reclaimed(tmp_path):
+    worker_a = LeaseCoordinator(str(tmp_path), num_shards=2, lease_timeout=60, worker_id="a")
+    worker_b = LeaseCoordinator(str(tmp_path), num_shards=2, lease_timeout=60, worker_id="b")
+    assert worker_a.claim() == 0
+    assert worker_b.claim() == 1
+
+    # Worker a dies, its lease stops being renewed
+    age(worker_a.shard_path(0, ".lease"), 120)
+    worker_b.complete(1)
+
+    assert worker_b.claim() == 0
+    assert worker_b._lease_owner(0) == "b"
+    # The renamed lease is cleaned up
+    assert sorted(os.listdir(tmp_path)) == ["shard-00000.lease", "shard-00001.done"]
+
+
+def test_renew_fails_after_the_lease_is_lost(tmp_path):
+    worker_a = LeaseCoordinator(str(tmp_path), num_shards=1, lease_timeout=60, worker_id="a")
+    worker_b = LeaseCoordinator(str(tmp_path), num_shards=1, lease_timeout=60, worker_id="b")
+    assert worker_a.claim() == 0
+    assert worker_a.renew(0)
+
+    age(worker_a.shard_path(0, ".lease"), 120)
+    assert worker_b.claim() == 0
+
+    assert not worker_a.renew(0)
+    # Releasing a lost lease leaves the new owner's lease alone
+    worker_a.release(0)
+    assert worker_b._lease_owner(0) == "b"
+
+
+def test_renew_keeps_the_lease_alive(tmp_path):
+    worker_a = LeaseCoordinator(str(tmp_path), num_shards=1, lease_timeout=60, worker_id="a")
+    worker_b = LeaseCoordinator(str(tmp_path), num_shards=1, lease_timeout=60, worker_id="b")
+    assert worker_a.claim() == 0
+
+    age(worker_a.shard_path(0, ".lease"), 120)
+    assert worker_a.renew(0)
+
+    assert worker_b.claim() is None
+
+
+def test_a_fresh_lease_taken_by_a_late_rename_is_restored(tmp_path):
+    worker_b = LeaseCoordinator(str(tmp_path), num_shards=1, lease_timeout=60, worker_id="b")
+    worker_c = LeaseCoordinator(str(tmp_path), num_shards=1, lease_timeout=60, worker_id="c")
+    lease_path = worker_c.shard_path(0, ".lease")
+    assert worker_c.claim() == 0
+
+    # Worker b saw the previous, expired lease and renames away the fresh lease of worker c
+    worker_b._is_expired = lambda path: path == lease_path or LeaseCoordinator._is_expired(worker_b, path)
+    assert not worker_b._reclaim_if_expired(0)
+
+    assert worker_c._lease_owner(0) == "c"
+    assert worker_c.renew(0)
+    assert os.listdir(tmp_path) == ["shard-00000.lease"]
+
+
+def test_completed_shards_are_not_pending(tmp_path):
+    worker = LeaseCoordinator(str(tmp_path), num_shards=3, lease_timeout=60, worker_id="a")
+    claimed = [worker.claim() for _ in range(3)]
+    for shard_id in claimed:
+        worker.complete(shard_id)
+
+    assert claimed == [0, 1, 2]
+    assert worker.pending() == []
+    assert worker.claim() is None
+    assert not any(name.endswith(".lease") for name in os.listdir(tmp_path))
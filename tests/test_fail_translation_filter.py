@@ -0,0 +1,59 @@
+import pytest
+
+from translator.filters import have_re_code, fail_translation_mask
+
+pa = pytest.importorskip("pyarrow")
+
+ROWS = [
+    {"qas_id": 0, "question": "Fine", "answers": ["fine", "also fine"]},
+    {"qas_id": 1, "question": "Broken P1OP1_F here", "answers": ["fine"]},
+    {"qas_id": 2, "question": "Fine", "answers": ["fine", "P1OP1_F"]},
+    {"qas_id": 3, "question": None, "answers": []},
+    {"qas_id": 4, "question": "Fine", "answers": None},
+    {"qas_id": 5, "question": "Fine", "answers": [None, "xxP1OP1_Fxx"]},
+]
+
+
+def test_have_re_code():
+    assert have_re_code("a P1OP1_F b")
+    assert have_re_code(["a", "P1OP1_F"])
+    assert not have_re_code(["a", "b"])
+    assert have_re_code("a CODE", code="CODE")
+
+
+def test_mask_over_string_and_list_columns():
+    table = pa.Table.from_pylist(ROWS)
+
+    mask = fail_translation_mask(table, ["question", "answers"])
+
+    assert mask.tolist() == [False, True, True, False, False, True]
+    assert fail_translation_mask(table, ["question"]).tolist() == [False, True, False, False, False, False]
+
+
+def test_mask_of_chunked_columns_uses_global_row_indices():
+    table = pa.concat_tables([pa.Table.from_pylist(ROWS[:3]), pa.Table.from_pylist(ROWS[3:])])
+    assert table.column("answers").num_chunks == 2
+
+    assert fail_translation_mask(table, ["answers"]).tolist() == [False, False, True, False, False, True]
+
+
+def test_mask_matches_have_re_code():
+    rows = [{"qas_id": idx, "text": f"row {idx}" + (" P1OP1_F" if idx % 7 == 0 else ""),
+             "turns": [f"turn {idx}", "P1OP1_F" if idx % 5 == 0 else "ok"]} for idx in range(100)]
+    table = pa.Table.from_pylist(rows)
+
+    expected = [have_re_code(row["text"]) or have_re_code(row["turns"]) for row in rows]
+    assert fail_translation_mask(table, ["text", "turns"]).tolist() == expected
+
+
+def test_post_translate_validate_columnar_drops_the_failed_rows():
+    from benchmarks.mock_provider import MockProvider
+    from translator import TranslateModule
+
+    module = TranslateModule(provider=MockProvider)
+    table = pa.Table.from_pylist(ROWS)
+
+    validated = module.post_translate_validate_columnar(table, ["question", "answers"])
+
+    assert validated.column("qas_id").to_pylist() == [0, 3, 4]
+    assert module.fail_idx == [1, 2, 5]
@@ -0,0 +1,157 @@
+import random
+import threading
+import time
+
+from benchmarks.mock_provider import MockProvider
+from translator import TranslateThread
+
+
+class JitterProvider(MockProvider):
+    # Random latency so chunks finish out of order, a request carrying "poison" always fails and so do the first
+    # failures_left requests
+    thread_names = set()
+    failures_left = 0
+    _names_lock = threading.Lock()
+
+    def _do_translate(self, input_data, src, dest, fail_translation_code="P1OP1_F", **kwargs):
+        with JitterProvider._names_lock:
+            JitterProvider.thread_names.add(threading.current_thread().name)
+            fail = JitterProvider.failures_left > 0
+            JitterProvider.failures_left -= fail
+        time.sleep(random.uniform(0, 0.005))
+        texts = [input_data] if isinstance(input_data, str) else input_data
+        if fail or any("poison" in text for text in texts):
+            with self._stats_lock:
+                MockProvider.stats["requests"] += 1
+            raise ConnectionError("Simulated provider error")
+        return super()._do_translate(input_data, src, dest, fail_translation_code, **kwargs)
+
+
+def make_data(num_examples, poison_idx=()):
+    return [{"qas_id": idx,
+             "question": f"Question {idx}." + (" poison" if idx in poison_idx else ""),
+             "answers": [f"Answer {idx}.", "x" * (idx % 7 * 20)]} for idx in range(num_examples)]
+
+
+def make_thread(**kwargs):
+    kwargs.setdefault("max_example_per_thread", 5)
+    kwargs.setdefault("large_chunks_threshold", 40)
+    return TranslateThread(all_fields=["qas_id", "question", "answers"], target_fields=["question", "answers"],
+                           translator=JitterProvider, target_lang="vi", **kwargs)
+
+
+def test_output_keeps_the_input_order():
+    MockProvider.configure(latency=0.0)
+    thread = make_thread()
+    data = make_data(97)
+
+    thread.translate_converted(converted_data=data)
+
+    result = thread.converted_data_translated
+    assert [example["qas_id"] for example in result] == list(range(97))
+    assert all(example["question"] == f"[vi] Question {example['qas_id']}." for example in result)
+    assert thread.failed_examples == []
+
+
+def test_failing_chunks_go_to_the_dead_letter_list():
+    MockProvider.configure(latency=0.0)
+    thread = make_thread(max_retries=2)
+    data = make_data(60, poison_idx={13})
+
+    thread.translate_converted(converted_data=data)
+
+    translated_ids = [example["qas_id"] for example in thread.converted_data_translated]
+    failed_ids = [example["qas_id"] for example in thread.failed_examples]
+    assert 13 in failed_ids and len(failed_ids) <= 5
+    assert translated_ids == sorted(set(range(60)) - set(failed_ids))
+    # The dead-letter examples keep their source text
+    assert all(not example["question"].startswith("[vi]") for example in thread.failed_examples)
+
+
+def test_transient_errors_are_retried():
+    MockProvider.configure(latency=0.0, error_rate=0.2)
+    thread = make_thread(max_retries=5)
+    data = make_data(80)
+
+    thread.translate_converted(converted_data=data)
+    MockProvider.configure(latency=0.0)
+
+    result = thread.converted_data_translated
+    failed_ids = {example["qas_id"] for example in thread.failed_examples}
+    assert [example["qas_id"] for example in result] == sorted(set(range(80)) - failed_ids)
+    # A retried chunk starts again from the source texts
+    assert all(example["question"] == f"[vi] Question {example['qas_id']}." for example in result)
+
+
+def test_large_lists_are_translated_in_order_on_the_shared_sub_task_pool():
+    MockProvider.configure(latency=0.0)
+    JitterProvider.thread_names = set()
+    thread = make_thread(max_batch_items=4, sub_task_items_threshold=10, max_sub_task_threads=3)
+    data = [{"qas_id": idx, "question": f"Question {idx}.", "answers": [f"Turn {idx}-{turn}." for turn in range(30)]}
+            for idx in range(2)]
+
+    thread.translate_converted(converted_data=data)
+    sub_task_executor = thread.sub_task_executor
+    thread.close()
+
+    result = thread.converted_data_translated
+    assert [example["answers"] for example in result] == \
+        [[f"[vi] Turn {idx}-{turn}." for turn in range(30)] for idx in range(2)]
+    sub_task_threads = {name for name in JitterProvider.thread_names if name.startswith("sub_task")}
+    # Both large lists used the same bounded pool
+    assert 0 < len(sub_task_threads) <= 3
+    assert sub_task_executor._max_workers == 3
+    # Each list is split into sub-lists of at most max_batch_items strings
+    assert MockProvider.stats["requests"] >= 2 * 30 / 4
+
+
+def test_the_provider_pool_covers_every_thread_by_default():
+    thread = make_thread(max_sub_task_threads=3)
+    bounded = make_thread(num_providers=2)
+
+    # 40 // 5 chunk threads and 3 sub-task threads can each hold a lease
+    assert thread.provider_pool.max_size == 8 + 3
+    assert bounded.provider_pool.max_size == 2
+
+
+def test_retried_examples_are_translated_once_without_batching():
+    MockProvider.configure(latency=0.0, error_rate=0.15)
+    thread = make_thread(enable_batching=False, max_example_per_thread=1, max_retries=10)
+    data = make_data(60)
+
+    thread.translate_converted(converted_data=data)
+    MockProvider.configure(latency=0.0)
+
+    result = thread.converted_data_translated
+    assert [example["qas_id"] for example in result] == list(range(60))
+    assert all(example["question"] == f"[vi] Question {example['qas_id']}." for example in result)
+    assert all(example["answers"][0] == f"[vi] Answer {example['qas_id']}." for example in result)
+
+
+def test_a_single_chunk_is_retried():
+    MockProvider.configure(latency=0.0)
+    JitterProvider.failures_left = 1
+    thread = make_thread()
+
+    thread.translate_converted(converted_data=make_data(3))
+
+    assert [example["question"] for example in thread.converted_data_translated] == \
+        [f"[vi] Question {idx}." for idx in range(3)]
+    assert thread.failed_examples == []
+    assert MockProvider.stats["requests"] == 2
+
+
+def test_the_chunk_log_reports_the_range_of_chunk_sizes(capsys):
+    MockProvider.configure(latency=0.0)
+    thread = make_thread()
+    # A few heavy examples make the balanced chunks differ in example count
+    data = make_data(60)
+    for example in data[:3]:
+        example["question"] = "Long question. " * 100
+
+    thread.translate_converted(converted_data=data)
+
+    chunk_sizes = sorted(len(indices) for indices in thread._TranslateThread__chunk_plan(data)[0])
+    assert chunk_sizes[0] < chunk_sizes[-1]
+    assert f"of {chunk_sizes[0]} to {chunk_sizes[-1]} examples (mean {60 / len(chunk_sizes):.1f})" \
+        in capsys.readouterr().out
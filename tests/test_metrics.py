@@ -0,0 +1,80 @@
+import json
+import urllib.request
+
+from translator.utils.metrics import MetricsRegistry
+
+
+def test_counters_gauges_and_histograms_are_labelled():
+    registry = MetricsRegistry()
+    registry.inc("requests_total", provider="Google")
+    registry.inc("requests_total", 2, provider="Google")
+    registry.inc("requests_total", provider="Bing")
+    registry.set_gauge("in_flight", 3)
+    registry.set_gauge("in_flight", 5)
+    registry.set_buckets("batch_items", (1, 10))
+    for value in (1, 5, 50):
+        registry.observe("batch_items", value)
+
+    snapshot = json.loads(registry.to_json())
+
+    assert snapshot["counters"]["requests_total"] == [{"labels": {"provider": "Bing"}, "value": 1},
+                                                      {"labels": {"provider": "Google"}, "value": 3}]
+    assert snapshot["gauges"]["in_flight"] == [{"labels": {}, "value": 5}]
+    histogram = snapshot["histograms"]["batch_items"][0]["value"]
+    assert histogram == {"count": 3, "sum": 56, "buckets": {"1": 1, "10": 2, "+Inf": 3}}
+
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry(namespace="test")
+    registry.inc("requests_total", provider="Google")
+    registry.set_buckets("latency_seconds", (0.5,))
+    registry.observe("latency_seconds", 0.25, provider="Google")
+
+    lines = registry.to_prometheus().splitlines()
+
+    assert lines == ["# TYPE test_requests_total counter",
+                     'test_requests_total{provider="Google"} 1',
+                     "# TYPE test_latency_seconds histogram",
+                     'test_latency_seconds_bucket{provider="Google",le="0.5"} 1',
+                     'test_latency_seconds_bucket{provider="Google",le="+Inf"} 1',
+                     'test_latency_seconds_sum{provider="Google"} 0.25',
+                     'test_latency_seconds_count{provider="Google"} 1']
+
+
+def test_timer_observes_the_elapsed_time():
+    registry = MetricsRegistry()
+    try:
+        with registry.timer("stage_seconds", stage="translate"):
+            raise ValueError
+    except ValueError:
+        pass
+
+    samples = registry.snapshot()["histograms"]["stage_seconds"]
+    assert samples[0]["labels"] == {"stage": "translate"} and samples[0]["value"]["count"] == 1
+
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry()
+    registry.enabled = False
+    registry.inc("requests_total")
+    registry.observe("latency_seconds", 1.0)
+
+    assert registry.snapshot() == {"counters": {}, "gauges": {}, "histograms": {}}
+    registry.enabled = True
+    registry.inc("requests_total")
+    registry.reset()
+    assert registry.snapshot()["counters"] == {}
+
+
+def test_serve_exposes_both_formats():
+    registry = MetricsRegistry()
+    registry.inc("requests_total")
+    server = registry.serve(port=0, host="127.0.0.1")
+    try:
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(f"{base_url}/metrics") as response:
+            assert "translator_requests_total 1" in response.read().decode("utf-8")
+        with urllib.request.urlopen(f"{base_url}/metrics.json") as response:
+            assert json.load(response)["counters"]["requests_total"][0]["value"] == 1
+    finally:
+        server.shutdown()
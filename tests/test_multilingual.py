@@ -0,0 +1,68 @@
+import threading
+
+from benchmarks.mock_provider import MockProvider
+from translator import TranslateModule, ColumnarRecords
+
+
+class ConcurrencyProvider(MockProvider):
+    # Records the highest number of requests in flight at once
+    in_flight = 0
+    peak = 0
+    _lock = threading.Lock()
+
+    def _do_translate(self, input_data, src, dest, fail_translation_code="P1OP1_F", **kwargs):
+        with ConcurrencyProvider._lock:
+            ConcurrencyProvider.in_flight += 1
+            ConcurrencyProvider.peak = max(ConcurrencyProvider.peak, ConcurrencyProvider.in_flight)
+        try:
+            return super()._do_translate(input_data, src, dest, fail_translation_code, **kwargs)
+        finally:
+            with ConcurrencyProvider._lock:
+                ConcurrencyProvider.in_flight -= 1
+
+
+def make_data(num_examples, num_distinct=None):
+    num_distinct = num_distinct or num_examples
+    return [{"qas_id": idx, "question": f"Question {idx % num_distinct}.", "answers": [f"Answer {idx % num_distinct}."]}
+            for idx in range(num_examples)]
+
+
+def test_languages_are_translated_in_parallel():
+    MockProvider.configure(latency=0.02)
+    ConcurrencyProvider.peak = 0
+    module = TranslateModule(provider=ConcurrencyProvider)
+
+    results = module.convert(make_data(80), ["qas_id", "question", "answers"], ["question", "answers"],
+                             target_lang=["vi", "fr", "de", "ja"], max_example_per_thread=5,
+                             large_chunks_threshold=20)
+
+    assert sorted(results) == ["de", "fr", "ja", "vi"]
+    assert all(len(translated) == 80 for translated in results.values())
+    # One language alone runs 4 chunk threads
+    assert ConcurrencyProvider.peak > 4
+
+
+def test_each_language_gets_its_own_target_fields():
+    MockProvider.configure(latency=0.0)
+    data = make_data(10)
+    results = TranslateModule(provider=MockProvider).convert(data, ["qas_id", "question", "answers"],
+                                                             ["question", "answers"], target_lang=["vi", "fr"])
+
+    assert results["vi"][3] == {"qas_id": 3, "question": "[vi] Question 3.", "answers": ["[vi] Answer 3."]}
+    assert results["fr"][3] == {"qas_id": 3, "question": "[fr] Question 3.", "answers": ["[fr] Answer 3."]}
+    assert data[3] == {"qas_id": 3, "question": "Question 3.", "answers": ["Answer 3."]}
+
+
+def test_columnar_dedup_returns_columnar_records():
+    MockProvider.configure(latency=0.0)
+    module = TranslateModule(provider=MockProvider)
+    results = module.convert(make_data(9, num_distinct=3), ["qas_id", "question", "answers"],
+                             ["question", "answers"], target_lang=["vi", "fr"], dedup=True, columnar=True)
+
+    for target_lang, translated in results.items():
+        assert isinstance(translated, ColumnarRecords)
+        assert translated.column("qas_id") == list(range(9))
+        assert translated.column("question")[7] == f"[{target_lang}] Question 1."
+    assert sorted(module.duplicate_idx) == [3, 4, 5, 6, 7, 8]
+    # Only the representatives were sent, once per language
+    assert MockProvider.stats["requests"] == 2
@@ -0,0 +1,89 @@
+import math
+import random
+
+from translator.utils.planner import plan_chunks, example_size
+
+
+def make_examples(sizes):
+    return [{"qas_id": idx, "text": "x" * size, "turns": ["y"] * 2} for idx, size in enumerate(sizes)]
+
+
+def chunk_loads(examples, chunks):
+    return [sum(example_size(examples[idx], ["text", "turns"]) for idx in chunk) for chunk in chunks]
+
+
+def test_example_size_counts_the_target_fields():
+    example = {"text": "abc", "turns": ["de", 5, "f"], "other": "ignored"}
+
+    assert example_size(example, ["text", "turns", "missing"]) == 6
+
+
+def test_chunks_cover_every_example_once():
+    rng = random.Random(0)
+    examples = make_examples([rng.randint(0, 500) for _ in range(103)])
+    chunks = plan_chunks(examples, ["text", "turns"], max_example_per_thread=10)
+
+    assert len(chunks) == math.ceil(103 / 10)
+    assert sorted(idx for chunk in chunks for idx in chunk) == list(range(103))
+    assert all(chunk == sorted(chunk) for chunk in chunks)
+
+
+def test_heaviest_chunk_comes_first():
+    rng = random.Random(1)
+    examples = make_examples([rng.randint(0, 500) for _ in range(50)])
+    chunks = plan_chunks(examples, ["text", "turns"], max_example_per_thread=7)
+    # The planner counts every example as one extra character
+    loads = [load + len(chunk) for load, chunk in zip(chunk_loads(examples, chunks), chunks)]
+
+    assert loads == sorted(loads, reverse=True)
+
+
+def test_lpt_is_better_balanced_than_fixed_splitting():
+    # A few very long examples at the front, as in a dataset sorted by source
+    sizes = [5000] * 5 + [10] * 95
+    examples = make_examples(sizes)
+    fixed = [list(range(start, min(start + 20, len(examples)))) for start in range(0, len(examples), 20)]
+
+    balanced_loads = chunk_loads(examples, plan_chunks(examples, ["text", "turns"], max_example_per_thread=20))
+    fixed_loads = chunk_loads(examples, fixed)
+
+    assert len(balanced_loads) == len(fixed_loads)
+    assert max(balanced_loads) < max(fixed_loads)
+    # Each long example gets a chunk of its own
+    assert max(balanced_loads) - min(balanced_loads) <= 5000
+
+
+def test_small_inputs_stay_in_one_chunk():
+    examples = make_examples([3, 1, 2])
+
+    assert plan_chunks(examples, ["text", "turns"], max_example_per_thread=10) == [[0, 1, 2]]
+    assert plan_chunks([], ["text", "turns"], max_example_per_thread=10) == []
+
+
+def test_empty_examples_are_spread_across_chunks():
+    examples = make_examples([0] * 12)
+    chunks = plan_chunks(examples, ["text"], max_example_per_thread=4)
+
+    assert [len(chunk) for chunk in chunks] == [4, 4, 4]
+
+
+def test_plan_caps_the_requests_in_flight_at_the_provider_pool():
+    from benchmarks.mock_provider import MockProvider
+    from translator import TranslateModule
+
+    MockProvider.configure(latency=0.0)
+    examples = [{"qas_id": idx, "text": f"Text {idx}."} for idx in range(400)]
+    module = TranslateModule(provider=MockProvider)
+
+    default = module.plan(examples, ["qas_id", "text"], ["text"], max_example_per_thread=5, request_latency=1.0)
+    bounded = module.plan(examples, ["qas_id", "text"], ["text"], max_example_per_thread=5, num_providers=8,
+                          request_latency=1.0)
+    multilingual = module.plan(examples, ["qas_id", "text"], ["text"], target_lang=["vi", "fr"],
+                               max_example_per_thread=5, num_providers=8, request_latency=1.0)
+
+    assert default["max_in_flight"] == 80 and default["projected_seconds"] == 1.0
+    assert bounded["max_in_flight"] == 8 and bounded["projected_seconds"] == 10.0
+    # The languages share the 8 instances
+    assert multilingual["max_in_flight"] == 4
+    # Planning never sends a request
+    assert MockProvider.stats["requests"] == 0
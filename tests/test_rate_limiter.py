@@ -0,0 +1,176 @@
+import threading
+import time
+
+import pytest
+
+from benchmarks.mock_provider import ThrottledError
+from translator import TranslateModule
+from translator.providers.rate_limiter import TokenBucket, AdaptiveConcurrencyController, RateLimiter
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class Response():
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class ResponseError(Exception):
+    def __init__(self, status_code):
+        super().__init__("request failed")
+        self.response = Response(status_code)
+
+
+def test_token_bucket_allows_a_burst_then_waits_for_the_refill():
+    bucket = TokenBucket(rate=100, capacity=5)
+
+    # The bucket starts full, a burst up to the capacity does not wait
+    assert sum(bucket.acquire() for _ in range(5)) == 0
+    # Then each token waits for the refill at rate tokens per second
+    start_time = time.monotonic()
+    wait_time = bucket.acquire()
+    assert 0 < wait_time <= 0.01
+    assert time.monotonic() - start_time >= wait_time * 0.9
+
+
+def test_token_bucket_refills_up_to_its_capacity():
+    bucket = TokenBucket(rate=1000, capacity=10)
+    bucket.acquire(10)
+    time.sleep(0.05)
+
+    # 50 tokens refilled, only 10 fit
+    assert bucket.acquire(10) == 0
+    assert 0 < bucket.acquire(1) <= 0.002
+
+
+def test_token_bucket_goes_into_debt_for_an_oversize_request():
+    bucket = TokenBucket(rate=100, capacity=10)
+
+    # More tokens than the capacity are granted after waiting for the missing ones
+    assert bucket.acquire(15) == pytest.approx(0.05, abs=0.01)
+    # The next request waits for the debt to be paid back too
+    assert bucket.acquire(1) > 0
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (StatusError(429), True),
+    (StatusError(503), True),
+    (StatusError(400), False),
+    (ResponseError(502), True),
+    (ResponseError(404), False),
+    (TimeoutError(), True),
+    (ConnectionError(), True),
+    (ThrottledError("429 Too Many Requests"), True),
+    (Exception('Unexpected status code "503" from https://translate.googleapis.com'), True),
+    (Exception('Unexpected status code "400" from https://translate.googleapis.com'), False),
+    (Exception("Rate limit exceeded"), True),
+    (ValueError("invalid literal"), False),
+])
+def test_is_retryable(error, retryable):
+    assert RateLimiter.is_retryable(error) == retryable
+
+
+def test_backoff_delay_is_full_jitter_capped_at_max_delay():
+    rate_limiter = RateLimiter(base_delay=0.5, max_delay=3.0)
+
+    for attempt in range(8):
+        delays = [rate_limiter.backoff_delay(attempt) for _ in range(200)]
+        upper_bound = min(3.0, 0.5 * 2 ** attempt)
+        assert all(0 <= delay <= upper_bound for delay in delays)
+        # Jittered over the whole range, not pinned to the bound
+        assert max(delays) > upper_bound / 2 and min(delays) < upper_bound / 2
+
+
+def test_call_retries_retryable_errors_until_success():
+    rate_limiter = RateLimiter(max_retries=3, base_delay=0.001)
+    errors = [ThrottledError("429 Too Many Requests"), ConnectionError()]
+
+    def request():
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    assert rate_limiter.call(request) == "ok"
+    assert errors == []
+
+
+def test_call_gives_up_after_max_retries_and_on_non_retryable_errors():
+    rate_limiter = RateLimiter(max_retries=2, base_delay=0.001)
+    attempts = []
+
+    def throttled():
+        attempts.append(1)
+        raise StatusError(429)
+
+    with pytest.raises(StatusError):
+        rate_limiter.call(throttled)
+    assert len(attempts) == 3
+
+    def invalid():
+        attempts.append(1)
+        raise ValueError("invalid")
+
+    with pytest.raises(ValueError):
+        rate_limiter.call(invalid)
+    assert len(attempts) == 4
+
+
+def test_aimd_grows_additively_and_shrinks_multiplicatively():
+    controller = AdaptiveConcurrencyController(initial_limit=4, min_limit=2, max_limit=6, target_latency=1.0,
+                                               decrease_factor=0.5)
+
+    # One step per limit successes: about limit requests to grow the limit by one
+    for _ in range(4):
+        controller.acquire()
+        controller.release(latency=0.1, success=True)
+    assert 4.9 < controller.limit < 5.0
+
+    for _ in range(100):
+        controller.acquire()
+        controller.release(latency=0.1, success=True)
+    assert controller.limit == 6
+
+    controller.acquire()
+    controller.release(latency=0.1, success=False)
+    assert controller.limit == 3
+    # A slow request is a congestion signal too
+    controller.acquire()
+    controller.release(latency=5.0, success=True)
+    assert controller.limit == 2
+    controller.acquire()
+    controller.release(latency=0.1, success=False)
+    assert controller.limit == 2
+
+
+def test_aimd_blocks_above_the_limit():
+    controller = AdaptiveConcurrencyController(initial_limit=2, min_limit=1, max_limit=4)
+    controller.acquire()
+    controller.acquire()
+    acquired = threading.Event()
+
+    def acquire():
+        controller.acquire()
+        acquired.set()
+
+    thread = threading.Thread(target=acquire)
+    thread.start()
+    assert not acquired.wait(0.05)
+    controller.release(latency=0.1, success=True)
+    assert acquired.wait(1)
+    thread.join()
+
+
+def test_every_entry_point_retries_with_backoff():
+    # Without any limit the same retrying RateLimiter is built, single language or not
+    rate_limiter = TranslateModule.build_rate_limiter()
+    assert isinstance(rate_limiter, RateLimiter)
+    assert rate_limiter.request_bucket is None and rate_limiter.char_bucket is None
+    assert rate_limiter.concurrency_controller is None
+
+    limited = TranslateModule.build_rate_limiter(requests_per_second=5, adaptive_concurrency=True, max_concurrency=4)
+    assert limited.request_bucket.rate == 5
+    assert limited.concurrency_controller.max_limit == 4
@@ -0,0 +1,83 @@
+import copy
+import pickle
+
+import pytest
+
+from translator.records import ColumnarRecords
+
+
+def make_data():
+    return [{"qas_id": idx, "question": f"Question {idx}", "answers": [f"a{idx}", f"b{idx}"]} for idx in range(4)]
+
+
+def test_rows_read_and_write_without_touching_the_source():
+    data = make_data()
+    records = ColumnarRecords.from_data(data, ["qas_id", "question", "answers"], writable_fields=["question", "answers"])
+    row = records.rows()[1]
+
+    assert dict(row) == data[1]
+    row["question"] = "Câu hỏi 1"
+    # A list of a target field is copied before it is updated in place
+    row["answers"][0] = "x"
+
+    assert row["question"] == "Câu hỏi 1" and row["answers"] == ["x", "b1"]
+    assert data[1] == {"qas_id": 1, "question": "Question 1", "answers": ["a1", "b1"]}
+    assert records.rows()[0]["question"] == "Question 0"
+
+
+def test_a_qas_id_is_added_when_missing():
+    records = ColumnarRecords.from_data([{"text": "a"}, {"text": "b"}], ["text"])
+
+    assert [row["qas_id"] for row in records] == [0, 1]
+    assert "qas_id" in records.rows()[0]
+
+
+def test_select_is_an_ordered_view_over_the_same_columns():
+    records = ColumnarRecords.from_data(make_data(), ["qas_id", "question", "answers"], writable_fields=["question"])
+    rows = records.rows()
+    rows[3]["question"] = "translated"
+
+    view = records.select([rows[3], rows[0]])
+
+    assert len(view) == 2
+    assert view.column("qas_id") == [3, 0]
+    assert view.to_list()[0] == {"qas_id": 3, "question": "translated", "answers": ["a3", "b3"]}
+    assert len(records) == 4
+
+
+def test_rows_pickle_and_copy_as_plain_dicts():
+    records = ColumnarRecords.from_data(make_data(), ["qas_id", "question", "answers"])
+    row = records.rows()[2]
+
+    assert pickle.loads(pickle.dumps(row)) == {"qas_id": 2, "question": "Question 2", "answers": ["a2", "b2"]}
+    assert type(copy.deepcopy(row)) is dict
+    with pytest.raises(TypeError):
+        del row["question"]
+
+
+def test_arrow_round_trip():
+    pa = pytest.importorskip("pyarrow")
+    table = pa.table({"qas_id": [0, 1, 2], "question": ["q0", "q1", "q2"]})
+    records = ColumnarRecords.from_data(table, ["qas_id", "question"], writable_fields=["question"])
+    rows = records.rows()
+    for row in rows:
+        row["question"] = row["question"].upper()
+
+    result = records.select([rows[2], rows[1]]).to_arrow()
+
+    assert result.to_pylist() == [{"qas_id": 2, "question": "Q2"}, {"qas_id": 1, "question": "Q1"}]
+
+
+def test_convert_returns_columnar_records():
+    from benchmarks.mock_provider import MockProvider
+    from translator import TranslateModule
+
+    MockProvider.configure(latency=0.0)
+    data = make_data()
+    result = TranslateModule(provider=MockProvider).convert(data, ["qas_id", "question", "answers"],
+                                                            ["question", "answers"], target_lang="vi",
+                                                            columnar=True)
+
+    assert isinstance(result, ColumnarRecords)
+    assert result.to_list()[1] == {"qas_id": 1, "question": "[vi] Question 1", "answers": ["[vi] a1", "[vi] b1"]}
+    assert data[1]["question"] == "Question 1"
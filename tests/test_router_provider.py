@@ -0,0 +1,115 @@
+import random
+import threading
+import time
+
+import pytest
+
+from benchmarks.mock_provider import MockProvider
+from translator.providers import RouterProvider, Backend
+from translator.providers.router_provider import CircuitOpenError
+
+
+def make_provider(name, error_rate=0.0, latency=0.0):
+    # Each backend gets its own MockProvider subclass so its error rate and request count are its own
+    calls = []
+
+    def _do_translate(self, input_data, src, dest, fail_translation_code="P1OP1_F", **kwargs):
+        calls.append(input_data)
+        MockProvider._do_translate(self, input_data, src=src, dest=dest, fail_translation_code=fail_translation_code)
+        return f"[{name}] {input_data}"
+
+    provider = type(name, (MockProvider,), {"error_rate": error_rate, "latency": latency,
+                                            "_do_translate": _do_translate})
+    return provider, calls
+
+
+def test_traffic_is_split_by_weight():
+    random.seed(0)
+    fast, fast_calls = make_provider("fast")
+    slow, slow_calls = make_provider("slow")
+    router = RouterProvider.build([Backend(fast, weight=3.0), Backend(slow, weight=1.0)])()
+
+    for idx in range(2000):
+        router.translate(f"text {idx}", src="en", dest="vi")
+
+    # Both backends stay under the 1 ms latency floor, so only the weights tell them apart
+    assert len(fast_calls) + len(slow_calls) == 2000
+    assert 0.7 < len(fast_calls) / 2000 < 0.8
+
+
+def test_failed_requests_fail_over_to_a_healthy_backend():
+    broken, broken_calls = make_provider("broken", error_rate=1.0)
+    healthy, healthy_calls = make_provider("healthy")
+    broken_backend = Backend(broken, weight=100.0, failure_threshold=3, reset_timeout=60)
+    router = RouterProvider.build([broken_backend, Backend(healthy)])()
+
+    results = [router.translate(f"text {idx}", src="en", dest="vi") for idx in range(20)]
+
+    assert results == [f"[healthy] text {idx}" for idx in range(20)]
+    # The circuit opened after failure_threshold failures, the broken backend was skipped from then on
+    assert broken_backend.is_open
+    assert len(broken_calls) == 3
+    assert len(healthy_calls) == 20
+
+
+def test_circuit_goes_from_open_to_half_open_to_closed():
+    provider, calls = make_provider("flaky", error_rate=1.0)
+    backend = Backend(provider, failure_threshold=2, reset_timeout=0.05)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            backend.translate("text", src="en", dest="vi", fail_translation_code="P1OP1_F")
+    assert backend.is_open and not backend.available()
+
+    # Open: requests are refused without reaching the provider
+    with pytest.raises(CircuitOpenError):
+        backend.translate("text", src="en", dest="vi", fail_translation_code="P1OP1_F")
+    assert len(calls) == 2
+
+    # Half-open: a failed trial request keeps the circuit open for another reset_timeout
+    time.sleep(0.06)
+    assert backend.available()
+    with pytest.raises(ConnectionError) as error:
+        backend.translate("text", src="en", dest="vi", fail_translation_code="P1OP1_F")
+    assert not isinstance(error.value, CircuitOpenError)
+    assert len(calls) == 3 and backend.is_open and not backend.available()
+
+    # A successful trial request closes the circuit
+    provider.error_rate = 0.0
+    time.sleep(0.06)
+    assert backend.translate("text", src="en", dest="vi", fail_translation_code="P1OP1_F") == "[flaky] text"
+    assert not backend.is_open
+    assert backend.consecutive_failures == 0
+    assert backend.translate("again", src="en", dest="vi", fail_translation_code="P1OP1_F") == "[flaky] again"
+
+
+def test_a_half_open_circuit_lets_a_single_trial_through(monkeypatch):
+    provider, calls = make_provider("flaky", error_rate=1.0, latency=0.05)
+    backend = Backend(provider, failure_threshold=1, reset_timeout=0.01)
+    with pytest.raises(ConnectionError):
+        backend.translate("text", src="en", dest="vi", fail_translation_code="P1OP1_F")
+    time.sleep(0.02)
+
+    # Every caller passes the availability check before any of them claims the trial slot
+    monkeypatch.setattr(backend, "available", lambda: True)
+    router = RouterProvider.build([backend])()
+    barrier = threading.Barrier(8)
+    errors = []
+
+    def request():
+        barrier.wait()
+        try:
+            router.translate("text", src="en", dest="vi")
+        except ConnectionError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Only the caller that claimed the trial slot reached the provider
+    assert len(calls) == 2
+    assert len(errors) == 8
+    assert sum(isinstance(error, CircuitOpenError) for error in errors) == 7
@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from translator.batcher import RequestBatcher
+from translator.utils import segment_text, join_segments, SEGMENT_GRANULARITIES
+
+
+TEXTS = [
+    "",
+    "   ",
+    "One sentence.",
+    "  Leading and trailing whitespace.  \n",
+    "First sentence. Second one?  Third!\tFourth.",
+    "Paragraph one. Still one.\n\n  Paragraph two.\r\nParagraph three.",
+    "Abbreviations like e.g. this and Mr. Smith stay whole. Next.",
+    "word " * 5000,
+    "x" * 40000,
+]
+
+
+@pytest.mark.parametrize("granularity", SEGMENT_GRANULARITIES)
+@pytest.mark.parametrize("text", TEXTS)
+def test_join_inverts_segment(text, granularity):
+    segments, glue = segment_text(text, max_segment_chars=15000, granularity=granularity)
+
+    assert len(glue) == len(segments) + 1
+    assert join_segments(segments, glue) == text
+    assert all(0 < len(segment) <= 15000 for segment in segments)
+    # Whitespace around a segment belongs to the glue so only the text is translated and cached
+    assert all(segment == segment.strip() for segment in segments)
+
+
+def test_glue_keeps_the_original_separators():
+    segments, glue = segment_text("  A. B?\n\nC!  ", granularity="sentence")
+
+    assert segments == ["A.", "B?", "C!"]
+    assert glue == ["  ", " ", "\n\n", "  "]
+    assert join_segments(["a.", "b?", "c!"], glue) == "  a. b?\n\nc!  "
+
+
+def test_paragraph_granularity_only_splits_at_line_breaks():
+    segments, _ = segment_text("A. B.\nC. D.", granularity="paragraph")
+
+    assert segments == ["A. B.", "C. D."]
+
+
+def test_long_text_is_split_under_the_limit_without_granularity():
+    text = "Short sentence. " * 2000
+    segments, glue = segment_text(text, max_segment_chars=15000, granularity=None)
+
+    assert len(segments) > 1
+    assert all(len(segment) <= 15000 for segment in segments)
+    assert join_segments(segments, glue) == text
+
+
+def test_random_round_trip():
+    rng = random.Random(0)
+    pieces = ["word", "Mr.", "e.g.", ".", "?", "!", " ", "  ", "\n", "\n\n", "\t", "x" * 50]
+    for _ in range(500):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 60)))
+        for granularity in SEGMENT_GRANULARITIES:
+            segments, glue = segment_text(text, max_segment_chars=rng.randint(1, 80), granularity=granularity)
+            assert join_segments(segments, glue) == text
+
+
+def test_batcher_scatter_restores_the_whitespace():
+    example = {"text": "  Hello there.  How are you?\n", "turns": ["Hi.", " ", "Bye. See you."]}
+    batcher = RequestBatcher(max_batch_chars=10, max_batch_items=2, segment_granularity="sentence")
+    batcher.add_example(example, ["text", "turns"])
+
+    assert all(sum(len(batcher.texts[idx]) for idx in batch) <= 10 or len(batch) == 1
+               for batch in batcher.batches())
+    batcher.scatter([text.upper() for text in batcher.texts])
+    assert example == {"text": "  HELLO THERE.  HOW ARE YOU?\n", "turns": ["HI.", " ", "BYE. SEE YOU."]}
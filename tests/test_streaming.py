@@ -0,0 +1,111 @@
+import threading
+
+import pytest
+
+from benchmarks.mock_provider import MockProvider
+from translator import TranslateModule
+from translator.streaming import iter_chunks, ParquetShardWriter
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+class FlakyProvider(MockProvider):
+    # Fails the first num_failures requests of the process with an error the rate limiter does not retry
+    num_failures = 0
+    _lock = threading.Lock()
+
+    def _do_translate(self, input_data, src, dest, fail_translation_code="P1OP1_F", **kwargs):
+        with FlakyProvider._lock:
+            fail = FlakyProvider.num_failures > 0
+            FlakyProvider.num_failures -= 1
+        if fail:
+            with self._stats_lock:
+                MockProvider.stats["requests"] += 1
+            raise ValueError("Simulated bad response")
+        return super()._do_translate(input_data, src, dest, fail_translation_code, **kwargs)
+
+
+def make_data(num_examples):
+    return [{"question": f"Question {idx}.", "answers": [f"Answer {idx}."]} for idx in range(num_examples)]
+
+
+def test_iter_chunks():
+    assert list(iter_chunks(iter(range(7)), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(iter_chunks([], 3)) == []
+
+
+def test_shards_roll_over_at_shard_size(tmp_path):
+    with ParquetShardWriter(str(tmp_path), shard_size=3) as writer:
+        writer.write_many({"qas_id": idx, "text": f"t{idx}"} for idx in range(7))
+
+    assert [path.rsplit("/", 1)[-1] for path in writer.shard_paths] == \
+        ["translated-00000.parquet", "translated-00001.parquet", "translated-00002.parquet"]
+    assert [pq.read_metadata(path).num_rows for path in writer.shard_paths] == [3, 3, 1]
+    assert writer.num_rows == 7
+
+
+def test_a_field_empty_in_the_first_shard_gets_its_type_later(tmp_path):
+    rows = [{"qas_id": 0, "turns": [], "note": None}, {"qas_id": 1, "turns": [], "note": None},
+            {"qas_id": 2, "turns": ["hi"], "note": "n"}, {"qas_id": 3, "turns": [], "note": None}]
+    with ParquetShardWriter(str(tmp_path), shard_size=2) as writer:
+        writer.write_many(rows)
+
+    schemas = [pq.read_schema(path) for path in writer.shard_paths]
+    assert schemas[1].field("turns").type == pa.list_(pa.string())
+    assert schemas[1].field("note").type == pa.string()
+    # Every shard can be read as the final schema
+    table = pa.concat_tables([pq.read_table(path).cast(writer.schema) for path in writer.shard_paths])
+    assert table.to_pylist() == rows
+
+
+def test_an_explicit_schema_is_used_for_every_shard(tmp_path):
+    schema = pa.schema([("qas_id", pa.int64()), ("turns", pa.list_(pa.string()))])
+    with ParquetShardWriter(str(tmp_path), shard_size=1, schema=schema) as writer:
+        writer.write_many([{"qas_id": 0, "turns": []}, {"qas_id": 1, "turns": ["a"]}])
+
+    assert all(pq.read_schema(path) == schema for path in writer.shard_paths)
+
+
+def test_iter_translate_keeps_the_order_and_retries_a_failed_chunk():
+    MockProvider.configure(latency=0.0)
+    FlakyProvider.num_failures = 1
+    module = TranslateModule(provider=FlakyProvider)
+
+    result = list(module.iter_translate(iter(make_data(6)), ["qas_id", "question", "answers"],
+                                        ["question", "answers"], target_lang="vi", max_example_per_thread=2,
+                                        max_in_flight_chunks=1))
+
+    assert [example["qas_id"] for example in result] == list(range(6))
+    assert result[4]["question"] == "[vi] Question 4."
+    assert module.fail_idx == []
+    # One request per chunk, plus the failed first attempt
+    assert MockProvider.stats["requests"] == 4
+
+
+def test_iter_translate_gives_up_after_max_retries():
+    MockProvider.configure(latency=0.0)
+    FlakyProvider.num_failures = 10 ** 6
+    module = TranslateModule(provider=FlakyProvider)
+
+    result = list(module.iter_translate(make_data(4), ["qas_id", "question", "answers"], ["question", "answers"],
+                                        target_lang="vi", max_example_per_thread=2, max_retries=2))
+    FlakyProvider.num_failures = 0
+
+    assert result == []
+    assert sorted(module.fail_idx) == [0, 1, 2, 3]
+    # Each of the two chunks is sent 1 + max_retries times
+    assert MockProvider.stats["requests"] == 6
+
+
+def test_convert_stream_writes_translated_shards(tmp_path):
+    MockProvider.configure(latency=0.0)
+    module = TranslateModule(provider=MockProvider)
+
+    paths = module.convert_stream(iter(make_data(5)), ["qas_id", "question", "answers"], ["question", "answers"],
+                                  str(tmp_path), shard_size=2, target_lang="vi", max_example_per_thread=2)
+
+    table = pa.concat_tables([pq.read_table(path) for path in paths])
+    assert len(paths) == 3
+    assert table.column("qas_id").to_pylist() == list(range(5))
+    assert table.column("answers").to_pylist()[3] == ["[vi] Answer 3."]
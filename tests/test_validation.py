@@ -0,0 +1,65 @@
+import pytest
+
+from translator import TranslateModule
+from translator.providers import Provider
+
+CODE = "public class Foo extends Bar implements Baz { private static final int x = 1; void run() { return; } }"
+
+
+class EchoProvider(Provider):
+    def __init__(self):
+        self.translator = self
+
+    def _do_translate(self, input_data, src, dest, fail_translation_code="P1OP1_F", **kwargs):
+        return input_data
+
+
+def make_data(num_examples=40):
+    return [{"qas_id": idx,
+             "question": CODE if idx % 5 == 0 else f"What is the answer to question {idx}?",
+             "answers": [f"Answer {idx}" + (" P1OP1_F" if idx % 7 == 0 else "")]} for idx in range(num_examples)]
+
+
+def no_process_pool(*args, **kwargs):
+    raise AssertionError("The process pool should not be used")
+
+
+@pytest.mark.parametrize("num_proc", [None, 2])
+def test_pre_translate_validate_drops_code_examples(num_proc):
+    module = TranslateModule(provider=EchoProvider)
+
+    validated = module.pre_translate_validate(make_data(), ["question", "answers"], True, num_proc=num_proc)
+
+    assert module.code_idx == list(range(0, 40, 5))
+    assert [example["qas_id"] for example in validated] == [idx for idx in range(40) if idx % 5]
+
+
+@pytest.mark.parametrize("num_proc", [None, 2])
+def test_post_translate_validate_drops_failed_translations(num_proc):
+    module = TranslateModule(provider=EchoProvider)
+
+    validated = module.post_translate_validate(make_data(), ["question", "answers"], num_proc=num_proc)
+
+    assert module.fail_idx == list(range(0, 40, 7))
+    assert [example["qas_id"] for example in validated] == [idx for idx in range(40) if idx % 7]
+
+
+def test_small_inputs_are_validated_in_process(monkeypatch):
+    monkeypatch.setattr(TranslateModule, "_flags_with_process_pool", staticmethod(no_process_pool))
+    module = TranslateModule(provider=EchoProvider)
+    data = make_data(3)
+
+    # num_proc of 1, or not more examples than processes, runs on the calling process
+    assert len(module.pre_translate_validate(data, ["question"], True, num_proc=1)) == 2
+    assert len(module.pre_translate_validate(data, ["question"], True, num_proc=3)) == 2
+    assert len(module.post_translate_validate(data, ["answers"], num_proc=4)) == 2
+
+
+def test_code_is_only_checked_when_asked(monkeypatch):
+    monkeypatch.setattr(TranslateModule, "_flags_with_process_pool", staticmethod(no_process_pool))
+    module = TranslateModule(provider=EchoProvider)
+
+    validated = module.pre_translate_validate(make_data(), ["question", "answers"], False, num_proc=2)
+
+    assert len(validated) == 40
+    assert module.code_idx == []
@@ -1 +1,7 @@
 from .mainmodule import TranslateModule
+from .mainengine import TranslateThread
+from .asyncengine import AsyncTranslateEngine
+from .cache import TranslationCache
+from .checkpoint import CheckpointJournal
+from .records import ColumnarRecords
+from .distributed import LeaseCoordinator, assign_shards, merge_shards
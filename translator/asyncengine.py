@@ -0,0 +1,232 @@
+import asyncio
+import itertools
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict
+from tqdm.auto import tqdm
+
+from .utils import METRICS
+from .batcher import RequestBatcher
+
+
+class AsyncTranslateEngine():
+
+    def __init__(self,
+                    all_fields = None,
+                    target_fields = None,
+                    max_concurrency: int = 64,  # Maximum number of in-flight provider requests
+                    num_providers: int = None,  # How many provider instances are created (8 if None), requests
+                                                # share them round-robin so an instance serves several at once
+                    max_retries: int = 3,  # How many times one example is retried before it is marked as failed
+                    translator = None,
+                    cache = None,  # Optional TranslationCache, looked up before every provider call
+                    journal = None,  # Optional CheckpointJournal, finished examples are appended to it
+                    checkpoint_every: int = 100,  # How many finished examples are buffered before flushing the journal
+                    rate_limiter = None,  # Optional RateLimiter shared by every provider instance
+                    executor = None,  # Optional ThreadPoolExecutor for the provider calls shared with other runs,
+                                      # one of max_concurrency threads is created per run if None
+                    max_batch_chars: int = 4500,  # Maximum number of characters in a single provider request
+                    max_batch_items: int = 100,  # Maximum number of segments in a single provider request
+                    segment_granularity: str = None,  # Translate and cache "sentence" or "paragraph" segments (opt-in),
+                                                     # None to only split strings longer than 15000 characters
+                    source_lang: str = "en",
+                    target_lang: str = "te",
+                    fail_translation_code: str="P1OP1_F"  # Fail code for *expected* fail translation and can be removed
+                                                        # post-translation
+                ):
+
+        self.translator = translator
+        self.fail_translation_code = fail_translation_code
+        self.source_lang = source_lang
+        self.target_lang = target_lang
+
+        self.target_config = all_fields
+        self.target_fields = target_fields
+
+        assert max_concurrency > 0, "max_concurrency must be a positive number"
+        assert num_providers is None or num_providers > 0, "num_providers must be a positive number"
+
+        self.max_concurrency = max_concurrency
+        self.num_providers = num_providers if num_providers is not None else 8
+        self.max_retries = max_retries
+        self.cache = cache
+        self.journal = journal
+        self.checkpoint_every = checkpoint_every
+        self.rate_limiter = rate_limiter
+        self.max_batch_chars = max_batch_chars
+        self.max_batch_items = max_batch_items
+        self.segment_granularity = segment_granularity
+
+        self.converted_data_translated = None
+        self.failed_examples = []
+
+        # These are bound to the running event loop in translate_converted_async
+        self._semaphore = None
+        self._providers = None
+        self.executor = executor
+        self._executor = None
+        self._in_flight = 0
+
+    @property
+    def provider_name(self) -> str:
+        return getattr(self.translator, "__name__", type(self.translator).__name__)
+
+    async def __translate_texts(self, src_texts: List[str]) -> List[str]:
+        '''
+        Actual place where translation take place, at most max_concurrency requests are in flight at once
+        '''
+        # SQLite I/O is blocking, it must not stall the other requests on the event loop
+        cached_texts = await asyncio.to_thread(self.cache.get_many, self.provider_name, self.source_lang,
+                                               self.target_lang, src_texts) \
+            if self.cache is not None and src_texts else [None] * len(src_texts)
+        miss_idx = [idx for idx, text in enumerate(cached_texts) if text is None]
+        if not miss_idx:
+            return cached_texts
+
+        async with self._semaphore:
+            provider = next(self._providers)
+            self._in_flight += 1
+            METRICS.set_gauge("async_in_flight_requests", self._in_flight)
+            try:
+                translated_misses = await provider.translate_async([src_texts[idx] for idx in miss_idx],
+                                                                   src=self.source_lang,
+                                                                   dest=self.target_lang,
+                                                                   fail_translation_code=self.fail_translation_code,
+                                                                   executor=self._executor)
+            finally:
+                self._in_flight -= 1
+
+        target_texts = list(cached_texts)
+        for idx, text in zip(miss_idx, translated_misses):
+            target_texts[idx] = text
+
+        if self.cache is not None:
+            succeeded_idx = [idx for idx in miss_idx if self.fail_translation_code not in target_texts[idx]]
+            await asyncio.to_thread(self.cache.set_many, self.provider_name, self.source_lang, self.target_lang,
+                                    [src_texts[idx] for idx in succeeded_idx],
+                                    [target_texts[idx] for idx in succeeded_idx])
+        return target_texts
+
+    async def __translate_segments(self, segments: List[str]) -> List[str]:
+        '''
+        Translate segments in one request, the failed ones are retried on their own so one unavoidable failure
+        does not fail the others
+        '''
+        translated_segments = await self.__translate_texts(segments)
+        if len(segments) > 1:
+            failed_idx = [idx for idx, text in enumerate(translated_segments) if self.fail_translation_code in text]
+            if failed_idx:
+                METRICS.inc("segment_retries_total", len(failed_idx))
+                retried = await asyncio.gather(*(self.__translate_texts([segments[idx]]) for idx in failed_idx))
+                for idx, text in zip(failed_idx, retried):
+                    translated_segments[idx] = text[0]
+        return translated_segments
+
+    def __new_batcher(self, example: Dict) -> RequestBatcher:
+        keys = [key for key in self.target_config
+                if key in self.target_fields and example[key] != "" and isinstance(example[key], (str, list))]
+        batcher = RequestBatcher(max_batch_chars=self.max_batch_chars,
+                                 max_batch_items=self.max_batch_items,
+                                 segment_granularity=self.segment_granularity)
+        batcher.add_example(example, keys)
+        return batcher
+
+    async def __translate_per_key(self, example: Dict) -> Dict:
+        '''
+        Translate every target field of one example, the segments of all fields are packed into batches that are
+        sent concurrently. The example is only updated once every batch succeeded so a retry always starts from
+        the source text
+        '''
+        batcher = self.__new_batcher(example)
+        batches = list(batcher.batches())
+        translated_batches = await asyncio.gather(*(self.__translate_segments([batcher.texts[idx] for idx in batch])
+                                                    for batch in batches))
+        translations = [None] * len(batcher)
+        for batch, translated_batch in zip(batches, translated_batches):
+            for idx, text in zip(batch, translated_batch):
+                translations[idx] = text
+        batcher.scatter(translations)
+        return example
+
+    async def translate_converted_async(self, converted_data: List[Dict]) -> List[Dict]:
+        '''
+        Translate converted_data on the running event loop, the order of converted_data is maintained
+        '''
+        self._semaphore = asyncio.BoundedSemaphore(self.max_concurrency)
+        # The blocking provider calls run on threads of their own, one per in-flight request, so max_concurrency
+        # and not the size of the loop's default executor bounds the requests in flight
+        self._executor = self.executor if self.executor is not None else \
+            ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="async-translate")
+        providers = []
+        for _ in range(min(self.num_providers, self.max_concurrency)):
+            provider = self.translator()
+            if self.rate_limiter is not None:
+                provider.rate_limiter = self.rate_limiter
+            providers.append(provider)
+        # Requests are spread over the instances round-robin, an instance serves several requests at once
+        self._providers = itertools.cycle(providers)
+
+        self.failed_examples = []
+        results = [None] * len(converted_data)
+        next_idx = 0
+        progress_bar = tqdm(total=len(converted_data), desc="Translating converted data (async)")
+        journal_buffer = []
+
+        def flush_journal():
+            if self.journal is not None:
+                self.journal.append(journal_buffer)
+            journal_buffer.clear()
+
+        async def worker():
+            nonlocal next_idx
+            while next_idx < len(converted_data):
+                idx = next_idx
+                next_idx += 1
+                example = converted_data[idx]
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        results[idx] = await self.__translate_per_key(example)
+                        journal_buffer.append(results[idx])
+                        if len(journal_buffer) >= self.checkpoint_every:
+                            flush_journal()
+                        break
+                    except Exception as e:
+                        tqdm.write(f"Example {example.get('qas_id')} failed with the following error: {e}."
+                                   f" Attempt {attempt + 1}/{self.max_retries + 1}")
+                else:
+                    self.failed_examples.append(example)
+                progress_bar.update(1)
+
+        # Examples are pulled by a fixed number of workers so memory stays bounded regardless of the dataset size,
+        # each example may still issue several requests at once which are bounded by the semaphore
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.max_concurrency)))
+        finally:
+            if self._executor is not self.executor:
+                self._executor.shutdown(wait=False)
+            for provider in providers:
+                provider.close()
+        flush_journal()
+        progress_bar.close()
+
+        return [example for example in results if example is not None]
+
+    def translate_converted(self, converted_data: List[Dict] = None) -> None:
+        '''
+        Synchronous entry point with the same contract as TranslateThread.translate_converted, the result is stored
+        in self.converted_data_translated
+        '''
+        assert converted_data is not None, "No data to translate, please provide converted_data"
+        self.converted_data_translated = asyncio.run(self.translate_converted_async(converted_data))
+
+    def plan_requests(self, converted_data: List[Dict]) -> Dict:
+        '''
+        Dry run of translate_converted: the provider requests of every example as their number of characters, no
+        provider instance is created. The requests of all examples share max_in_flight slots, the provider instances
+        are shared round-robin so only max_concurrency bounds them. Retries of failed segments are not counted
+        '''
+        requests = []
+        for example in converted_data:
+            batcher = self.__new_batcher(example)
+            requests += [sum(len(batcher.texts[idx]) for idx in batch) for batch in batcher.batches()]
+        return {"requests": requests, "max_in_flight": self.max_concurrency}
@@ -0,0 +1,84 @@
+from typing import List, Dict, Iterator
+
+from .utils import segment_text, join_segments
+
+
+class RequestBatcher():
+    '''
+    Collect the strings of many examples and fields and pack them into batches under a character and item budget,
+    so one provider call can carry hundreds of short strings. Strings are split into sentence or paragraph segments
+    so each one is cached and retried on its own, each segment remembers the example, key and list index it came
+    from and the original separators around it so the translations can be put back with scatter()
+    '''
+
+    def __init__(self,
+                 max_batch_chars: int = 4500,  # Maximum number of characters sent in a single provider call
+                 max_batch_items: int = 100,  # Maximum number of strings sent in a single provider call
+                 large_text_threshold: int = 15000,  # Maximum number of characters in a segment
+                 segment_granularity: str = None  # "sentence", "paragraph" or None to only split long strings
+                 ):
+        assert max_batch_chars > 0 and max_batch_items > 0, "Batch budgets must be positive numbers"
+
+        self.max_batch_chars = max_batch_chars
+        self.max_batch_items = max_batch_items
+        self.large_text_threshold = large_text_threshold
+        self.segment_granularity = segment_granularity
+
+        self.texts = []
+        # Each field is [example, key, list_idx, segment_ids, glue], list_idx is None for str fields
+        self.fields = []
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def add(self, example: Dict, key: str, text: str, list_idx: int = None) -> None:
+        if not text:
+            return
+        segments, glue = segment_text(text, max_segment_chars=self.large_text_threshold,
+                                      granularity=self.segment_granularity)
+        # A whitespace only string has no segment and is left as is
+        if not segments:
+            return
+        segment_ids = list(range(len(self.texts), len(self.texts) + len(segments)))
+        self.texts.extend(segments)
+        self.fields.append([example, key, list_idx, segment_ids, glue])
+
+    def add_example(self, example: Dict, keys: List[str]) -> None:
+        for key in keys:
+            value = example[key]
+            if isinstance(value, str):
+                self.add(example, key, value)
+            elif isinstance(value, list):
+                for idx, text in enumerate(value):
+                    self.add(example, key, text, list_idx=idx)
+
+    def batches(self) -> Iterator[List[int]]:
+        '''
+        Yield lists of segment ids, a batch is closed as soon as adding the next string would exceed either budget.
+        A single string larger than max_batch_chars is sent on its own
+        '''
+        batch = []
+        batch_chars = 0
+        for segment_id, text in enumerate(self.texts):
+            if batch and (batch_chars + len(text) > self.max_batch_chars or len(batch) >= self.max_batch_items):
+                yield batch
+                batch = []
+                batch_chars = 0
+            batch.append(segment_id)
+            batch_chars += len(text)
+        if batch:
+            yield batch
+
+    def scatter(self, translations: List[str]) -> None:
+        '''
+        Write translations (indexed by segment id) back into the examples they came from
+        '''
+        assert len(translations) == len(self.texts), \
+            f"Expected {len(self.texts)} translations but got {len(translations)}"
+
+        for example, key, list_idx, segment_ids, glue in self.fields:
+            translated = join_segments([translations[segment_id] for segment_id in segment_ids], glue)
+            if list_idx is None:
+                example[key] = translated
+            else:
+                example[key][list_idx] = translated
@@ -0,0 +1,151 @@
+import hashlib
+import sqlite3
+import threading
+import unicodedata
+
+from typing import List, Optional
+
+from .utils import METRICS
+
+
+class TranslationCache():
+    '''
+    Disk-backed translation cache, entries are keyed by a hash of (provider, source_lang, target_lang, normalized text).
+    The cache is safe to share between threads and is evicted least-recently-used first once the stored text
+    exceeds max_size_bytes
+    '''
+
+    def __init__(self,
+                 path: str = "translation_cache.sqlite",
+                 max_size_bytes: int = 2 * 1024 ** 3,  # Evict least recently used entries above this size
+                 evict_ratio: float = 0.9,  # After eviction the cache holds at most max_size_bytes * evict_ratio
+                 ):
+        assert max_size_bytes > 0, "max_size_bytes must be a positive number"
+        assert 0 < evict_ratio <= 1, "evict_ratio must be in (0, 1]"
+
+        self.path = path
+        self.max_size_bytes = max_size_bytes
+        self.evict_ratio = evict_ratio
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS translations ("
+                           "key TEXT PRIMARY KEY, "
+                           "translation TEXT NOT NULL, "
+                           "size INTEGER NOT NULL, "
+                           "last_used INTEGER NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS translations_last_used ON translations (last_used)")
+        self._conn.commit()
+
+        self._size, self._clock = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0), COALESCE(MAX(last_used), 0) FROM translations").fetchone()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return unicodedata.normalize("NFC", text).strip()
+
+    @classmethod
+    def make_key(cls, provider: str, src: str, dest: str, text: str) -> str:
+        payload = "\x1f".join([provider, src, dest, cls.normalize(text)])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @property
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size_bytes": self._size}
+
+    def get_many(self, provider: str, src: str, dest: str, texts: List[str]) -> List[Optional[str]]:
+        '''
+        Return the cached translation of each text, or None for a miss
+        '''
+        keys = [self.make_key(provider, src, dest, text) for text in texts]
+        with self._lock:
+            found = {}
+            # Stay well under SQLite's bound parameter limit
+            for start in range(0, len(keys), 500):
+                sub_keys = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, translation FROM translations WHERE key IN ({','.join('?' * len(sub_keys))})",
+                    sub_keys).fetchall()
+                found.update(rows)
+
+            if found:
+                self._clock += 1
+                self._conn.executemany("UPDATE translations SET last_used = ? WHERE key = ?",
+                                       [(self._clock, key) for key in found])
+                self._conn.commit()
+
+            results = [found.get(key) for key in keys]
+            self.hits += len(keys) - results.count(None)
+            self.misses += results.count(None)
+        METRICS.inc("cache_hits_total", len(keys) - results.count(None))
+        METRICS.inc("cache_misses_total", results.count(None))
+        return results
+
+    def get(self, provider: str, src: str, dest: str, text: str) -> Optional[str]:
+        return self.get_many(provider, src, dest, [text])[0]
+
+    def set_many(self, provider: str, src: str, dest: str, texts: List[str], translations: List[str]) -> None:
+        '''
+        Write through the translations of texts, evicting old entries if the cache grows over max_size_bytes
+        '''
+        assert len(texts) == len(translations), "texts and translations must have the same length"
+        if not texts:
+            return
+
+        with self._lock:
+            self._clock += 1
+            rows = {}
+            for text, translation in zip(texts, translations):
+                key = self.make_key(provider, src, dest, text)
+                rows[key] = (key, translation, len(translation.encode("utf-8")), self._clock)
+            rows = list(rows.values())
+            for key, _, size, _ in rows:
+                previous = self._conn.execute("SELECT size FROM translations WHERE key = ?", (key,)).fetchone()
+                self._size -= previous[0] if previous else 0
+                self._size += size
+            self._conn.executemany("INSERT OR REPLACE INTO translations (key, translation, size, last_used) "
+                                   "VALUES (?, ?, ?, ?)", rows)
+            if self._size > self.max_size_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def set(self, provider: str, src: str, dest: str, text: str, translation: str) -> None:
+        self.set_many(provider, src, dest, [text], [translation])
+
+    def _evict(self) -> None:
+        '''
+        Delete least recently used entries until the cache is under max_size_bytes * evict_ratio, the caller
+        must hold self._lock
+        '''
+        target_size = self.max_size_bytes * self.evict_ratio
+        cursor = self._conn.execute("SELECT key, size FROM translations ORDER BY last_used ASC")
+        evicted_keys = []
+        while self._size > target_size:
+            row = cursor.fetchone()
+            if row is None:
+                break
+            evicted_keys.append((row[0],))
+            self._size -= row[1]
+        cursor.close()
+        self._conn.executemany("DELETE FROM translations WHERE key = ?", evicted_keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM translations")
+            self._conn.commit()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,83 @@
+import json
+import os
+import threading
+
+from typing import List, Dict
+
+
+class CheckpointJournal():
+    '''
+    Append-only JSONL journal of translated examples keyed by qas_id. Every finished chunk is appended and fsync'ed
+    so a crashed run can be resumed by skipping the qas_id already journaled
+    '''
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._truncate_torn_tail()
+
+    def _truncate_torn_tail(self) -> None:
+        '''
+        Drop a partially written last line left by a crash, otherwise the next append would be glued to it
+        '''
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            if end == 0:
+                return
+            f.seek(end - 1)
+            if f.read(1) == b"\n":
+                return
+            # Walk back to the last complete line
+            position = end - 1
+            while position > 0:
+                step = min(4096, position)
+                f.seek(position - step)
+                block = f.read(step)
+                newline = block.rfind(b"\n")
+                if newline != -1:
+                    f.truncate(position - step + newline + 1)
+                    return
+                position -= step
+            f.truncate(0)
+
+    def append(self, examples: List[Dict]) -> None:
+        if not examples:
+            return
+        # dict() also snapshots the dict-like rows of a ColumnarRecords
+        lines = "".join(json.dumps(dict(example), ensure_ascii=False) + "\n" for example in examples)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def load(self) -> Dict:
+        '''
+        Return {qas_id: example} for every journaled example, a torn last line from a crash is ignored
+        '''
+        journaled = {}
+        if not os.path.exists(self.path):
+            return journaled
+        with self._lock:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        example = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    journaled[example["qas_id"]] = example
+        return journaled
+
+    def completed_ids(self) -> set:
+        return set(self.load().keys())
+
+    def reset(self) -> None:
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
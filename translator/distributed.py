@@ -0,0 +1,240 @@
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+from typing import List, Dict, Iterator
+
+from tqdm.auto import tqdm
+
+from .utils import METRICS
+
+
+SHARD_BY = ("hash", "range")
+
+
+def assign_shards(data: List[Dict], num_shards: int, shard_by: str = "hash") -> List[List[Dict]]:
+    '''
+    Partition data into num_shards shards by qas_id. "hash" spreads examples by a stable hash of their qas_id,
+    "range" gives every shard a contiguous qas_id range (qas_id must be numbers). Every worker computes the same
+    partition from the same input, in input order within a shard
+    '''
+    assert num_shards > 0, "num_shards must be a positive number"
+    assert shard_by in SHARD_BY, f"shard_by must be one of {SHARD_BY}"
+
+    shards = [[] for _ in range(num_shards)]
+    if shard_by == "hash":
+        for example in data:
+            # Python's hash() of a str is salted per process, the shard of an example must not depend on the worker
+            digest = hashlib.sha1(str(example["qas_id"]).encode("utf-8")).digest()
+            shards[int.from_bytes(digest[:8], "big") % num_shards].append(example)
+    elif data:
+        low = min(example["qas_id"] for example in data)
+        span = max(example["qas_id"] for example in data) - low + 1
+        for example in data:
+            shards[min(num_shards - 1, int((example["qas_id"] - low) * num_shards // span))].append(example)
+    return shards
+
+
+class LeaseCoordinator():
+    '''
+    Coordinate workers through files in a shared directory (a local disk or a network file system), no service
+    is needed. A worker owns a shard while its lease file exists and was renewed within lease_timeout seconds,
+    the lease is created with O_CREAT | O_EXCL so only one worker can claim a free shard. An expired lease is
+    renamed away before it is claimed again, the rename only succeeds for one worker so a dead worker's shard is
+    reclaimed exactly once. A finished shard gets a .done marker
+    '''
+
+    def __init__(self, directory: str, num_shards: int, lease_timeout: float = 600.0, worker_id: str = None):
+        assert lease_timeout > 0, "lease_timeout must be a positive number"
+
+        self.directory = directory
+        self.num_shards = num_shards
+        self.lease_timeout = lease_timeout
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+        os.makedirs(directory, exist_ok=True)
+
+    def shard_path(self, shard_id: int, suffix: str) -> str:
+        return os.path.join(self.directory, f"shard-{shard_id:05d}{suffix}")
+
+    def is_done(self, shard_id: int) -> bool:
+        return os.path.exists(self.shard_path(shard_id, ".done"))
+
+    def pending(self) -> List[int]:
+        return [shard_id for shard_id in range(self.num_shards) if not self.is_done(shard_id)]
+
+    def _try_create_lease(self, shard_id: int) -> bool:
+        try:
+            fd = os.open(self.shard_path(shard_id, ".lease"), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w") as f:
+            json.dump({"worker_id": self.worker_id, "claimed_at": time.time()}, f)
+        return True
+
+    def _lease_owner(self, shard_id: int) -> str:
+        try:
+            with open(self.shard_path(shard_id, ".lease"), "r") as f:
+                return json.load(f).get("worker_id")
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _is_expired(self, path: str) -> bool:
+        return time.time() - os.path.getmtime(path) > self.lease_timeout
+
+    def _reclaim_if_expired(self, shard_id: int) -> bool:
+        lease_path = self.shard_path(shard_id, ".lease")
+        expired_path = f"{lease_path}.expired-{self.worker_id}"
+        try:
+            if not self._is_expired(lease_path):
+                return False
+        except FileNotFoundError:
+            return True
+        try:
+            # Only one worker can rename the expired lease, the others get FileNotFoundError
+            os.rename(lease_path, expired_path)
+        except FileNotFoundError:
+            return False
+        # Another worker may have reclaimed the shard and created a fresh lease between the check and the rename,
+        # the rename then took its live lease (rename keeps the mtime). Put it back without overwriting a new one
+        if not self._is_expired(expired_path):
+            try:
+                os.link(expired_path, lease_path)
+            except FileExistsError:
+                pass
+            os.remove(expired_path)
+            return False
+        os.remove(expired_path)
+        tqdm.write(f"Worker {self.worker_id} reclaimed the expired lease of shard {shard_id}")
+        METRICS.inc("shard_leases_reclaimed_total")
+        return True
+
+    def claim(self) -> int:
+        '''
+        Claim a pending shard, return its id or None if every pending shard is leased by a live worker
+        '''
+        for shard_id in self.pending():
+            if self._try_create_lease(shard_id) or \
+                    (self._reclaim_if_expired(shard_id) and self._try_create_lease(shard_id)):
+                # The shard may have been finished between pending() and the claim
+                if self.is_done(shard_id):
+                    self.release(shard_id)
+                    continue
+                METRICS.inc("shard_leases_claimed_total")
+                return shard_id
+        return None
+
+    def renew(self, shard_id: int) -> bool:
+        '''
+        Heartbeat, push the expiry of our lease back. Return False if the lease was lost to another worker
+        '''
+        if self._lease_owner(shard_id) != self.worker_id:
+            return False
+        try:
+            os.utime(self.shard_path(shard_id, ".lease"))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def release(self, shard_id: int) -> None:
+        if self._lease_owner(shard_id) == self.worker_id:
+            try:
+                os.remove(self.shard_path(shard_id, ".lease"))
+            except FileNotFoundError:
+                pass
+
+    def complete(self, shard_id: int) -> None:
+        done_path = self.shard_path(shard_id, ".done")
+        with open(f"{done_path}.{self.worker_id}.tmp", "w") as f:
+            json.dump({"worker_id": self.worker_id, "completed_at": time.time()}, f)
+        os.replace(f"{done_path}.{self.worker_id}.tmp", done_path)
+        self.release(shard_id)
+
+    def iter_claims(self, poll_interval: float = 5.0) -> Iterator[int]:
+        '''
+        Yield shards claimed by this worker until every shard is done, waiting for the leases held by other
+        workers to finish or expire
+        '''
+        while self.pending():
+            shard_id = self.claim()
+            if shard_id is None:
+                time.sleep(poll_interval)
+                continue
+            yield shard_id
+
+    def heartbeat(self, shard_id: int, interval: float = None) -> "Heartbeat":
+        return Heartbeat(self, shard_id, interval if interval is not None else self.lease_timeout / 3)
+
+
+class Heartbeat():
+    '''
+    Renew a lease from a daemon thread while the shard is processed, used as a context manager
+    '''
+
+    def __init__(self, coordinator: LeaseCoordinator, shard_id: int, interval: float):
+        self.coordinator = coordinator
+        self.shard_id = shard_id
+        self.interval = interval
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not self.coordinator.renew(self.shard_id):
+                self.lost = True
+                tqdm.write(f"Worker {self.coordinator.worker_id} lost the lease of shard {self.shard_id}")
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        self._thread.join()
+
+
+def write_shard_output(path: str, examples: List[Dict], meta: Dict, worker_id: str = None) -> None:
+    '''
+    Write the translated examples of a shard as JSONL and its filter report next to it, through a temporary file
+    of this worker so a crashed worker never leaves a partial output behind and two workers never write the same
+    temporary file
+    '''
+    tmp_suffix = f"{worker_id or os.getpid()}.tmp"
+    with open(f"{path}.{tmp_suffix}", "w", encoding="utf-8") as f:
+        for example in examples:
+            f.write(json.dumps(dict(example), ensure_ascii=False) + "\n")
+    os.replace(f"{path}.{tmp_suffix}", path)
+    with open(f"{path}.meta.json.{tmp_suffix}", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(f"{path}.meta.json.{tmp_suffix}", f"{path}.meta.json")
+
+
+def merge_shards(directory: str, num_shards: int, sort_by_qas_id: bool = False) -> Dict:
+    '''
+    Read the outputs of every shard of a finished sharded run.
+    Return {"data": examples in shard order (or sorted by qas_id), "code_idx", "fail_idx", "duplicate_idx"}
+    '''
+    coordinator = LeaseCoordinator(directory, num_shards)
+    pending = coordinator.pending()
+    assert not pending, f"Shards {pending} are not finished yet"
+
+    merged = {"data": [], "code_idx": [], "fail_idx": [], "duplicate_idx": []}
+    for shard_id in range(num_shards):
+        output_path = coordinator.shard_path(shard_id, ".jsonl")
+        with open(output_path, "r", encoding="utf-8") as f:
+            merged["data"].extend(json.loads(line) for line in f)
+        with open(f"{output_path}.meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        for key in ("code_idx", "fail_idx", "duplicate_idx"):
+            merged[key].extend(meta.get(key, []))
+
+    if sort_by_qas_id:
+        merged["data"].sort(key=lambda example: example["qas_id"])
+    print(f"Merged {len(merged['data'])} examples from {num_shards} shards")
+    return merged
@@ -1,2 +1,3 @@
 from .code_filter import have_code
-from .fail_translation_filter import have_re_code
\ No newline at end of file
+from .fail_translation_filter import have_re_code, fail_translation_mask
+from .dedup import dedup_examples, duplicate_groups, example_fingerprint, fan_out
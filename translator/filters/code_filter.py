@@ -1,4 +1,5 @@
 import re
+from collections import Counter, defaultdict
 from typing import Tuple, Union, List
 
 # Organize code elements into different categories
@@ -67,48 +68,112 @@ for category in CODE_ELEMENTS.values():
     for elements in category.values():
         ALL_ELEMENTS.update(elements)
 
-def code_likelihood_score(text: str) -> Tuple[int, list]:
-    # Calculate a score based on code-like elements
+CODE_LIKELIHOOD_ELEMENTS = [
+    ';', '{', '}', 'function', 'class', 'var', 'int', 'void', 'public',
+    'import', 'for', 'while', 'elif', 'switch', 'case', 'break',
+    'def', 'return', 'const', 'let', 'async', 'await', 'public', 'private',
+    'protected', 'extends', 'implements', 'new', 'try', 'catch', 'throw',
+    'require', 'import', 'module.exports', 'console.log', 'printf', '#include',
+    'namespace', 'using', 'struct', 'typedef', 'enum', 'interface', 'const',
+    'final', 'abstract', 'static', 'main', 'int', 'float', 'double', 'bool',
+    'true', 'false', 'NULL', 'nil', 'void', 'var', 'let', 'const', 'val',
+    'try', 'catch', 'finally', 'raise', 'lambda', 'self', 'super',
+    'instanceof', 'enum', 'switch', 'case', 'break', 'default', 'console', 'python',
+    'csharp' , 'c', 'js', 'javascript', 'java', 'pytorch', 'php', 'asm', '//', '#', 'writeline', 'readline', '```',
+    'json', 'html', 'css', 'lxml', 'xml', '<', '>', '<html>', '<body>', '<li>', '</html>', '</body>', '</ul>', '<ul>', '</li>',
+    '[', ']', '<text>', '</', '<source>', '</source>' , '</text>', 'sql', 'select', 'from' , 'table', 'union', 'group' ,
+    'string', '()', 'Hello, world!', 'C# code', 'python code', 'import re', 'object', 'ABC', 'Ruby', 'regex', 'println'
+]
+
+
+def _is_word_char(char: str) -> bool:
+    # Same definition as the re module's \w for str patterns
+    return char.isalnum() or char == '_'
+
+
+def _is_boundary(text: str, position: int) -> bool:
+    # Same definition as the re module's \b
+    before = position > 0 and _is_word_char(text[position - 1])
+    after = position < len(text) and _is_word_char(text[position])
+    return before != after
+
+
+# The matcher is built once at import time. Elements made only of word characters can only match a whole word,
+# so one alternation finds all of them in a single scan. The remaining (symbol) elements may overlap each other,
+# so a single lookahead scan finds the candidate positions and each symbol element starting there is checked
+# with the exact \b semantics of re.finditer(rf'\b{re.escape(element)}\b', text), including its non-overlapping
+# matches. Duplicated elements in CODE_LIKELIHOOD_ELEMENTS keep counting once per occurrence
+_ELEMENT_COUNTS = Counter(element.lower() for element in CODE_LIKELIHOOD_ELEMENTS)
+_WORD_ELEMENTS = {element for element in _ELEMENT_COUNTS if all(_is_word_char(char) for char in element)}
+_SYMBOL_ELEMENTS = [element for element in _ELEMENT_COUNTS if element not in _WORD_ELEMENTS]
+_SYMBOL_ELEMENTS_BY_FIRST_CHAR = defaultdict(list)
+for _element in _SYMBOL_ELEMENTS:
+    _SYMBOL_ELEMENTS_BY_FIRST_CHAR[_element[0]].append(_element)
+
+_WORD_PATTERN = re.compile(r'\b(?:' + '|'.join(re.escape(element) for element in
+                                                sorted(_WORD_ELEMENTS, key=len, reverse=True)) + r')\b')
+_SYMBOL_CANDIDATE_PATTERN = re.compile(r'(?=\b(?:' + '|'.join(re.escape(element) for element in
+                                                              sorted(_SYMBOL_ELEMENTS, key=len, reverse=True)) + r')\b)')
+
+
+def _element_counts(text: str, stop_at: int = None) -> Tuple[Counter, int]:
+    '''
+    Count the matches of every unique element in an already lowercased text, stop as soon as the weighted score
+    reaches stop_at
+    '''
+    counts = Counter()
     score = 0
-    code_elements = [
-        ';', '{', '}', 'function', 'class', 'var', 'int', 'void', 'public',
-        'import', 'for', 'while', 'elif', 'switch', 'case', 'break',
-        'def', 'return', 'const', 'let', 'async', 'await', 'public', 'private',
-        'protected', 'extends', 'implements', 'new', 'try', 'catch', 'throw',
-        'require', 'import', 'module.exports', 'console.log', 'printf', '#include',
-        'namespace', 'using', 'struct', 'typedef', 'enum', 'interface', 'const',
-        'final', 'abstract', 'static', 'main', 'int', 'float', 'double', 'bool',
-        'true', 'false', 'NULL', 'nil', 'void', 'var', 'let', 'const', 'val',
-        'try', 'catch', 'finally', 'raise', 'lambda', 'self', 'super',
-        'instanceof', 'enum', 'switch', 'case', 'break', 'default', 'console', 'python',
-        'csharp' , 'c', 'js', 'javascript', 'java', 'pytorch', 'php', 'asm', '//', '#', 'writeline', 'readline', '```',
-        'json', 'html', 'css', 'lxml', 'xml', '<', '>', '<html>', '<body>', '<li>', '</html>', '</body>', '</ul>', '<ul>', '</li>',
-        '[', ']', '<text>', '</', '<source>', '</source>' , '</text>', 'sql', 'select', 'from' , 'table', 'union', 'group' ,
-        'string', '()', 'Hello, world!', 'C# code', 'python code', 'import re', 'object', 'ABC', 'Ruby', 'regex', 'println'
-    ]
+    for match in _WORD_PATTERN.finditer(text):
+        element = match.group()
+        counts[element] += 1
+        score += _ELEMENT_COUNTS[element]
+        if stop_at is not None and score >= stop_at:
+            return counts, score
+
+    last_end = {}
+    for match in _SYMBOL_CANDIDATE_PATTERN.finditer(text):
+        position = match.start()
+        for element in _SYMBOL_ELEMENTS_BY_FIRST_CHAR[text[position]]:
+            end = position + len(element)
+            if position < last_end.get(element, 0) or not text.startswith(element, position):
+                continue
+            if not (_is_boundary(text, position) and _is_boundary(text, end)):
+                continue
+            last_end[element] = end
+            counts[element] += 1
+            score += _ELEMENT_COUNTS[element]
+            if stop_at is not None and score >= stop_at:
+                return counts, score
+    return counts, score
+
+
+def code_likelihood_score(text: str, stop_at: int = None) -> Tuple[int, list]:
+    # Calculate a score based on code-like elements
     text = text.lower()  # Convert the text to lowercase for case-insensitive comparison
+    counts, score = _element_counts(text, stop_at=stop_at)
+    # Same order as matching each element of CODE_LIKELIHOOD_ELEMENTS one by one
     found_elements = []
-    for element in code_elements:
-        element = element.lower()  # Convert elements to lowercase for case-insensitive comparison
-        matches = re.finditer(rf'\b{re.escape(element)}\b', text)
-        found_elements.extend([match.group() for match in matches])
-    score += len(found_elements) # / (len(text.split(" ")) * 0.1)
-
-    return score, found_elements
+    for element in CODE_LIKELIHOOD_ELEMENTS:
+        found_elements.extend([element.lower()] * counts[element.lower()])
+    return score, found_elements  # / (len(text.split(" ")) * 0.1)
 
 
-def have_code(text: Union[str, List[str]], threshold: int=8) -> Tuple[bool, int, list]:
+def have_code(text: Union[str, List[str]], threshold: int=8, early_exit: bool = False) -> Tuple[bool, int, list]:
     # threshold = len(text.split(" ")) * threshold
+    # With early_exit the scan stops once threshold is reached, the returned score and elements are then partial
     if isinstance(text, list):
         threshold *= 2
         score = 0
         found_elements = []
         for str_text in text:
-            sub_score, found_sub_elements = code_likelihood_score(str_text)
+            sub_score, found_sub_elements = code_likelihood_score(str_text,
+                                                                  stop_at=threshold - score if early_exit else None)
             score += sub_score
             found_elements += found_sub_elements
+            if early_exit and score >= threshold:
+                break
     else:
-        score, found_elements = code_likelihood_score(text)
+        score, found_elements = code_likelihood_score(text, stop_at=threshold if early_exit else None)
 
     if score >= threshold:
         return True, score, found_elements
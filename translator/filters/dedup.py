@@ -0,0 +1,162 @@
+import hashlib
+import re
+import unicodedata
+
+from copy import deepcopy
+from typing import Dict, List, Tuple
+
+
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def normalize_text(text: str) -> str:
+    '''
+    NFC normalize, collapse whitespace runs and strip, two texts equal after this translate the same
+    '''
+    return _WHITESPACE_PATTERN.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def _field_texts(example: Dict, target_fields: List[str]) -> List[str]:
+    texts = []
+    for key in target_fields:
+        value = example.get(key)
+        if isinstance(value, list):
+            texts.append("\x1e".join(normalize_text(item) for item in value if isinstance(item, str)))
+        elif isinstance(value, str):
+            texts.append(normalize_text(value))
+        else:
+            texts.append("")
+    return texts
+
+
+def example_fingerprint(example: Dict, target_fields: List[str]) -> str:
+    '''
+    Hash of the normalized target fields of an example, equal for exact duplicates
+    '''
+    # The separators keep ("ab", "") and ("a", "b") apart, and a list apart from a string
+    key = "\x1f".join(_field_texts(example, target_fields))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+class MinHasher():
+    '''
+    MinHash signatures over word shingles, the fraction of equal signature slots estimates the Jaccard
+    similarity of two texts
+    '''
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 3, seed: int = 1):
+        import numpy as np
+
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        generator = np.random.RandomState(seed)
+        self._a = generator.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._np = np
+
+    def signature(self, text: str):
+        np = self._np
+        words = text.lower().split()
+        shingles = {" ".join(words[idx:idx + self.shingle_size])
+                    for idx in range(max(1, len(words) - self.shingle_size + 1))}
+        hashes = np.fromiter((int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little")
+                              for shingle in shingles), dtype=np.uint64, count=len(shingles))
+        # The multiplication is allowed to wrap around, it is a hash
+        permuted = ((hashes[:, None] * self._a + self._b) % _MERSENNE_PRIME) & _MAX_HASH
+        return permuted.min(axis=0)
+
+
+def _find(parents: List[int], idx: int) -> int:
+    while parents[idx] != idx:
+        parents[idx] = parents[parents[idx]]
+        idx = parents[idx]
+    return idx
+
+
+def _union(parents: List[int], idx: int, other_idx: int) -> None:
+    root, other_root = _find(parents, idx), _find(parents, other_idx)
+    # The earliest example stays the root, so it is the representative of its group
+    if root != other_root:
+        parents[max(root, other_root)] = min(root, other_root)
+
+
+def duplicate_groups(data: List[Dict],
+                     target_fields: List[str],
+                     near_dedup: bool = False,
+                     threshold: float = 0.85,  # Minimum estimated Jaccard similarity of near duplicates
+                     num_perm: int = 128,
+                     bands: int = 16) -> List[int]:
+    '''
+    Return the position of the representative of every example: exact duplicates of the normalized target fields
+    share one and, with near_dedup, so do examples whose MinHash similarity is at least threshold (candidates are
+    found with LSH over bands of the signature). The representative is the earliest example of its group
+    '''
+    assert num_perm % bands == 0, "num_perm must be a multiple of bands"
+
+    parents = list(range(len(data)))
+    first_of_fingerprint = {}
+    for idx, example in enumerate(data):
+        first_idx = first_of_fingerprint.setdefault(example_fingerprint(example, target_fields), idx)
+        if first_idx != idx:
+            _union(parents, first_idx, idx)
+
+    if near_dedup:
+        hasher = MinHasher(num_perm=num_perm)
+        rows = num_perm // bands
+        # Only the first example of each exact group needs a signature
+        unique_idx = sorted(set(first_of_fingerprint.values()))
+        signatures = {idx: hasher.signature("\x1f".join(_field_texts(data[idx], target_fields))) for idx in unique_idx}
+        buckets = {}
+        for idx in unique_idx:
+            signature = signatures[idx]
+            for band in range(bands):
+                bucket = buckets.setdefault((band, signature[band * rows:(band + 1) * rows].tobytes()), [])
+                for candidate_idx in bucket:
+                    # Compare with the representative of the candidate's group rather than the candidate itself,
+                    # so a chain of slightly different examples does not collapse into one group
+                    root = _find(parents, candidate_idx)
+                    if _find(parents, idx) == idx and (signatures[root] == signature).mean() >= threshold:
+                        _union(parents, root, idx)
+                bucket.append(idx)
+
+    return [_find(parents, idx) for idx in range(len(data))]
+
+
+def dedup_examples(data: List[Dict],
+                   target_fields: List[str],
+                   near_dedup: bool = False,
+                   threshold: float = 0.85) -> Tuple[List[Dict], Dict]:
+    '''
+    Keep one representative per group of duplicates.
+    Return the representatives in input order and {member qas_id: representative qas_id} of the dropped examples
+    '''
+    representatives = duplicate_groups(data, target_fields, near_dedup=near_dedup, threshold=threshold)
+    representative_of = {data[idx]["qas_id"]: data[representative_idx]["qas_id"]
+                         for idx, representative_idx in enumerate(representatives) if representative_idx != idx}
+    return [example for idx, example in enumerate(data) if representatives[idx] == idx], representative_of
+
+
+def fan_out(translated: List[Dict], data: List[Dict], representative_of: Dict, target_fields: List[str]) -> List[Dict]:
+    '''
+    Copy the translated target fields of every representative to the members of its group, the members keep their
+    own qas_id and other fields. Return the examples in the order of data, a member whose representative is not in
+    translated is left out
+    '''
+    translated_by_id = {example["qas_id"]: example for example in translated}
+    fanned_out = []
+    for example in data:
+        qas_id = example["qas_id"]
+        translated_example = translated_by_id.get(representative_of.get(qas_id, qas_id))
+        if translated_example is None:
+            continue
+        if qas_id not in representative_of:
+            fanned_out.append(translated_example)
+            continue
+        # A columnar row is written in place, its translated fields go to the preallocated columns
+        member = dict(example) if isinstance(example, dict) else example
+        for key in target_fields:
+            member[key] = deepcopy(translated_example[key])
+        fanned_out.append(member)
+    return fanned_out
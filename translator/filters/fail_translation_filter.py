@@ -13,6 +13,28 @@ def have_re_code(text: Union[str, List[str]], code: str="P1OP1_F") -> bool:
     return is_found
 
 
+def fail_translation_mask(table, target_fields: List[str], code: str="P1OP1_F"):
+    '''
+    Columnar have_re_code over a pyarrow Table: one match_substring kernel call per column (list of strings columns
+    are flattened and mapped back to their rows with list_parent_indices).
+    Return a boolean numpy array, True for the rows where any target field contains code
+    '''
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    mask = np.zeros(table.num_rows, dtype=bool)
+    for key in target_fields:
+        column = table.column(key)
+        if pa.types.is_list(column.type) or pa.types.is_large_list(column.type):
+            hits = pc.fill_null(pc.match_substring(pc.list_flatten(column), code), False)
+            # Parent indices of a chunked column are global row indices
+            mask[pc.filter(pc.list_parent_indices(column), hits).to_numpy()] = True
+        elif pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+            mask |= pc.fill_null(pc.match_substring(column, code), False).to_numpy()
+    return mask
+
+
 if __name__ == "__main__":
     code_text =[\
     '''
@@ -1,18 +1,21 @@
-import math
 import re
-import sys
-sys.path.insert(0, r'./')
-from copy import deepcopy
-
 import threading
-import warnings
 
-from typing import List, Dict, Union
+from typing import List, Dict, Union, Tuple
 from tqdm.auto import tqdm
 
 from concurrent.futures import ThreadPoolExecutor
 
-from .utils import timeit
+from .utils import METRICS
+from .utils.metrics import SIZE_BUCKETS
+from .batcher import RequestBatcher
+from .utils.scheduler import run_with_retries
+from .utils.planner import plan_chunks
+from .providers.pool import ProviderPool
+
+METRICS.set_buckets("batch_items", SIZE_BUCKETS)
+METRICS.set_buckets("sub_task_sub_lists", SIZE_BUCKETS)
+
 
 class TranslateThread():
 
@@ -22,10 +25,28 @@ class TranslateThread():
                     enable_sub_task_thread: bool = True,  # Enable splitting a large list into sublist if a list of one example is too large to process
                                                        # This argument go with max_list_length_per_thread
                     max_example_per_thread: int = 400,  # How many examples, each thread can contain
-                    large_chunks_threshold: int = 20000,  # Maximum number of examples that will be distributed evenly across threads, any examples exceed this threshold will be process in queue
+                    large_chunks_threshold: int = 20000,  # Maximum number of examples in flight at once, the pool runs large_chunks_threshold // max_example_per_thread threads
                     max_list_length_per_thread: int = 3,  # Maximum number of strings contain in a list in a single thread.
                                             # if larger, split the list into sub-list and process in parallel
+                    sub_task_items_threshold: int = 64,  # A list field with more strings than this is split into sub-lists
+                    sub_task_chars_threshold: int = 20000,  # A list field with more characters than this is split into sub-lists
+                    max_sub_task_threads: int = 16,  # Size of the thread pool shared by the sub-lists of every chunk
+                    enable_batching: bool = True,  # Pack the strings of many examples and fields into a few provider calls
+                    max_batch_chars: int = 4500,  # Maximum number of characters in a single batched provider call
+                    max_batch_items: int = 100,  # Maximum number of strings in a single batched provider call
                     translator = None,
+                    cache = None,  # Optional TranslationCache shared by every thread
+                    journal = None,  # Optional CheckpointJournal, every finished chunk is appended to it
+                    rate_limiter = None,  # Optional RateLimiter shared by every provider instance
+                    provider_pool = None,  # Optional ProviderPool of translator instances, one is created if None
+                    executor = None,  # Optional ThreadPoolExecutor for the chunks shared with other runs, one is created per call if None
+                    sub_task_executor = None,  # Optional ThreadPoolExecutor for the sub-lists shared with other runs
+                    num_providers: int = None,  # Maximum number of pooled provider instances, a request leases one
+                                                # exclusively so it defaults to one per chunk and sub-task thread
+                    max_retries: int = 3,  # How many times a failed chunk is retried before it goes to failed_examples
+                    balance_chunks: bool = True,  # Balance chunks by character count instead of a fixed number of examples
+                    segment_granularity: str = None,  # Translate and cache "sentence" or "paragraph" segments (opt-in),
+                                                     # None to only split strings longer than 15000 characters
                     source_lang: str = "en",
                     target_lang: str = "te",
                     fail_translation_code: str="P1OP1_F"  # Fail code for *expected* fail translation and can be removed
@@ -49,12 +70,40 @@ class TranslateThread():
         self.enable_sub_task_thread = enable_sub_task_thread
         if self.enable_sub_task_thread:
                 self.max_list_length_per_thread = max_list_length_per_thread
+        self.sub_task_items_threshold = sub_task_items_threshold
+        self.sub_task_chars_threshold = sub_task_chars_threshold
+        self.max_sub_task_threads = max_sub_task_threads
+        # Created on first use and shared by every chunk, so a giant example does not spawn its own executor
+        self._sub_task_executor = sub_task_executor
+        self._owns_sub_task_executor = sub_task_executor is None
+        self._sub_task_lock = threading.Lock()
+        self.executor = executor
+
+        self.enable_batching = enable_batching
+        self.max_batch_chars = max_batch_chars
+        self.max_batch_items = max_batch_items
+
+        self.cache = cache
+        self.journal = journal
+        self.rate_limiter = rate_limiter
+        # Provider instances are reused across chunks, sub-lists and retries so their connections stay alive. A
+        # smaller pool than the number of threads would leave threads waiting for a lease
+        if num_providers is None:
+            num_providers = max(1, large_chunks_threshold // max_example_per_thread) + max_sub_task_threads
+        self.provider_pool = provider_pool if provider_pool is not None else \
+            ProviderPool(translator, max_size=num_providers, rate_limiter=rate_limiter)
+        self._owns_provider_pool = provider_pool is None
+        self.max_retries = max_retries
+        self.balance_chunks = balance_chunks
+        self.segment_granularity = segment_granularity
 
         self.converted_data_translated = None
+        # Examples of chunks that still failed after max_retries (dead-letter list)
+        self.failed_examples = []
         
     @property
-    def get_translator(self):
-        return deepcopy(self.translator)()
+    def provider_name(self) -> str:
+        return getattr(self.translator, "__name__", type(self.translator).__name__)
     
     @staticmethod
     def split_list(input_list: List[str], max_sub_length: int) -> List[list]:
@@ -63,169 +112,193 @@ class TranslateThread():
 
     def __translate_per_key(self, example: Dict, translator=None, progress_idx: int = 0) -> Dict:
         '''
-        This function loop through each key of one example and send to __translate_texts if the value of the key is
-        under a certain threshold. If exceeded, then send to __sublist_multithread_translate
+        This function loop through each key of one example and send the segments of the value of the key to
+        __translate_segments in a single request. Large list fields are sent to __sublist_multithread_translate
         '''
         keys = self.target_config
         for key in keys:
             if example[key] == "":
                 continue
-            if key in self.target_fields:
-                if isinstance(example[key], str):
-                    if len(example[key]) > 15000:
-                        warnings.warn("Example " + str(example["qas_id"]) + " have field len larger than 15000")
-                        example[key] = self.__split_and_translate_large_text(example[key], translator)
-                    else:
-                        example[key] = self.__translate_texts(src_texts=[example[key]], translator=translator)[0]
-                elif isinstance(example[key], list):
-                    for idx, data in enumerate(example[key]):
-                        if len(data) > 15000:
-                            warnings.warn("Example " + str(example["qas_id"]) + " have field len larger than 15000")
-                            example[key][idx] = self.__split_and_translate_large_text(data, translator)
-                    example[key] = self.__translate_texts(src_texts=example[key], translator=translator)
+            if key in self.target_fields and self.__is_large_list(example[key]):
+                example[key] = self.__sublist_multithread_translate(example[key], progress_idx, key)
+            elif key in self.target_fields and isinstance(example[key], (str, list)):
+                batcher = self.__new_batcher()
+                batcher.add_example(example, [key])
+                if len(batcher):
+                    batcher.scatter(self.__translate_segments(batcher.texts, translator))
         return example
 
-    def __split_and_translate_large_text(self, text: str, translator):
-        '''
-        This function splits a long string into smaller chunks by sentences and translates each chunk separately.
-        '''
-        # Define a regular expression pattern to split text into sentences
-        sentence_pattern = r'(?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=\.|\?)\s'
-
-        # Split the text into sentences using the pattern
-        sentences = re.split(sentence_pattern, text)
-
-        # Initialize variables for chunk creation
-        chunk_size = 15000
-        current_chunk = ''
-        chunks = []
-
-        # Construct chunks by adding sentences until reaching the chunk size
-        for sentence in sentences:
-            if len(current_chunk) + len(sentence) + 2 <= chunk_size:  # +2 for " ."
-                if current_chunk:
-                    current_chunk += ". " + sentence
-                else:
-                    current_chunk = sentence
-            else:
-                chunks.append(current_chunk)
-                current_chunk = sentence
-
-        # Add the remaining chunk if any
-        if current_chunk:
-            chunks.append(current_chunk)
+    def __new_batcher(self) -> RequestBatcher:
+        return RequestBatcher(max_batch_chars=self.max_batch_chars,
+                              max_batch_items=self.max_batch_items,
+                              segment_granularity=self.segment_granularity)
 
-        # Translate each chunk separately
-        translated_chunks = self.__translate_texts(src_texts=chunks, translator=translator)
+    def __new_sub_list_batcher(self, list_str: List[str], field_name: str) -> RequestBatcher:
+        batcher = RequestBatcher(max_batch_chars=self.max_batch_chars,
+                                 max_batch_items=self.max_batch_items if self.enable_batching
+                                 else self.max_list_length_per_thread,
+                                 segment_granularity=self.segment_granularity)
+        batcher.add_example({field_name: list_str}, [field_name])
+        return batcher
 
-        # Join translated chunks into a single string with " . " between them
-        return ". ".join(translated_chunks)
+    def __translate_segments(self, segments: List[str], translator=None) -> List[str]:
+        '''
+        Translate segments in one request, one unavoidable failure should not fail the others so the failed
+        segments are retried on their own. The segments that still fail are not cached, a later run only pays for them
+        '''
+        translated_segments = self.__translate_texts(src_texts=segments, translator=translator)
+        if len(segments) > 1:
+            for position, text in enumerate(translated_segments):
+                if self.fail_translation_code in text:
+                    METRICS.inc("segment_retries_total")
+                    translated_segments[position] = self.__translate_texts(src_texts=[segments[position]],
+                                                                           translator=translator)[0]
+        return translated_segments
+
+    def __translate_batched(self, examples: List[Dict], translator=None, desc: str = None) -> List[Dict]:
+        '''
+        This function collects every target segment of all examples, translates them in batches under the
+        max_batch_chars/max_batch_items budget and writes the results back to their original example and key
+        '''
+        batcher = self.__new_batcher()
+        keys = [key for key in self.target_config if key in self.target_fields]
+        large_fields = []
+        for example in examples:
+            # Large list fields (e.g long dialogs) are translated in parallel on the shared sub-task pool instead of
+            # holding up the batches of the whole chunk
+            large_keys = [key for key in keys if self.__is_large_list(example[key])]
+            large_fields += [(example, key) for key in large_keys]
+            batcher.add_example(example, [key for key in keys if key not in large_keys])
+
+        translated_large_fields = [self.__sublist_multithread_translate(example[key], desc, key)
+                                   for example, key in large_fields]
+
+        translations = [None] * len(batcher)
+        for batch in tqdm(list(batcher.batches()), desc=desc, colour="#add8e6"):
+            METRICS.observe("batch_items", len(batch))
+            translated_batch = self.__translate_segments([batcher.texts[idx] for idx in batch], translator)
+            for idx, text in zip(batch, translated_batch):
+                translations[idx] = text
+
+        # Scatter only once every batch succeeded, so a retried chunk always starts from the source texts
+        batcher.scatter(translations)
+        for (example, key), translated_list in zip(large_fields, translated_large_fields):
+            example[key] = translated_list
+        return examples
 
+    @property
+    def sub_task_executor(self) -> ThreadPoolExecutor:
+        with self._sub_task_lock:
+            if self._sub_task_executor is None:
+                self._sub_task_executor = ThreadPoolExecutor(max_workers=self.max_sub_task_threads,
+                                                             thread_name_prefix="sub_task")
+            return self._sub_task_executor
+
+    def __is_large_list(self, value) -> bool:
+        if not self.enable_sub_task_thread or not isinstance(value, list) \
+                or len(value) <= self.max_list_length_per_thread:
+            return False
+        return len(value) > self.sub_task_items_threshold or \
+            sum(len(item) for item in value if isinstance(item, str)) > self.sub_task_chars_threshold
 
     def __sublist_multithread_translate(self,
                                        list_str: List[str],
-                                       progress_idx: int = 0,
+                                       progress_idx: Union[int, str] = 0,
                                        field_name: str=None # The field name (key name) of one example that exceed a certain threshold and needed to be split and translate in parallel
                                        ) -> List[str]:
         '''
-        This function split a large list into sub-list and translate it in parallel, orders are maintained when merge all
-        sub-lists, this is useful when order are necessary (e.g Dialogs example)
+        This function split a large list into sub-lists (under the batch budget when batching is enabled, of at most
+        max_list_length_per_thread segments otherwise) and translate them in parallel on the shared sub-task pool,
+        orders are maintained when merge all sub-lists,
+        this is useful when order are necessary (e.g Dialogs example). Return the translated list, list_str is
+        not modified
         '''
-
-        translated_list_data = []
-        num_threads = len(list_str) / self.max_list_length_per_thread
-        sub_str_lists = self.split_list(list_str, max_sub_length=self.max_list_length_per_thread)
-        with ThreadPoolExecutor(max_workers=num_threads) as executor:
-            futures = []
-            finished_task = 0
-            lock = threading.RLock()
-
-            def callback_sub_list_done(future):
-                nonlocal translated_list_data
-                nonlocal finished_task
-                nonlocal lock
-                if not future.exception():
-                    with lock:
-                        # This need to be .append to keep the list structure
-                        # Since this deal with sub-list and needed to be merged later
-                        translated_list_data.append(future.result())
-                        finished_task += 1
-                else:
-                    tqdm.write(f"Sub task of chunk {progress_idx} with field {field_name} failed with the following error: {future.exception()}."
-                               f"Restarting thread when others finished...")
-                pass
-
-            for idx, list_chunk in enumerate(sub_str_lists):
-                # Assign each thread with a new Translator instance
-                future_chunk = executor.submit(self.__translate_texts,
-                                               src_texts=list_chunk,
-                                               translator=self.get_translator,
-                                               sub_list_idx=idx)
-                future_chunk.add_done_callback(callback_sub_list_done)
-                future_dict = {
-                    "future": future_chunk,
-                    "idx": idx
-                }
-                futures.append(future_dict)
-
-            # Wait for all threads to complete
-            while finished_task < len(futures):
-                for future_dict in futures:
-                    # If exception occurs in one of the thread, restart the thread with its specific chunk
-                    if future_dict['future'].exception():
-                        tqdm.write(
-                            f"Thread {future_dict['idx']} failed, restarting thread with chunk {future_dict['idx']}")
-                        backup_future_chunk = executor.submit(self.__translate_texts,
-                                                              src_texts=sub_str_lists[future_dict['idx']],
-                                                              translator=self.get_translator,
-                                                              sub_list_idx=future_dict['idx'])
-                        backup_future_chunk.add_done_callback(callback_sub_list_done)
-                        backup_future_dict = {"future": backup_future_chunk,
-                                              "idx": future_dict['idx']}
-                        futures[future_dict['idx']] = backup_future_dict
-                        continue
-
-            # Sorting the list of dictionaries based on the 'key' value
-            translated_list_data = sorted(translated_list_data, key=lambda x: x['key'])
-            # Extracting values after sorting
-            translated_list_data = [item['text_list'] for item in translated_list_data]
-
-            def flatten_list(nested_list):
-                '''
-                Turn a list from [[], [], []] -> []
-                '''
-
-                flattened_list = []
-                for item in nested_list:
-                    if isinstance(item, list):
-                        flattened_list.extend(flatten_list(item))
-                    else:
-                        flattened_list.append(item)
-                return flattened_list
-
-            translated_list_data = flatten_list(translated_list_data)
-
-            return translated_list_data
+        translated_list = list(list_str)
+        batcher = self.__new_sub_list_batcher(translated_list, field_name)
+        sub_lists = list(batcher.batches())
+        METRICS.inc("sub_task_lists_total")
+        METRICS.observe("sub_task_sub_lists", len(sub_lists))
+
+        # Each sub-list writes into the slots of its segments so the order is kept without sorting
+        translations = [None] * len(batcher)
+
+        def callback_sub_list_done(idx, result):
+            for segment_id, text in zip(sub_lists[idx], result):
+                translations[segment_id] = text
+
+        def translate_sub_list(sub_list):
+            # The provider instance is leased from the pool for the request only
+            return self.__translate_segments([batcher.texts[segment_id] for segment_id in sub_list])
+
+        # Bounding the in-flight sub-lists keeps one giant example from queueing ahead of every other chunk
+        dead_letter = run_with_retries(self.sub_task_executor, translate_sub_list, sub_lists,
+                                       max_retries=self.max_retries,
+                                       max_in_flight=self.max_sub_task_threads,
+                                       on_result=callback_sub_list_done,
+                                       desc=f"Sub task of {progress_idx} with field {field_name}",
+                                       task="sub_task")
+        if dead_letter:
+            raise dead_letter[0]["error"]
+
+        batcher.scatter(translations)
+        return translated_list
+
+    def close(self) -> None:
+        '''
+        Shut down the shared sub-task pool and close the pooled provider instances, the ones passed in are left to
+        their owner
+        '''
+        with self._sub_task_lock:
+            if self._sub_task_executor is not None and self._owns_sub_task_executor:
+                self._sub_task_executor.shutdown(wait=True)
+                self._sub_task_executor = None
+        if self._owns_provider_pool:
+            self.provider_pool.close()
 
     def __translate_texts(self,
                           src_texts: Union[List[str], str],
                           translator = None,
-                          sub_list_idx: int=None, # sub_list_idx is for pass through of index information and can be merge later by __sublist_multithread_translate
-                          ) -> Union[List[str], str, Dict[List[str], int]]:
+                          ) -> Union[List[str], str]:
         '''
         Actual place where translation take place
         '''
 
         # assert self.do_translate, "Please enable translate via self.do_translate"
-        # This if is for multithread Translator instance
-        translator_instance = deepcopy(self.translator)() if not translator else translator
-
-        target_texts = translator_instance.translate(src_texts,
+        is_str = isinstance(src_texts, str)
+        texts = [src_texts] if is_str else src_texts
+
+        # Look up the cache first and only send the misses to the provider
+        cached_texts = self.cache.get_many(self.provider_name, self.source_lang, self.target_lang, texts) \
+            if self.cache is not None and texts else [None] * len(texts)
+        miss_idx = [idx for idx, text in enumerate(cached_texts) if text is None]
+
+        target_texts = list(cached_texts)
+        if miss_idx:
+            def translate_misses(translator_instance):
+                return translator_instance.translate([texts[idx] for idx in miss_idx],
                                                      src=self.source_lang,
                                                      dest=self.target_lang,
                                                      fail_translation_code=self.fail_translation_code)
 
-        return {'text_list': target_texts, 'key': sub_list_idx} if sub_list_idx is not None else target_texts
+            if translator is not None:
+                translated_misses = translate_misses(translator)
+            else:
+                # Borrow a pooled instance for this request only, so its connections are reused by the next one
+                with self.provider_pool.lease() as translator_instance:
+                    translated_misses = translate_misses(translator_instance)
+            for idx, text in zip(miss_idx, translated_misses):
+                target_texts[idx] = text
+
+            if self.cache is not None:
+                # Never cache an unavoidable failure, so it gets another chance on the next run
+                succeeded_idx = [idx for idx in miss_idx if self.fail_translation_code not in target_texts[idx]]
+                self.cache.set_many(self.provider_name, self.source_lang, self.target_lang,
+                                    [texts[idx] for idx in succeeded_idx],
+                                    [target_texts[idx] for idx in succeeded_idx])
+
+        target_texts = target_texts[0] if is_str else target_texts
+
+        return target_texts
 
     def translate_converted(self,
                             converted_data = None, # The converted data that need to be translated
@@ -235,117 +308,151 @@ class TranslateThread():
                             large_chunk: List[str] = None) -> Union[None, List[str]]:
         '''
         This function support translation in multithread for large dataset
-        (Does not maintain order for the final dataset)
+        (The order of the input data is maintained in the final dataset)
+        en_data is a single chunk translated on the calling thread and returned, converted_data (or the legacy
+        large_chunk) is planned into chunks and the result is stored in self.converted_data_translated
         '''
 
         assert converted_data is not None or en_data is not None or large_chunk is not None, \
             "No data to translate, please provide converted_data or en_data or large_chunk" 
 
-        if not en_data and not large_chunk:
-            converted_data = converted_data
-        elif not en_data:
-            converted_data = large_chunk
+        if en_data is not None:
+            return self.__translate_chunk(en_data, translator=translator, desc=desc)
+
+        converted_data = converted_data if converted_data is not None else large_chunk
+        # All chunks of the whole dataset are pulled from one shared queue by a single persistent pool, so there is
+        # no idle gap while a block drains. large_chunks_threshold bounds how many examples are in flight at once.
+        # A single chunk goes through the same pool so it is retried too
+        chunk_indices, max_in_flight = self.__chunk_plan(converted_data)
+        is_single_chunk = len(chunk_indices) == 1
+        if not is_single_chunk:
+            # Balanced chunks are sized by load, so their example counts differ
+            chunk_sizes = [len(indices) for indices in chunk_indices]
+            tqdm.write(f"Data too large, splitting data into {len(chunk_indices)} chunk of {min(chunk_sizes)} to"
+                       f" {max(chunk_sizes)} examples (mean {len(converted_data) / len(chunk_indices):.1f})."
+                       f" Processing with {max_in_flight} threads...")
+
+        # Progress bar
+        progress_bar = tqdm(total=len(chunk_indices), desc="Translating total converted data", disable=is_single_chunk)
+
+        # Each translated example is written back into the slot of its input position so the output keeps
+        # the input order without a final sort
+        translated_slots = [None] * len(converted_data)
+
+        def callback_done(idx, result):
+            for example_idx, example in zip(chunk_indices[idx], result):
+                translated_slots[example_idx] = example
+            progress_bar.update(1)
+
+        def translate_chunk(idx):
+            # Chunks are only materialized once they are picked up, provider instances are leased per request
+            chunk = [converted_data[example_idx] for example_idx in chunk_indices[idx]]
+            if is_single_chunk:
+                return self.__translate_chunk(chunk, translator=translator, desc=desc)
+            return self.__translate_chunk(chunk, desc=f"chunk {idx}")
+
+        executor = self.executor if self.executor is not None else ThreadPoolExecutor(max_workers=max_in_flight)
+        try:
+            dead_letter = run_with_retries(executor, translate_chunk, list(range(len(chunk_indices))),
+                                           max_retries=self.max_retries,
+                                           max_in_flight=max_in_flight,
+                                           on_result=callback_done,
+                                           desc="Chunk",
+                                           task="chunk")
+        finally:
+            if executor is not self.executor:
+                executor.shutdown(wait=True)
+        progress_bar.close()
+        for failed in dead_letter:
+            self.failed_examples += [converted_data[example_idx] for example_idx in chunk_indices[failed["idx"]]]
+
+        self.converted_data_translated = [example for example in translated_slots if example is not None]
+        return None
+
+    def __chunk_plan(self, converted_data: List[Dict]) -> Tuple[List[List[int]], int]:
+        '''
+        Return the example indices of each chunk and how many chunks are translated at once
+        '''
+        if len(converted_data) <= self.max_example_per_thread:
+            # A single chunk needs a single thread
+            return [list(range(len(converted_data)))], 1
+        if self.balance_chunks:
+            # Balance chunks by characters so one chunk of long examples does not hold up the whole job
+            chunk_indices = plan_chunks(converted_data, self.target_fields, self.max_example_per_thread)
         else:
-            converted_data = en_data
+            chunk_indices = self.split_list(list(range(len(converted_data))),
+                                            max_sub_length=self.max_example_per_thread)
+        max_in_flight = min(len(chunk_indices), max(1, self.large_chunks_threshold // self.max_example_per_thread))
+        return chunk_indices, max_in_flight
 
+    def __plan_chunk(self, chunk: List[Dict]) -> Dict:
+        '''
+        The provider requests __translate_chunk would send for chunk, as the number of characters of each request.
+        "requests" are sent one after the other, the requests of each list in "sub_lists" are sent in parallel on the
+        sub-task pool. Retries of failed segments are not counted
+        '''
+        keys = [key for key in self.target_config if key in self.target_fields]
+        requests, sub_lists = [], []
+        batcher = self.__new_batcher()
+        for example in chunk:
+            for key in keys:
+                if self.__is_large_list(example[key]):
+                    sub_list_batcher = self.__new_sub_list_batcher(example[key], key)
+                    sub_lists.append([sum(len(sub_list_batcher.texts[idx]) for idx in batch)
+                                      for batch in sub_list_batcher.batches()])
+                elif self.enable_batching:
+                    batcher.add_example(example, [key])
+                elif example[key] != "" and isinstance(example[key], (str, list)):
+                    # Every field is sent in a single request on the per-key path
+                    field_batcher = self.__new_batcher()
+                    field_batcher.add_example(example, [key])
+                    if len(field_batcher):
+                        requests.append(sum(len(text) for text in field_batcher.texts))
+        requests += [sum(len(batcher.texts[idx]) for idx in batch) for batch in batcher.batches()]
+        return {"examples": len(chunk), "requests": requests, "sub_lists": sub_lists}
+
+    def plan_requests(self, converted_data: List[Dict]) -> Dict:
+        '''
+        Dry run of translate_converted: plan the chunks and the provider requests of each one without translating,
+        no provider instance is created. Return {"chunks": [per chunk plan, in scheduling order], "max_in_flight"}
+        '''
+        chunk_indices, max_in_flight = self.__chunk_plan(converted_data)
+        # Every request leases a provider instance, a pool smaller than the chunk threads caps the chunks in flight
+        if self.provider_pool.max_size is not None:
+            max_in_flight = min(max_in_flight, self.provider_pool.max_size)
+        chunks = [self.__plan_chunk([converted_data[example_idx] for example_idx in indices])
+                  for indices in chunk_indices if indices]
+        return {"chunks": chunks, "max_in_flight": max_in_flight}
+
+    def __translate_chunk(self, chunk: List[Dict], translator=None, desc: str = None) -> List[Dict]:
+        '''
+        Translate one chunk of examples on the calling thread
+        '''
         translated_data = []
-
-        # Split large data into large chunks, recursive feed to the same function
-        if len(converted_data) > self.large_chunks_threshold and large_chunk is None:
-            num_large_chunks = len(converted_data) / self.large_chunks_threshold
-            large_chunks = self.split_list(converted_data, max_sub_length=self.large_chunks_threshold)
-            tqdm.write(
-                f"Data is way too large, spliting data into {num_large_chunks} large chunk for sequential translation")
-
-            for idx, large_chunk in enumerate(tqdm(large_chunks, desc=f"Translating large chunk ", colour="red")):
-                tqdm.write(f"Processing large chunk No: {idx}")
-                self.translate_converted(large_chunk=large_chunk)
-            return None
-
-        # Split large chunk into large example, recursive feed to the same function via multithread
-        if len(converted_data) > self.max_example_per_thread and en_data is None:
-            num_threads = len(converted_data) / self.max_example_per_thread
-            chunks = self.split_list(converted_data, max_sub_length=self.max_example_per_thread)
-            tqdm.write(f"Data too large, splitting data into {num_threads} chunk, each chunk is {len(chunks[0])}"
-                       f" Processing with multithread...")
-
-            # Progress bar
-            desc = "Translating total converted large chunk data" if large_chunk else "Translating total converted data"
-            progress_bar = tqdm(total=math.ceil(num_threads), desc=desc, position=math.ceil(num_threads)+1)
-
-            with ThreadPoolExecutor(max_workers=num_threads) as executor:
-                futures = []
-                finished_task = 0
-                # https://stackoverflow.com/questions/22885775/what-is-the-difference-between-lock-and-rlock#22885810
-                lock = threading.RLock()
-
-                def callback_done(future):
-                    nonlocal translated_data
-                    nonlocal finished_task
-                    nonlocal progress_bar
-                    nonlocal lock
-                    if not future.exception():
-                        with lock:
-                            # This need to be += or .extend to shallow flatten the list structure
-                            translated_data += future.result()
-                            finished_task += 1
-                            progress_bar.update(1)
-                    else:
-                        tqdm.write(f"Task failed with the following error: {future.exception()}."
-                                   f" Restarting thread when others finished")
-                        pass
-
-                for idx, chunk in enumerate(chunks):
-                    # Assign each thread with a new Translator instance
-                    future_chunk = executor.submit(self.translate_converted,
-                                                   en_data=chunk,
-                                                   desc=f"chunk {idx}",
-                                                   translator=self.get_translator)
-                    future_chunk.add_done_callback(callback_done)
-                    future_dict = {"future": future_chunk,
-                                   "idx": idx}
-                    futures.append(future_dict)
-
-                # Wait for all threads to complete
-                while finished_task < len(futures):
-                    for future_dict in futures:
-                        # If exception occurs in one of the thread, restart the thread with its specific chunk
-                        if future_dict['future'].exception():
-                            tqdm.write(
-                                f"Thread {future_dict['idx']} failed, restarting thread with chunk {future_dict['idx']}")
-                            backup_future_chunk = executor.submit(self.translate_converted,
-                                                                  en_data=chunks[future_dict['idx']],
-                                                                  desc=f"Backup chunk {future_dict['idx']}",
-                                                                  translator=self.get_translator)
-                            backup_future_chunk.add_done_callback(callback_done)
-                            backup_future_dict = {"future": backup_future_chunk,
-                                                  "idx": future_dict['idx']}
-                            futures[future_dict['idx']] = backup_future_dict
-                            continue
-
-            if large_chunk:
-                if not self.converted_data_translated:
-                    self.converted_data_translated = translated_data
-                else:
-                    self.converted_data_translated += translated_data
-                return None
-
-            self.converted_data_translated = translated_data
-            return None
-
         progress_bar_desc = "Translating converted data" if not desc else f"Translating converted data {desc}"
-        for example in tqdm(converted_data, desc=progress_bar_desc, colour="#add8e6"):
-            translated_data_example = self.__translate_per_key(example,
-                                                               translator,
-                                                               progress_idx=int(re.findall(r'\d+', desc)[0]) if desc and re.findall(r'\d+', desc) else 0)
-            translated_data.append(translated_data_example)
-        if en_data: return translated_data
-        if large_chunk:
-            # Assuming that the previous large chunk process already create self.converted_data_translated
-            # This cover the case where last large chunk only contain a single thread
-            self.converted_data_translated += translated_data
-        else:
-            self.converted_data_translated = translated_data
+        with METRICS.timer("chunk_seconds"):
+            if self.enable_batching:
+                translated_data = self.__translate_batched(chunk, translator, desc=progress_bar_desc)
+            else:
+                # Each example is translated as a copy and written back once the whole chunk succeeded, so a retried
+                # chunk always starts from the source texts
+                keys = [key for key in self.target_config if key in self.target_fields]
+                translated_copies = []
+                for example in tqdm(chunk, desc=progress_bar_desc, colour="#add8e6"):
+                    example_copy = {key: list(example[key]) if isinstance(example[key], list) else example[key]
+                                    for key in self.target_config}
+                    translated_data_example = self.__translate_per_key(example_copy,
+                                                                       translator,
+                                                                       progress_idx=int(re.findall(r'\d+', desc)[0]) if desc and re.findall(r'\d+', desc) else 0)
+                    translated_copies.append(translated_data_example)
+                for example, translated_data_example in zip(chunk, translated_copies):
+                    example.update({key: translated_data_example[key] for key in keys})
+                    translated_data.append(example)
+        METRICS.inc("examples_translated_total", len(translated_data))
+        if self.journal is not None:
+            # Flush the finished chunk so a crashed run can resume from here
+            self.journal.append(translated_data)
+        return translated_data
 
 
 
@@ -1,28 +1,71 @@
 from .mainengine import TranslateThread
-from .providers import Provider, GoogleProvider
-from typing import List, Dict, Union
-from .utils import timeit, have_internet
-from httpcore._exceptions import ConnectTimeout
+from .asyncengine import AsyncTranslateEngine
+from .cache import TranslationCache
+from .checkpoint import CheckpointJournal
+from .records import ColumnarRecords
+from .distributed import assign_shards, LeaseCoordinator, write_shard_output
+from .streaming import iter_chunks, ParquetShardWriter
+from .providers import RateLimiter, AdaptiveConcurrencyController, ProviderPool
+import heapq
+import math
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from itertools import repeat
+from typing import List, Dict, Union, Iterable, Iterator
+from .utils import timeit, METRICS, example_size
 from tqdm.auto import tqdm
-from datasets import Dataset
-from .filters import have_code, have_re_code
+from .filters import have_code, have_re_code, fail_translation_mask, dedup_examples, fan_out
 from copy import deepcopy
 
-if not have_internet(timeout=5):
-    raise ConnectTimeout("Please provide internet connection as this script require external api calls")
+
+def is_code_example(example: Dict, target_fields: List[str]) -> bool:
+    for key in target_fields:
+        contain_code, score, found_elements = have_code(example[key], early_exit=True)
+        if contain_code:
+            return True
+    return False
+
+
+def is_failed_example(example: Dict, target_fields: List[str], fail_translation_code: str = "P1OP1_F") -> bool:
+    for key in target_fields:
+        if have_re_code(example[key], code=fail_translation_code):
+            return True
+    return False
+
+
+# Module level so they can be pickled to ProcessPoolExecutor workers. They have no side effects (e.g metrics), a
+# worker process's counters would be lost, the flags are counted by the parent
+def _code_flags_of_shard(shard: Iterable[Dict], target_fields: List[str]) -> List[bool]:
+    return [is_code_example(example, target_fields) for example in shard]
+
+
+def _fail_flags_of_shard(shard: Iterable[Dict], target_fields: List[str], fail_translation_code: str) -> List[bool]:
+    return [is_failed_example(example, target_fields, fail_translation_code) for example in shard]
 
 
 class TranslateModule:
-    def __init__(self, provider = GoogleProvider):
+    def __init__(self, provider = None):
+        if provider is None:
+            # Imported here so importing translator does not pull in googletrans
+            from .providers import GoogleProvider
+            provider = GoogleProvider
         self.provider = provider
         
         self.code_idx = []
         self.fail_idx = []
+        self.duplicate_idx = []
+        self.fail_idx_by_lang = {}
         self.fail_translation_code : str="P1OP1_F"
+        self.cache = None
 
     def reset(self):
         self.code_idx = []
         self.fail_idx = []
+        self.duplicate_idx = []
+        self.fail_idx_by_lang = {}
 
     # def read(self, dataset_split):
         
@@ -51,73 +94,780 @@ class TranslateModule:
         all_fields,        
         target_fields: List[str],
         source_lang: str = "en",
-        target_lang: str = "te",
+        target_lang: Union[str, List[str]] = "te",
         enable_sub_task_thread: bool = True,
         do_not_translate_code = False,
         max_example_per_thread = 400,
         large_chunks_threshold = 20_000,
-        max_list_length_per_thread = 3,):
+        max_list_length_per_thread = 3,
+        max_sub_task_threads: int = 16,
+        enable_batching: bool = True,
+        max_batch_chars: int = 4500,
+        max_batch_items: int = 100,
+        use_async: bool = False,
+        max_concurrency: int = 64,
+        num_providers: int = None,
+        max_retries: int = 3,
+        cache_path: str = None,
+        cache_max_size_bytes: int = 2 * 1024 ** 3,
+        checkpoint_path: str = None,
+        resume: bool = False,
+        requests_per_second: float = None,
+        chars_per_second: float = None,
+        adaptive_concurrency: bool = False,
+        num_proc: int = None,
+        balance_chunks: bool = True,
+        dedup: bool = False,
+        near_dedup: bool = False,
+        near_dedup_threshold: float = 0.85,
+        segment_granularity: str = None,
+        columnar: bool = False,
+        rate_limiter: RateLimiter = None,
+        provider_pool: ProviderPool = None,
+        executor: ThreadPoolExecutor = None,
+        sub_task_executor: ThreadPoolExecutor = None,):
+
+        if not isinstance(target_lang, str):
+            return self.convert_multilingual(data, all_fields, target_fields,
+                                             target_langs = list(target_lang),
+                                             source_lang = source_lang,
+                                             enable_sub_task_thread = enable_sub_task_thread,
+                                             do_not_translate_code = do_not_translate_code,
+                                             max_example_per_thread = max_example_per_thread,
+                                             large_chunks_threshold = large_chunks_threshold,
+                                             max_list_length_per_thread = max_list_length_per_thread,
+                                             max_sub_task_threads = max_sub_task_threads,
+                                             enable_batching = enable_batching,
+                                             max_batch_chars = max_batch_chars,
+                                             max_batch_items = max_batch_items,
+                                             use_async = use_async,
+                                             max_concurrency = max_concurrency,
+                                             num_providers = num_providers,
+                                             max_retries = max_retries,
+                                             cache_path = cache_path,
+                                             cache_max_size_bytes = cache_max_size_bytes,
+                                             checkpoint_path = checkpoint_path,
+                                             resume = resume,
+                                             requests_per_second = requests_per_second,
+                                             chars_per_second = chars_per_second,
+                                             adaptive_concurrency = adaptive_concurrency,
+                                             num_proc = num_proc,
+                                             balance_chunks = balance_chunks,
+                                             dedup = dedup,
+                                             near_dedup = near_dedup,
+                                             near_dedup_threshold = near_dedup_threshold,
+                                             segment_granularity = segment_granularity,
+                                             columnar = columnar,
+                                             rate_limiter = rate_limiter,
+                                             provider_pool = provider_pool,
+                                             executor = executor,
+                                             sub_task_executor = sub_task_executor,)
 
         # data, all_fields = self.read(dataset_split)
         self.reset()
         target_fields = target_fields
 
-        data = self.pre_translate_validate(data, target_fields, do_not_translate_code)
+        records = None
+        if columnar:
+            # Examples become two-slot views over shared columns, the translations go to preallocated columns and
+            # a ColumnarRecords is returned instead of a list of dicts
+            records = ColumnarRecords.from_data(data if isinstance(data, list) or hasattr(data, "column_names")
+                                                else list(data), all_fields, writable_fields=target_fields)
+            data = records.rows()
 
-        thread = TranslateThread(
-            all_fields = all_fields,
-            target_fields = target_fields,
-            source_lang = source_lang,
-            target_lang = target_lang,
-            enable_sub_task_thread = enable_sub_task_thread,
-            max_example_per_thread = max_example_per_thread,
-            large_chunks_threshold = large_chunks_threshold,
-            max_list_length_per_thread = max_list_length_per_thread,
-            translator = self.provider,)
+        data = self.pre_translate_validate(data, target_fields, do_not_translate_code, num_proc=num_proc)
+
+        representative_of = {}
+        if dedup or near_dedup:
+            # Translate one representative per group of duplicates, its result is fanned out after translation
+            deduplicated_data, representative_of = self.dedup(data, target_fields, near_dedup=near_dedup,
+                                                              threshold=near_dedup_threshold)
+            validated_data, data = data, deduplicated_data
+
+        if cache_path and (self.cache is None or self.cache.path != cache_path):
+            self.cache = TranslationCache(cache_path, max_size_bytes=cache_max_size_bytes)
+        elif not cache_path:
+            self.cache = None
+
+        journal = CheckpointJournal(checkpoint_path) if checkpoint_path else None
+        journaled = {}
+        if journal is not None:
+            if resume:
+                journaled = journal.load()
+                # Keep the validated order so the resumed examples can be merged back in place
+                validated_ids = [example["qas_id"] for example in data]
+                if records is not None:
+                    # Journaled translations are written into their rows so the result stays columnar
+                    rows_by_id = {example["qas_id"]: example for example in data}
+                    for qas_id, example in list(journaled.items()):
+                        if qas_id in rows_by_id:
+                            rows_by_id[qas_id].update({key: example[key] for key in target_fields})
+                            journaled[qas_id] = rows_by_id[qas_id]
+                data = [example for example in data if example["qas_id"] not in journaled]
+                print(f"Resuming from checkpoint: {len(journaled)} examples already translated, {len(data)} left")
+            else:
+                journal.reset()
+
+        # A rate limiter passed in is shared with other runs (e.g the other languages of convert_multilingual)
+        rate_limiter = rate_limiter or self.build_rate_limiter(requests_per_second, chars_per_second,
+                                                               adaptive_concurrency, max_concurrency=max_concurrency)
 
-        thread.translate_converted(converted_data = data)
-        data = thread.converted_data_translated
+        translate_start_time = time.perf_counter()
+        if use_async:
+            engine = AsyncTranslateEngine(
+                all_fields = all_fields,
+                target_fields = target_fields,
+                source_lang = source_lang,
+                target_lang = target_lang,
+                max_concurrency = max_concurrency,
+                num_providers = num_providers,
+                max_retries = max_retries,
+                translator = self.provider,
+                cache = self.cache,
+                journal = journal,
+                rate_limiter = rate_limiter,
+                executor = executor,
+                max_batch_chars = max_batch_chars,
+                max_batch_items = max_batch_items,
+                segment_granularity = segment_granularity,
+                fail_translation_code = self.fail_translation_code,)
+            engine.translate_converted(converted_data = data)
+            self.fail_idx += [example["qas_id"] for example in engine.failed_examples]
+            data = engine.converted_data_translated
+        else:
+            thread = TranslateThread(
+                all_fields = all_fields,
+                target_fields = target_fields,
+                source_lang = source_lang,
+                target_lang = target_lang,
+                enable_sub_task_thread = enable_sub_task_thread,
+                max_example_per_thread = max_example_per_thread,
+                large_chunks_threshold = large_chunks_threshold,
+                max_list_length_per_thread = max_list_length_per_thread,
+                max_sub_task_threads = max_sub_task_threads,
+                balance_chunks = balance_chunks,
+                enable_batching = enable_batching,
+                max_batch_chars = max_batch_chars,
+                max_batch_items = max_batch_items,
+                segment_granularity = segment_granularity,
+                translator = self.provider,
+                cache = self.cache,
+                journal = journal,
+                rate_limiter = rate_limiter,
+                num_providers = num_providers,
+                max_retries = max_retries,
+                provider_pool = provider_pool,
+                executor = executor,
+                sub_task_executor = sub_task_executor,)
+
+            thread.translate_converted(converted_data = data)
+            thread.close()
+            self.fail_idx += [example["qas_id"] for example in thread.failed_examples]
+            data = thread.converted_data_translated
+
+        METRICS.observe("stage_seconds", time.perf_counter() - translate_start_time, stage="translate")
+
+        if journaled:
+            translated = {example["qas_id"]: example for example in data}
+            data = [translated[qas_id] if qas_id in translated else journaled[qas_id]
+                    for qas_id in validated_ids if qas_id in translated or qas_id in journaled]
+
+        if representative_of:
+            failed_ids = set(self.fail_idx)
+            self.fail_idx += [qas_id for qas_id, representative_id in representative_of.items()
+                              if representative_id in failed_ids]
+            data = fan_out(data, validated_data, representative_of, target_fields)
 
         print(f"Total data translated: {len(data)}")
+        if self.cache is not None:
+            print(f"Translation cache: {self.cache.stats}")
+
+        data = self.post_translate_validate(data, target_fields, num_proc=num_proc)
+        return records.select(data) if records is not None else data
+
+
+    def convert_multilingual(self,
+        data,
+        all_fields,
+        target_fields: List[str],
+        target_langs: List[str],
+        do_not_translate_code = False,
+        num_proc: int = None,
+        dedup: bool = False,
+        near_dedup: bool = False,
+        near_dedup_threshold: float = 0.85,
+        cache_path: str = None,
+        cache_max_size_bytes: int = 2 * 1024 ** 3,
+        checkpoint_path: str = None,
+        requests_per_second: float = None,
+        chars_per_second: float = None,
+        adaptive_concurrency: bool = False,
+        use_async: bool = False,
+        max_concurrency: int = 64,
+        max_example_per_thread = 400,
+        large_chunks_threshold = 20_000,
+        max_sub_task_threads: int = 16,
+        num_providers: int = None,
+        rate_limiter: RateLimiter = None,
+        provider_pool: ProviderPool = None,
+        executor: ThreadPoolExecutor = None,
+        sub_task_executor: ThreadPoolExecutor = None,
+        **kwargs) -> Dict[str, List[Dict]]:
+        '''
+        Translate data into every language of target_langs in a single pass: the code filter and deduplication run
+        once, then the languages are translated concurrently on one rate limiter, translation cache, provider pool and
+        set of thread pools, sized for every language at once (num_providers defaults to one provider instance per
+        thread of the shared pools).
+        The remaining keyword arguments are passed to convert. Return {target_lang: translated data}, the failed
+        qas_id of each language are in self.fail_idx_by_lang. checkpoint_path gets the language before its extension
+        '''
+        assert target_langs, "target_langs must contain at least one language"
+        assert len(set(target_langs)) == len(target_langs), "target_langs must not contain duplicates"
+
+        self.reset()
+        data = self.pre_translate_validate(data, target_fields, do_not_translate_code, num_proc=num_proc)
+
+        representative_of = {}
+        validated_data = data
+        if dedup or near_dedup:
+            data, representative_of = self.dedup(data, target_fields, near_dedup=near_dedup,
+                                                 threshold=near_dedup_threshold)
+
+        if cache_path and (self.cache is None or self.cache.path != cache_path):
+            self.cache = TranslationCache(cache_path, max_size_bytes=cache_max_size_bytes)
+        elif not cache_path:
+            self.cache = None
+        # One budget and one backoff for every language, they all spend the same provider quota
+        rate_limiter = rate_limiter or self.build_rate_limiter(requests_per_second, chars_per_second,
+                                                               adaptive_concurrency, max_concurrency=max_concurrency)
+
+        # The languages run in parallel, so the shared pools get the threads of one run per language. The pools
+        # passed in are left to their owner
+        max_workers = (max_concurrency if use_async else max(1, large_chunks_threshold // max_example_per_thread)) \
+            * len(target_langs)
+        max_sub_task_workers = max_sub_task_threads * len(target_langs)
+        owned_executors = []
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="translate")
+            owned_executors.append(executor)
+        if sub_task_executor is None and not use_async:
+            sub_task_executor = ThreadPoolExecutor(max_workers=max_sub_task_workers, thread_name_prefix="sub_task")
+            owned_executors.append(sub_task_executor)
+        owns_provider_pool = provider_pool is None and not use_async
+        if owns_provider_pool:
+            # A request leases an instance exclusively, every thread of the shared pools may hold one
+            provider_pool = ProviderPool(self.provider,
+                                         max_size=num_providers if num_providers is not None
+                                         else max_workers + max_sub_task_workers,
+                                         rate_limiter=rate_limiter)
+
+        def translate_language(target_lang):
+            # A module per language keeps the fail_idx of each language apart, everything else is shared
+            module = TranslateModule(provider=self.provider)
+            module.cache = self.cache
+            module.fail_translation_code = self.fail_translation_code
+            if checkpoint_path:
+                root, extension = os.path.splitext(checkpoint_path)
+                language_checkpoint_path = f"{root}.{target_lang}{extension}"
+            else:
+                language_checkpoint_path = None
+            # The data was filtered and deduplicated above. The engines write the translations into the examples, so
+            # each language gets its own copy of the target fields, the other fields are shared. A columnar run
+            # never writes into its source
+            language_data = data if kwargs.get("columnar") else \
+                [dict(example, **{key: list(example[key]) if isinstance(example[key], list) else example[key]
+                                  for key in target_fields}) for example in data]
+            translated = module.convert(language_data, all_fields, target_fields,
+                                        target_lang=target_lang,
+                                        do_not_translate_code=False,
+                                        num_proc=num_proc,
+                                        cache_path=cache_path,
+                                        cache_max_size_bytes=cache_max_size_bytes,
+                                        checkpoint_path=language_checkpoint_path,
+                                        use_async=use_async,
+                                        max_concurrency=max_concurrency,
+                                        max_example_per_thread=max_example_per_thread,
+                                        large_chunks_threshold=large_chunks_threshold,
+                                        max_sub_task_threads=max_sub_task_threads,
+                                        num_providers=num_providers,
+                                        rate_limiter=rate_limiter,
+                                        provider_pool=provider_pool,
+                                        executor=executor,
+                                        sub_task_executor=sub_task_executor,
+                                        **kwargs)
+            fail_idx = list(module.fail_idx)
+            if representative_of:
+                failed_ids = set(fail_idx)
+                fail_idx += [qas_id for qas_id, representative_id in representative_of.items()
+                             if representative_id in failed_ids]
+                is_columnar = isinstance(translated, ColumnarRecords)
+                translated = fan_out(list(translated), validated_data, representative_of, target_fields)
+                if is_columnar:
+                    # The members come back as dicts next to the rows of their representative, store them as columns
+                    translated = ColumnarRecords.from_data(translated, all_fields)
+            return translated, fail_idx
+
+        # These threads only wait on their language's chunks, the translation runs on the shared pools
+        try:
+            with ThreadPoolExecutor(max_workers=len(target_langs)) as language_executor:
+                results = dict(zip(target_langs, language_executor.map(translate_language, target_langs)))
+        finally:
+            for owned_executor in owned_executors:
+                owned_executor.shutdown(wait=True)
+            if owns_provider_pool:
+                provider_pool.close()
+
+        self.fail_idx_by_lang = {target_lang: fail_idx for target_lang, (_, fail_idx) in results.items()}
+        self.fail_idx = list(dict.fromkeys(qas_id for fail_idx in self.fail_idx_by_lang.values() for qas_id in fail_idx))
+        for target_lang, (translated, _) in results.items():
+            print(f"Total data translated to {target_lang}: {len(translated)}")
+        return {target_lang: translated for target_lang, (translated, _) in results.items()}
+
+    def plan(self,
+        data,
+        all_fields,
+        target_fields: List[str],
+        target_lang: Union[str, List[str]] = "te",
+        enable_sub_task_thread: bool = True,
+        do_not_translate_code = False,
+        max_example_per_thread = 400,
+        large_chunks_threshold = 20_000,
+        max_list_length_per_thread = 3,
+        max_sub_task_threads: int = 16,
+        enable_batching: bool = True,
+        max_batch_chars: int = 4500,
+        max_batch_items: int = 100,
+        use_async: bool = False,
+        max_concurrency: int = 64,
+        num_providers: int = None,
+        requests_per_second: float = None,
+        chars_per_second: float = None,
+        num_proc: int = None,
+        balance_chunks: bool = True,
+        dedup: bool = False,
+        near_dedup: bool = False,
+        near_dedup_threshold: float = 0.85,
+        segment_granularity: str = None,
+        request_latency: float = 1.0,  # Expected seconds per provider request, e.g from provider_request_seconds
+        cost_per_million_chars: float = None,
+        top_k: int = 5,
+        **kwargs) -> Dict:
+        '''
+        Dry run of convert with the same arguments: run the pre-filters, deduplication, chunking and segmentation
+        and estimate the provider requests, the characters sent and the wall time, without any network call or
+        provider instance. Arguments of convert that do not change the plan (e.g cache_path) are accepted and
+        ignored, the estimate assumes an empty cache and no failed requests.
+        The wall time is the longest of the schedule of the requests at request_latency seconds each over the
+        engine's concurrency and of the time the requests_per_second/chars_per_second limits allow.
+        Return the plan as a dict, a summary is printed
+        '''
+        self.reset()
+        target_langs = [target_lang] if isinstance(target_lang, str) else list(target_lang)
+        data = data if isinstance(data, list) else list(data)
+        num_input = len(data)
+        data = self.pre_translate_validate(data, target_fields, do_not_translate_code, num_proc=num_proc)
+        num_validated = len(data)
+        if dedup or near_dedup:
+            data, _ = self.dedup(data, target_fields, near_dedup=near_dedup, threshold=near_dedup_threshold)
+
+        # The engines are only asked for their plan, their providers are never created
+        if use_async:
+            engine = AsyncTranslateEngine(
+                all_fields = all_fields,
+                target_fields = target_fields,
+                max_concurrency = max_concurrency,
+                num_providers = num_providers,
+                translator = self.provider,
+                max_batch_chars = max_batch_chars,
+                max_batch_items = max_batch_items,
+                segment_granularity = segment_granularity,)
+            engine_plan = engine.plan_requests(data)
+            requests = engine_plan["requests"]
+            num_chunks = 1
+            # Every request waits for a free slot, an example's requests are sent concurrently
+            schedule_seconds = max(math.ceil(len(requests) / engine_plan["max_in_flight"]) * request_latency,
+                                   request_latency if requests else 0.0)
+        else:
+            thread = TranslateThread(
+                all_fields = all_fields,
+                target_fields = target_fields,
+                enable_sub_task_thread = enable_sub_task_thread,
+                max_example_per_thread = max_example_per_thread,
+                large_chunks_threshold = large_chunks_threshold,
+                max_list_length_per_thread = max_list_length_per_thread,
+                max_sub_task_threads = max_sub_task_threads,
+                balance_chunks = balance_chunks,
+                enable_batching = enable_batching,
+                max_batch_chars = max_batch_chars,
+                max_batch_items = max_batch_items,
+                segment_granularity = segment_granularity,
+                # The languages of a multilingual run share the num_providers instances
+                num_providers = num_providers if num_providers is None
+                else max(1, num_providers // len(target_langs)),
+                translator = self.provider,)
+            engine_plan = thread.plan_requests(data)
+            thread.close()
+            chunks = engine_plan["chunks"]
+            num_chunks = len(chunks)
+            requests = [size for chunk in chunks for size in chunk["requests"]] + \
+                [size for chunk in chunks for sub_list in chunk["sub_lists"] for size in sub_list]
+
+            # Chunks are picked up in order by the first free thread, the batches of a chunk are sent one after the
+            # other and each large list waits for its sub-lists, which share the sub-task pool
+            thread_free_at = [0.0] * engine_plan["max_in_flight"]
+            for chunk in chunks:
+                chunk_seconds = request_latency * (len(chunk["requests"]) +
+                                                   sum(math.ceil(len(sub_list) / max_sub_task_threads)
+                                                       for sub_list in chunk["sub_lists"]))
+                heapq.heappush(thread_free_at, heapq.heappop(thread_free_at) + chunk_seconds)
+            num_sub_list_requests = sum(len(sub_list) for chunk in chunks for sub_list in chunk["sub_lists"])
+            schedule_seconds = max(max(thread_free_at),
+                                   math.ceil(num_sub_list_requests / max_sub_task_threads) * request_latency)
 
-        data = self.post_translate_validate(data, target_fields)
-        return data
+        # The languages of a multilingual run are translated concurrently and share the rate limits
+        num_requests = len(requests) * len(target_langs)
+        num_chars = sum(requests) * len(target_langs)
+        rate_limit_seconds = max(num_requests / requests_per_second if requests_per_second else 0.0,
+                                 num_chars / chars_per_second if chars_per_second else 0.0)
+        projected_seconds = max(schedule_seconds, rate_limit_seconds)
 
+        source_sizes = [example_size(example, target_fields) for example in data]
+        largest = heapq.nlargest(top_k, zip(source_sizes, range(len(data))))
+        long_strings = sum(1 for example in data for key in target_fields
+                           for text in (example[key] if isinstance(example[key], list) else [example[key]])
+                           if isinstance(text, str) and len(text) > 15000)
+
+        plan = {
+            "examples": num_input,
+            "examples_after_filter": num_validated,
+            "examples_to_translate": len(data),
+            "code_idx": list(self.code_idx),
+            "duplicate_idx": list(self.duplicate_idx),
+            "target_langs": target_langs,
+            "chunks": num_chunks,
+            "max_in_flight": engine_plan["max_in_flight"],
+            "requests": num_requests,
+            "characters": num_chars,
+            "largest_request_chars": max(requests, default=0),
+            "strings_over_15000_chars": long_strings,
+            "largest_examples": [{"qas_id": data[idx]["qas_id"], "characters": size} for size, idx in largest],
+            "schedule_seconds": schedule_seconds,
+            "rate_limit_seconds": rate_limit_seconds,
+            "projected_seconds": projected_seconds,
+            "cost": num_chars / 1e6 * cost_per_million_chars if cost_per_million_chars is not None else None,
+        }
+
+        print(f"Plan: {plan['examples_to_translate']} of {num_input} examples to translate into"
+              f" {', '.join(target_langs)} in {num_chunks} chunk(s), {plan['max_in_flight']} in flight")
+        print(f"Plan: {num_requests} provider requests, {num_chars} characters,"
+              f" {long_strings} strings over 15000 characters split by the segmenter")
+        print(f"Plan: projected wall time {projected_seconds:.1f}s (schedule {schedule_seconds:.1f}s at"
+              f" {request_latency}s per request, rate limits {rate_limit_seconds:.1f}s)"
+              + (f", cost {plan['cost']:.2f}" if plan["cost"] is not None else ""))
+        print(f"Plan: largest examples {plan['largest_examples']}")
+        return plan
+
+    @staticmethod
+    def build_rate_limiter(requests_per_second: float = None,
+                           chars_per_second: float = None,
+                           adaptive_concurrency: bool = False,
+                           max_concurrency: int = 64) -> RateLimiter:
+        '''
+        Without any limit the RateLimiter still retries throttling and server errors with backoff, so every entry
+        point recovers from a transient provider error the same way
+        '''
+        concurrency_controller = AdaptiveConcurrencyController(initial_limit=min(8, max_concurrency),
+                                                               max_limit=max_concurrency) \
+            if adaptive_concurrency else None
+        return RateLimiter(requests_per_second=requests_per_second,
+                           chars_per_second=chars_per_second,
+                           concurrency_controller=concurrency_controller)
+
+    def _is_code_example(self, example: Dict, target_fields: List[str]) -> bool:
+        return is_code_example(example, target_fields)
+
+    def _is_failed_example(self, example: Dict, target_fields: List[str]) -> bool:
+        return is_failed_example(example, target_fields, self.fail_translation_code)
+
+    @staticmethod
+    def _flags_with_process_pool(fn, data: List[Dict], num_proc: int, *args) -> List[bool]:
+        '''
+        Compute fn(shard, *args) over contiguous shards of data on a ProcessPoolExecutor, the per-example flags are
+        merged back in input order so the result does not depend on scheduling.
+        The workers are spawned, not forked: a fork copies locks held by the other threads of this process (e.g the
+        metrics registry while other languages translate) and a worker touching one would deadlock. Like any spawned
+        pool, a script using num_proc needs the if __name__ == "__main__" guard
+        '''
+        # A few shards per process keeps the workers busy when some shards are slower than others
+        shard_size = max(1, math.ceil(len(data) / (num_proc * 4)))
+        shards = TranslateThread.split_list(data, max_sub_length=shard_size)
+        with ProcessPoolExecutor(max_workers=num_proc, mp_context=multiprocessing.get_context("spawn")) as executor:
+            shard_flags = executor.map(fn, shards, *(repeat(arg, len(shards)) for arg in args))
+            return [flag for flags in shard_flags for flag in flags]
 
     @timeit
-    def pre_translate_validate(self, data, target_fields, do_not_translate_code) -> None:
+    def pre_translate_validate(self, data, target_fields, do_not_translate_code, num_proc: int = None) -> None:
+        data = data if isinstance(data, list) else list(data)
+        if not target_fields:
+            code_flags = None
+        elif not do_not_translate_code:
+            code_flags = [False] * len(data)
+        elif num_proc and num_proc > 1 and len(data) > num_proc:
+            code_flags = self._flags_with_process_pool(_code_flags_of_shard, data, num_proc, target_fields)
+        else:
+            code_flags = _code_flags_of_shard(tqdm(data, desc="Validating data for translation:"), target_fields)
+
         validated_translate_data = []
-        for idx, example in enumerate(tqdm(data, desc="Validating data for translation:")):
-            for key in target_fields:
-                if do_not_translate_code:
-                    contain_code, score, found_elements = have_code(example[key])
-                    if contain_code:
-                        self.code_idx.append(example["qas_id"])
-                        break
-                    elif key == target_fields[-1]:
-                        validated_translate_data.append(example)
-                else:
-                    if key == target_fields[-1]: validated_translate_data.append(example)
+        for example, contain_code in zip(data, code_flags or []):
+            if contain_code:
+                self.code_idx.append(example["qas_id"])
+            else:
+                validated_translate_data.append(example)
+        METRICS.inc("filtered_examples_total", len(data) - len(validated_translate_data), filter="code")
 
         print(f"\nTotal data left after filtering for translation: {len(validated_translate_data)}\n")
         return validated_translate_data
 
     @timeit
-    def post_translate_validate(self, data, target_fields) -> None:
-        post_validated_translate_data = []
+    def dedup(self, data, target_fields, near_dedup: bool = False, threshold: float = 0.85):
+        representatives, representative_of = dedup_examples(data, target_fields, near_dedup=near_dedup,
+                                                            threshold=threshold)
+        self.duplicate_idx += list(representative_of.keys())
+        METRICS.inc("filtered_examples_total", len(representative_of), filter="duplicate")
+
+        print(f"\nTotal data left after deduplication: {len(representatives)}"
+              f" ({len(representative_of)} duplicates will reuse their representative's translation)\n")
+        return representatives, representative_of
+
+    @timeit
+    def post_translate_validate(self, data, target_fields, num_proc: int = None) -> None:
         # Note: This validates will override the original self.converted_data_translated
-        for idx, example in enumerate(tqdm(data, desc="Validating data after translation:")):
-            for key in target_fields:
-                if have_re_code(example[key], code=self.fail_translation_code):
-                    self.fail_idx.append(example["qas_id"])
-                    break
-                elif key == target_fields[-1]:
-                    post_validated_translate_data.append(example)
+        if not target_fields:
+            fail_flags = None
+        elif num_proc and num_proc > 1 and len(data) > num_proc:
+            fail_flags = self._flags_with_process_pool(_fail_flags_of_shard, data, num_proc,
+                                                       target_fields, self.fail_translation_code)
+        else:
+            fail_flags = _fail_flags_of_shard(tqdm(data, desc="Validating data after translation:"),
+                                              target_fields, self.fail_translation_code)
+
+        post_validated_translate_data = []
+        for example, failed in zip(data, fail_flags or []):
+            if failed:
+                self.fail_idx.append(example["qas_id"])
+            else:
+                post_validated_translate_data.append(example)
+        METRICS.inc("filtered_examples_total", len(data) - len(post_validated_translate_data),
+                    filter="fail_translation")
 
         print(f"\nTotal data left after filtering fail translation: {len(post_validated_translate_data)}\n")
         return post_validated_translate_data
 
-    def get_hf_data(self, data):
-        dataset = Dataset.from_list(data)
-        return dataset.sort("qas_id")
+    @timeit
+    def post_translate_validate_columnar(self, data, target_fields):
+        '''
+        Columnar post_translate_validate for a pyarrow Table or a HF Dataset, the fail translation code is searched
+        with pyarrow.compute kernels over whole columns instead of example by example.
+        Return the same type as data without the failed rows, their qas_id are recorded in self.fail_idx
+        '''
+        import numpy as np
+        import pyarrow as pa
+
+        is_table = isinstance(data, pa.Table)
+        # with_format("arrow") honours the indices mapping of a selected/shuffled Dataset
+        table = data if is_table else data.with_format("arrow")[:]
+        fail_mask = fail_translation_mask(table, target_fields, self.fail_translation_code) if target_fields \
+            else np.zeros(table.num_rows, dtype=bool)
+
+        failed_rows = np.flatnonzero(fail_mask)
+        if "qas_id" in table.column_names:
+            self.fail_idx += table.column("qas_id").take(pa.array(failed_rows, type=pa.int64())).to_pylist()
+        METRICS.inc("filtered_examples_total", len(failed_rows), filter="fail_translation")
+
+        keep_mask = ~fail_mask
+        validated = table.filter(pa.array(keep_mask)) if is_table else data.select(np.flatnonzero(keep_mask))
+        print(f"\nTotal data left after filtering fail translation: {int(keep_mask.sum())}\n")
+        return validated
+
+    def iter_translate(self,
+        data: Iterable[Dict],
+        all_fields,
+        target_fields: List[str],
+        source_lang: str = "en",
+        target_lang: str = "te",
+        do_not_translate_code = False,
+        max_example_per_thread = 400,
+        max_in_flight_chunks: int = 16,
+        max_retries: int = 3,
+        num_providers: int = None,
+        max_sub_task_threads: int = 16,
+        enable_batching: bool = True,
+        max_batch_chars: int = 4500,
+        max_batch_items: int = 100,
+        cache_path: str = None,
+        cache_max_size_bytes: int = 2 * 1024 ** 3,
+        requests_per_second: float = None,
+        chars_per_second: float = None,
+        adaptive_concurrency: bool = False,
+        segment_granularity: str = None,) -> Iterator[Dict]:
+        '''
+        Streaming counterpart of convert, data can be any iterable of dicts (e.g a streaming HF IterableDataset).
+        Examples flow through pre-validation, translation and post-validation as a generator, at most
+        max_in_flight_chunks chunks of max_example_per_thread examples are held in memory. Examples are yielded in
+        input order, a qas_id is assigned from the position in the stream if the example does not have one.
+        num_providers defaults to one provider instance per in-flight chunk and sub-task thread
+        '''
+        self.reset()
+
+        if cache_path and (self.cache is None or self.cache.path != cache_path):
+            self.cache = TranslationCache(cache_path, max_size_bytes=cache_max_size_bytes)
+        elif not cache_path:
+            self.cache = None
+
+        thread = TranslateThread(
+            all_fields = all_fields,
+            target_fields = target_fields,
+            source_lang = source_lang,
+            target_lang = target_lang,
+            max_example_per_thread = max_example_per_thread,
+            max_sub_task_threads = max_sub_task_threads,
+            enable_batching = enable_batching,
+            max_batch_chars = max_batch_chars,
+            max_batch_items = max_batch_items,
+            segment_granularity = segment_granularity,
+            translator = self.provider,
+            cache = self.cache,
+            rate_limiter = self.build_rate_limiter(requests_per_second, chars_per_second, adaptive_concurrency,
+                                                   max_concurrency=max_in_flight_chunks),
+            num_providers = num_providers if num_providers is not None else max_in_flight_chunks + max_sub_task_threads,
+            max_retries = max_retries,)
+
+        def validated_examples():
+            for position, example in enumerate(data):
+                example = dict(example)
+                example.setdefault("qas_id", position)
+                if do_not_translate_code and self._is_code_example(example, target_fields):
+                    self.code_idx.append(example["qas_id"])
+                    METRICS.inc("filtered_examples_total", filter="code")
+                    continue
+                yield example
+
+        def translate_chunk(chunk):
+            # Translate a copy so a retry always starts from the source texts
+            return thread.translate_converted(en_data=deepcopy(chunk))
+
+        # Closing the generator early (e.g a consumer that stops reading) still shuts the sub-task pool down
+        try:
+            with ThreadPoolExecutor(max_workers=max_in_flight_chunks) as executor:
+                in_flight = deque()
+                chunks = iter_chunks(validated_examples(), max_example_per_thread)
+
+                def submit_next() -> bool:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        return False
+                    in_flight.append((chunk, executor.submit(translate_chunk, chunk)))
+                    return True
+
+                while len(in_flight) < max_in_flight_chunks and submit_next():
+                    pass
+
+                # Results are consumed in submission order, a new chunk is only read once the oldest one is done
+                while in_flight:
+                    chunk, future = in_flight.popleft()
+                    translated_chunk = None
+                    for attempt in range(max_retries + 1):
+                        try:
+                            translated_chunk = future.result()
+                            break
+                        except Exception as e:
+                            tqdm.write(f"Streaming chunk failed with the following error: {e}."
+                                       f" Attempt {attempt + 1}/{max_retries + 1}")
+                            if attempt < max_retries:
+                                future = executor.submit(translate_chunk, chunk)
+
+                    if translated_chunk is None:
+                        self.fail_idx += [example["qas_id"] for example in chunk]
+                    else:
+                        for example in translated_chunk:
+                            if self._is_failed_example(example, target_fields):
+                                self.fail_idx.append(example["qas_id"])
+                                METRICS.inc("filtered_examples_total", filter="fail_translation")
+                            else:
+                                yield example
+                    submit_next()
+        finally:
+            thread.close()
+
+    def convert_stream(self,
+        data: Iterable[Dict],
+        all_fields,
+        target_fields: List[str],
+        output_dir: str,
+        shard_size: int = 10000,
+        schema = None,
+        **kwargs) -> List[str]:
+        '''
+        Translate a stream of examples and write the result incrementally to Parquet shards in output_dir, the
+        remaining keyword arguments are passed to iter_translate. schema is the optional pyarrow Schema of the shards,
+        inferred from the first shard if None. Return the paths of the written shards
+        '''
+        with ParquetShardWriter(output_dir, shard_size=shard_size, schema=schema) as writer:
+            writer.write_many(self.iter_translate(data, all_fields, target_fields, **kwargs))
+
+        print(f"Total data written: {writer.num_rows} rows in {len(writer.shard_paths)} shards")
+        return writer.shard_paths
+
+    def convert_sharded(self,
+        data,
+        all_fields,
+        target_fields: List[str],
+        work_dir: str,
+        num_shards: int,
+        shard_by: str = "hash",
+        lease_timeout: float = 600.0,
+        poll_interval: float = 5.0,
+        worker_id: str = None,
+        **kwargs) -> List[int]:
+        '''
+        Run this process as one worker of a sharded job: data is partitioned into num_shards shards by qas_id
+        (every worker must be given the same data), shards are claimed through leases in work_dir (a directory shared
+        by every worker, on one or more hosts) and each claimed shard is translated with convert(**kwargs) and
+        written to work_dir. Each shard is journaled, so a shard reclaimed from a dead worker resumes where it
+        stopped. Return the shards translated by this worker, build the dataset with merge_shards once all are done
+        '''
+        shards = assign_shards(data if isinstance(data, list) else list(data), num_shards, shard_by)
+        coordinator = LeaseCoordinator(work_dir, num_shards, lease_timeout=lease_timeout, worker_id=worker_id)
+
+        translated_shards = []
+        for shard_id in coordinator.iter_claims(poll_interval=poll_interval):
+            tqdm.write(f"Worker {coordinator.worker_id} translating shard {shard_id} ({len(shards[shard_id])} examples)")
+            with coordinator.heartbeat(shard_id) as heartbeat:
+                translated = self.convert(shards[shard_id], all_fields, target_fields,
+                                          checkpoint_path=coordinator.shard_path(shard_id, ".journal.jsonl"),
+                                          resume=True,
+                                          **kwargs)
+                # The lease expired while translating (e.g a long pause) and the shard now belongs to another
+                # worker, only the owner writes its output
+                if heartbeat.lost or not coordinator.renew(shard_id):
+                    tqdm.write(f"Worker {coordinator.worker_id} lost the lease of shard {shard_id},"
+                               f" its output is left to the new owner")
+                    METRICS.inc("shard_leases_lost_total")
+                    continue
+                write_shard_output(coordinator.shard_path(shard_id, ".jsonl"), translated,
+                                   {"code_idx": self.code_idx, "fail_idx": self.fail_idx,
+                                    "duplicate_idx": self.duplicate_idx},
+                                   worker_id=coordinator.worker_id)
+            coordinator.complete(shard_id)
+            METRICS.inc("shards_translated_total")
+            translated_shards.append(shard_id)
+        return translated_shards
+
+    def get_hf_data(self, data, sort_by_qas_id: bool = False):
+        # convert keeps the input order, sorting is only needed for data that was reordered by the caller
+        from datasets import Dataset
+
+        # A ColumnarRecords is wrapped as an Arrow table, without building a dict per row
+        dataset = Dataset(data.to_arrow()) if isinstance(data, ColumnarRecords) else Dataset.from_list(data)
+        return dataset.sort("qas_id") if sort_by_qas_id else dataset
         
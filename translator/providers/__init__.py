@@ -1,2 +1,15 @@
 from .base_provider import Provider
-from .google_provider import GoogleProvider
+from .rate_limiter import RateLimiter, TokenBucket, AdaptiveConcurrencyController
+from .pool import ProviderPool
+from .router_provider import RouterProvider, Backend
+
+
+def __getattr__(name):
+    # Concrete providers pull in their client library (e.g googletrans), so they are only imported on first access
+    if name == "GoogleProvider":
+        from .google_provider import GoogleProvider
+        return GoogleProvider
+    if name == "TranslatorsProvider":
+        from .translators_provider import TranslatorsProvider
+        return TranslatorsProvider
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
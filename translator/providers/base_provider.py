@@ -1,11 +1,21 @@
+import asyncio
+import functools
+from concurrent.futures import Executor
 from typing import Union, List
 from abc import ABC, abstractmethod
 
+from ..utils import ensure_internet, METRICS
+
 
 class Provider(ABC):
     """
     Base Provider that must be inherited by all Provider class, implement your own provider by inheriting this class
     """
+    # Optional RateLimiter shared by every instance of a job, assigned by the engine
+    rate_limiter = None
+    # Providers calling a remote API set this so a connectivity preflight runs before their first request
+    requires_internet = False
+
     @abstractmethod
     def __init__(self):
         self.translator = None
@@ -17,6 +27,27 @@ class Provider(ABC):
                       **kwargs) -> Union[str, List[str]]:
         raise NotImplemented(" The function _do_translate has not been implemented.")
 
+    def health_check(self) -> bool:
+        """
+        Return False if this instance can no longer be reused (e.g its HTTP client was closed), ProviderPool then
+        discards it and creates a new one. Must be cheap, it should not make a request
+        """
+        return self.translator is not None
+
+    def close(self) -> None:
+        """
+        Release the resources held by this instance (e.g its HTTP connections)
+        """
+        pass
+
+    @classmethod
+    def preflight(cls) -> None:
+        """
+        Connectivity check run before the first request of a provider that requires internet, the result is
+        cached for the process so it is only paid once
+        """
+        ensure_internet()
+
     def translate(self, input_data: Union[str, List[str]],
                   src: str, dest: str,
                   fail_translation_code: str="P1OP1_F") -> Union[str, List[str]]:
@@ -36,13 +67,35 @@ class Provider(ABC):
         if isinstance(input_data, list) and not all(isinstance(item, str) for item in input_data):
             raise TypeError("All elements of input_data list must be of type str")
 
+        if self.requires_internet:
+            self.preflight()
+
         # Ensure the translator is set
         assert self.translator, "Please assign the translator object instance to self.translator"
 
         # Perform the translation
-        translated_instance = self._do_translate(input_data,
-                                                 src=src, dest=dest,
-                                                 fail_translation_code=fail_translation_code)
+        def do_translate():
+            return self._do_translate(input_data,
+                                      src=src, dest=dest,
+                                      fail_translation_code=fail_translation_code)
+
+        provider_name = type(self).__name__
+        num_chars = len(input_data) if isinstance(input_data, str) else sum(len(item) for item in input_data)
+        METRICS.inc("provider_requests_total", provider=provider_name)
+        METRICS.inc("provider_chars_sent_total", num_chars, provider=provider_name)
+        try:
+            with METRICS.timer("provider_request_seconds", provider=provider_name):
+                if self.rate_limiter is not None:
+                    translated_instance = self.rate_limiter.call(do_translate, num_chars=num_chars)
+                else:
+                    translated_instance = do_translate()
+        except Exception:
+            METRICS.inc("provider_errors_total", provider=provider_name)
+            raise
+        METRICS.inc("provider_chars_received_total",
+                    len(translated_instance) if isinstance(translated_instance, str)
+                    else sum(len(item) for item in translated_instance),
+                    provider=provider_name)
 
         assert type(input_data) == type(translated_instance),\
             f" The function self._do_translate() return mismatch datatype from the input_data," \
@@ -50,4 +103,23 @@ class Provider(ABC):
 
         return translated_instance
 
-
+    async def translate_async(self, input_data: Union[str, List[str]],
+                              src: str, dest: str,
+                              fail_translation_code: str="P1OP1_F",
+                              executor: Executor = None) -> Union[str, List[str]]:
+        """
+        Asynchronous counterpart of translate, used by AsyncTranslateEngine.
+        The default implementation runs the blocking translate on executor (the loop's default executor if None),
+        AsyncTranslateEngine passes one sized to its max_concurrency. Providers with a native async client should
+        override this method
+        :param input_data: The input_data (Can be string or list of strings)
+        :param src: The source lang of input_data
+        :param dest: The target lang you want input_data to be translated
+        :param fail_translation_code: The code that can be use for unavoidable translation error and can be remove post translation
+        :param executor: The executor the blocking translate runs on
+        :return: str or list of str
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            executor, functools.partial(self.translate, input_data,
+                                        src=src, dest=dest,
+                                        fail_translation_code=fail_translation_code))
@@ -1,6 +1,4 @@
-import sys
 from typing import Union, List
-sys.path.insert(0, r'/')
 from googletrans import Translator
 from .base_provider import Provider
 
@@ -8,8 +6,22 @@ from .base_provider import Provider
 # https://github.com/ssut/py-googletrans
 # This is the best reliable provider, as this has access to API call instead of using the crawling method
 class GoogleProvider(Provider):
+    requires_internet = True
+
     def __init__(self):
-        self.translator = Translator()
+        # Without raise_exception a non-200 response (e.g a 429) returns the source text as its translation, it
+        # would skip the rate limiter's backoff and be cached as a success
+        self.translator = Translator(raise_exception=True)
+
+    def health_check(self) -> bool:
+        # googletrans keeps one httpx client per Translator, reusing it keeps the connections alive
+        client = getattr(self.translator, "client", None)
+        return self.translator is not None and not getattr(client, "is_closed", False)
+
+    def close(self) -> None:
+        client = getattr(self.translator, "client", None)
+        if client is not None and hasattr(client, "close"):
+            client.close()
 
     def extract_texts(self, obj):
         '''
@@ -51,7 +63,7 @@ class GoogleProvider(Provider):
         # TypeError likely due to gender-specific translation, which has no fix yet. Please refer to
         # ssut/py-googletrans#260 for more info
         except TypeError:
-            if data_type == "list": return [fail_translation_code, fail_translation_code]
+            if data_type == "list": return [fail_translation_code] * len(input_data)
             return fail_translation_code
 
 
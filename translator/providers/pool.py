@@ -0,0 +1,120 @@
+import threading
+import time
+
+from contextlib import contextmanager
+from typing import Type
+
+from .base_provider import Provider
+from ..utils import METRICS
+
+
+class ProviderPool():
+    '''
+    Thread-safe pool of provider instances. Instances are created lazily, at most max_size of them (unbounded if
+    None), and reused across requests so their HTTP client keeps its connections alive instead of paying a new TLS
+    handshake and token fetch for every chunk. An instance is health-checked when it was idle for longer than
+    health_check_interval and after a failed request, an unhealthy instance is discarded and recreated on demand
+    '''
+
+    def __init__(self,
+                 provider_class: Type[Provider],
+                 max_size: int = None,  # Maximum number of instances, acquire blocks when all of them are in use
+                 rate_limiter = None,  # Optional RateLimiter assigned to every instance
+                 health_check_interval: float = 300.0,  # Seconds an instance can stay idle before it is re-checked
+                 name: str = None):  # Label of the pool metrics, defaults to the provider class name
+        assert max_size is None or max_size > 0, "max_size must be a positive number"
+
+        self.provider_class = provider_class
+        self.max_size = max_size
+        self.rate_limiter = rate_limiter
+        self.health_check_interval = health_check_interval
+        self.name = name
+
+        self._idle = []  # [(provider, last_used)]
+        self._num_created = 0
+        self._condition = threading.Condition()
+
+    @property
+    def provider_name(self) -> str:
+        return self.name or getattr(self.provider_class, "__name__", type(self.provider_class).__name__)
+
+    @property
+    def size(self) -> int:
+        return self._num_created
+
+    def _create(self) -> Provider:
+        provider = self.provider_class()
+        if self.rate_limiter is not None:
+            provider.rate_limiter = self.rate_limiter
+        METRICS.inc("provider_instances_created_total", provider=self.provider_name)
+        return provider
+
+    def _discard(self, provider: Provider = None) -> None:
+        if provider is not None:
+            provider.close()
+        with self._condition:
+            self._num_created -= 1
+            self._condition.notify()
+        METRICS.inc("provider_instances_discarded_total", provider=self.provider_name)
+
+    def acquire(self, timeout: float = None) -> Provider:
+        '''
+        Borrow an instance, reusing an idle one when possible. Blocks while max_size instances are in use
+        '''
+        while True:
+            with self._condition:
+                while not self._idle and self.max_size is not None and self._num_created >= self.max_size:
+                    if not self._condition.wait(timeout):
+                        raise TimeoutError(f"No {self.provider_name} instance was released within {timeout} seconds")
+                if self._idle:
+                    provider, last_used = self._idle.pop()
+                else:
+                    # Reserve the slot under the lock, the instance itself is built outside of it
+                    self._num_created += 1
+                    provider, last_used = None, None
+
+            if provider is None:
+                try:
+                    return self._create()
+                except Exception:
+                    self._discard()
+                    raise
+            if time.monotonic() - last_used < self.health_check_interval or provider.health_check():
+                return provider
+            self._discard(provider)
+
+    def release(self, provider: Provider, healthy: bool = True) -> None:
+        '''
+        Give an instance back, an unhealthy one is dropped so its slot can be filled by a fresh instance
+        '''
+        if not healthy:
+            self._discard(provider)
+            return
+        with self._condition:
+            self._idle.append((provider, time.monotonic()))
+            self._condition.notify()
+
+    @contextmanager
+    def lease(self, timeout: float = None):
+        '''
+        with pool.lease() as provider: ... , the instance is health-checked before it is put back if the block raised
+        '''
+        provider = self.acquire(timeout)
+        try:
+            yield provider
+        except Exception:
+            self.release(provider, healthy=provider.health_check())
+            raise
+        else:
+            self.release(provider)
+
+    def close(self) -> None:
+        '''
+        Close and drop every idle instance, the pool stays usable and creates new instances on demand
+        '''
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._num_created -= len(idle)
+            self._condition.notify_all()
+        for provider, _ in idle:
+            provider.close()
@@ -0,0 +1,165 @@
+import random
+import re
+import threading
+import time
+
+from typing import Callable, Any
+
+from ..utils import METRICS
+
+
+_STATUS_CODE_PATTERN = re.compile(r'status code "?(\d{3})')
+
+
+class TokenBucket():
+    '''
+    Thread-safe token bucket, tokens refill continuously at rate per second up to capacity. Acquiring more tokens
+    than the capacity is allowed and puts the bucket in debt, so very long requests are delayed instead of rejected
+    '''
+
+    def __init__(self, rate: float, capacity: float = None):
+        assert rate > 0, "rate must be a positive number"
+
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self, amount: float = 1) -> float:
+        '''
+        Take amount tokens, block until the bucket is no longer in debt. Return the time spent waiting
+        '''
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            wait_time = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait_time > 0:
+            time.sleep(wait_time)
+        return wait_time
+
+
+class AdaptiveConcurrencyController():
+    '''
+    AIMD concurrency limit: the limit grows by one every `limit` successful requests under target_latency and is
+    multiplied by decrease_factor on an error or a slow request
+    '''
+
+    def __init__(self,
+                 initial_limit: int = 8,
+                 min_limit: int = 1,
+                 max_limit: int = 64,
+                 target_latency: float = 2.0,  # Seconds, slower requests count as a congestion signal
+                 decrease_factor: float = 0.7):
+        assert 0 < min_limit <= initial_limit <= max_limit, "Expected min_limit <= initial_limit <= max_limit"
+        assert 0 < decrease_factor < 1, "decrease_factor must be in (0, 1)"
+
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+
+        self.limit = float(initial_limit)
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency: float, success: bool) -> None:
+        with self._condition:
+            self.in_flight -= 1
+            if not success or latency > self.target_latency:
+                self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            METRICS.set_gauge("concurrency_limit", self.limit)
+            self._condition.notify_all()
+
+
+class RateLimiter():
+    '''
+    Shared rate limiting layer for providers: requests-per-second and characters-per-second token buckets,
+    exponential backoff with full jitter on throttling (429) and server (5xx) errors and an optional AIMD
+    concurrency controller. One instance is meant to be shared by every provider instance of a job
+    '''
+
+    def __init__(self,
+                 requests_per_second: float = None,
+                 chars_per_second: float = None,
+                 max_retries: int = 5,
+                 base_delay: float = 1.0,
+                 max_delay: float = 60.0,
+                 concurrency_controller: AdaptiveConcurrencyController = None):
+        self.request_bucket = TokenBucket(requests_per_second) if requests_per_second else None
+        # Allow one second worth of characters in a burst
+        self.char_bucket = TokenBucket(chars_per_second) if chars_per_second else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.concurrency_controller = concurrency_controller
+
+    @staticmethod
+    def get_status_code(error: Exception) -> int:
+        status_code = getattr(error, "status_code", None)
+        if status_code is None:
+            response = getattr(error, "response", None)
+            status_code = getattr(response, "status_code", None)
+        return status_code
+
+    @classmethod
+    def is_retryable(cls, error: Exception) -> bool:
+        status_code = cls.get_status_code(error)
+        if status_code is not None:
+            return status_code == 429 or status_code >= 500
+        if isinstance(error, (TimeoutError, ConnectionError)):
+            return True
+        message = str(error).lower()
+        # googletrans raises a bare Exception('Unexpected status code "503" from [...]')
+        match = _STATUS_CODE_PATTERN.search(message)
+        if match:
+            return int(match.group(1)) == 429 or int(match.group(1)) >= 500
+        return "429" in message or "too many requests" in message or "rate limit" in message
+
+    def backoff_delay(self, attempt: int) -> float:
+        # Full jitter, see https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, fn: Callable[[], Any], num_chars: int = 0) -> Any:
+        '''
+        Run fn once the budgets allow it, retrying throttling and server errors with backoff
+        '''
+        for attempt in range(self.max_retries + 1):
+            waited = 0.0
+            if self.request_bucket is not None:
+                waited += self.request_bucket.acquire(1)
+            if self.char_bucket is not None and num_chars:
+                waited += self.char_bucket.acquire(num_chars)
+            if waited:
+                METRICS.observe("rate_limiter_wait_seconds", waited)
+
+            if self.concurrency_controller is not None:
+                self.concurrency_controller.acquire()
+            start_time = time.perf_counter()
+            success = False
+            try:
+                result = fn()
+                success = True
+                return result
+            except Exception as e:
+                if attempt >= self.max_retries or not self.is_retryable(e):
+                    raise
+                delay = self.backoff_delay(attempt)
+                METRICS.inc("provider_retries_total", status=self.get_status_code(e) or type(e).__name__)
+            finally:
+                if self.concurrency_controller is not None:
+                    self.concurrency_controller.release(time.perf_counter() - start_time, success)
+            time.sleep(delay)
@@ -0,0 +1,167 @@
+import random
+import threading
+import time
+
+from typing import Union, List, Callable
+
+from .base_provider import Provider
+from .pool import ProviderPool
+from ..utils import METRICS
+
+
+class CircuitOpenError(ConnectionError):
+    '''
+    The backend's circuit is open and its trial request is taken or not due yet, the request was not sent
+    '''
+
+
+class Backend():
+    '''
+    One provider behind a RouterProvider, e.g an endpoint, an API key or a translators engine. A backend is shared by
+    every RouterProvider instance of a job, so its latency estimate, circuit breaker and instance pool are shared too
+    '''
+
+    def __init__(self,
+                 provider: Callable[[], Provider],  # Provider class or zero-argument factory (e.g functools.partial)
+                 name: str = None,
+                 weight: float = 1.0,  # Relative share of the traffic when latencies are equal
+                 rate_limiter = None,  # Optional RateLimiter of this backend's own quota
+                 max_instances: int = None,  # Maximum number of pooled provider instances (unbounded if None)
+                 failure_threshold: int = 5,  # Consecutive failures that open the circuit
+                 reset_timeout: float = 30.0,  # Seconds an open circuit waits before letting one trial request through
+                 latency_smoothing: float = 0.2):  # Weight of the newest sample in the latency EWMA
+        assert weight > 0, "weight must be a positive number"
+        assert 0 < latency_smoothing <= 1, "latency_smoothing must be in (0, 1]"
+
+        self.name = name or getattr(provider, "__name__", type(provider).__name__)
+        self.weight = weight
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.latency_smoothing = latency_smoothing
+        self.pool = ProviderPool(provider, max_size=max_instances, rate_limiter=rate_limiter, name=self.name)
+
+        self.latency = None  # EWMA of the request latency in seconds, None until the first success
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.opened_at = None  # When the circuit was opened, None while it is closed
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def available(self) -> bool:
+        '''
+        A closed circuit is always available, an open one lets a single trial request through after reset_timeout
+        '''
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            return not self._trial_in_flight and time.monotonic() - self.opened_at >= self.reset_timeout
+
+    def score(self, default_latency: float) -> float:
+        # Higher is better: more weight, lower latency and fewer requests already waiting on this backend
+        latency = self.latency if self.latency is not None else default_latency
+        return self.weight / (max(latency, 1e-3) * (1 + self.in_flight))
+
+    def translate(self, input_data: Union[str, List[str]], src: str, dest: str, fail_translation_code: str):
+        with self._lock:
+            # The circuit is checked and the trial slot claimed under the same lock, so concurrent callers that all
+            # saw an available backend can not all send a trial request to a backend that is still failing
+            is_trial = self.opened_at is not None
+            if is_trial:
+                if self._trial_in_flight or time.monotonic() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError(f"The circuit of backend {self.name} is open")
+                self._trial_in_flight = True
+            self.in_flight += 1
+        start_time = time.perf_counter()
+        success = False
+        try:
+            with self.pool.lease() as provider:
+                result = provider.translate(input_data, src=src, dest=dest,
+                                            fail_translation_code=fail_translation_code)
+            success = True
+            return result
+        finally:
+            self._record(time.perf_counter() - start_time, success, is_trial)
+
+    def _record(self, latency: float, success: bool, is_trial: bool = False) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if is_trial:
+                self._trial_in_flight = False
+            if success:
+                self.latency = latency if self.latency is None else \
+                    self.latency_smoothing * latency + (1 - self.latency_smoothing) * self.latency
+                self.consecutive_failures = 0
+                self.opened_at = None
+            else:
+                self.consecutive_failures += 1
+                if self.opened_at is not None or self.consecutive_failures >= self.failure_threshold:
+                    # A failed trial request keeps the circuit open for another reset_timeout
+                    self.opened_at = time.monotonic()
+            METRICS.set_gauge("router_circuit_open", int(self.opened_at is not None), backend=self.name)
+
+
+class RouterProvider(Provider):
+    '''
+    Spread requests over several backends by weight and measured latency. A backend that keeps failing has its
+    circuit opened and is skipped until a trial request succeeds, a failed request is re-routed to the next best
+    backend so one throttled quota does not stall the job.
+    The engines instantiate providers without arguments, use RouterProvider.build(backends) (or
+    functools.partial(RouterProvider, backends=backends)) to get a provider class bound to shared backends
+    '''
+    backends = None
+
+    def __init__(self, backends: List[Backend] = None):
+        backends = backends if backends is not None else type(self).backends
+        assert backends, "RouterProvider needs at least one Backend"
+        self.backends = backends
+        self.translator = backends
+
+    @classmethod
+    def build(cls, backends: List[Backend], name: str = "RouterProvider"):
+        '''
+        Return a RouterProvider subclass bound to backends, name is also the provider name used by the cache
+        '''
+        return type(name, (cls,), {"backends": backends})
+
+    def health_check(self) -> bool:
+        return any(backend.available() for backend in self.backends)
+
+    def close(self) -> None:
+        # The backends and their pools are shared by every instance, they outlive this one
+        pass
+
+    def _ranked_backends(self) -> List[Backend]:
+        '''
+        Available backends in the order they should be tried, the first one is drawn at random proportionally to
+        its score so the traffic is spread instead of always hitting the fastest backend
+        '''
+        candidates = [backend for backend in self.backends if backend.available()]
+        if not candidates:
+            return []
+        measured = [backend.latency for backend in candidates if backend.latency is not None]
+        # Unmeasured backends are scored with the mean latency of the measured ones so they get explored
+        default_latency = sum(measured) / len(measured) if measured else 1.0
+        scores = {backend: backend.score(default_latency) for backend in candidates}
+        first = random.choices(candidates, weights=[scores[backend] for backend in candidates])[0]
+        return [first] + sorted((backend for backend in candidates if backend is not first),
+                                key=lambda backend: scores[backend], reverse=True)
+
+    def _do_translate(self, input_data: Union[str, List[str]],
+                      src: str, dest: str,
+                      fail_translation_code:str = "P1OP1_F",
+                      **kwargs) -> Union[str, List[str]]:
+        last_error = None
+        for attempt, backend in enumerate(self._ranked_backends()):
+            if attempt:
+                METRICS.inc("router_failovers_total", backend=backend.name)
+            try:
+                return backend.translate(input_data, src=src, dest=dest, fail_translation_code=fail_translation_code)
+            except Exception as e:
+                last_error = e
+        if last_error is not None:
+            raise last_error
+        raise ConnectionError("Every backend of the RouterProvider has an open circuit")
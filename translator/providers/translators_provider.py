@@ -0,0 +1,40 @@
+from typing import Union, List
+import translators as ts
+from .base_provider import Provider
+
+
+# https://github.com/UlionTse/translators
+# Crawls the public web endpoints of many services (bing, alibaba, baidu, ...), each one has its own quota
+class TranslatorsProvider(Provider):
+    requires_internet = True
+
+    def __init__(self, engine: str = "bing"):
+        self.engine = engine
+        self.translator = ts
+
+    def _do_translate(self, input_data: Union[str, List[str]],
+                      src: str, dest: str,
+                      fail_translation_code:str = "P1OP1_F", # Pass in this code to replace the input_data if the exception is *unavoidable*, any example that contain this will be remove post translation
+                      **kwargs) -> Union[str, List[str]]:
+        """
+        translators.translate_text(query_text, translator, from_language, to_language, **kwargs)
+            The web endpoints have no batch API, a list is translated one string at a time
+        """
+
+        if isinstance(input_data, list):
+            return [self._do_translate(text, src=src, dest=dest, fail_translation_code=fail_translation_code)
+                    for text in input_data]
+
+        if not input_data.strip():
+            return input_data
+        translated_text = self.translator.translate_text(input_data,
+                                                         translator=self.engine,
+                                                         from_language=src,
+                                                         to_language=dest)
+        return translated_text if isinstance(translated_text, str) else fail_translation_code
+
+
+if __name__ == '__main__':
+    test = TranslatorsProvider()
+    print(test.translate(["Hello", "How are you today ?"], src="en", dest="vi"))
+    print(test.translate("Hello", src="en", dest="vi"))
@@ -0,0 +1,156 @@
+from collections.abc import MutableMapping
+from typing import Dict, List, Iterable, Iterator
+
+
+_UNSET = object()
+
+
+class Row(MutableMapping):
+    '''
+    Dict-like view of one row of a ColumnarRecords, the engines read and write it like an example dict. Reads come
+    from the written columns first and fall back to the source columns, writes go to a preallocated written column
+    so the source data is never copied or modified. A list read from a target field is copied into its written
+    column first, so in-place updates of the list are kept
+    '''
+    __slots__ = ("_records", "_idx")
+
+    def __init__(self, records: "ColumnarRecords", idx: int):
+        self._records = records
+        self._idx = idx
+
+    def __getitem__(self, key):
+        records = self._records
+        written = records.written.get(key)
+        if written is not None:
+            value = written[self._idx]
+            if value is not _UNSET:
+                return value
+        value = records.source_value(key, self._idx)
+        if written is not None and isinstance(value, list):
+            value = written[self._idx] = list(value)
+        return value
+
+    def __setitem__(self, key, value) -> None:
+        self._records.column_for_write(key)[self._idx] = value
+
+    def __delitem__(self, key) -> None:
+        raise TypeError("Fields of a columnar row can not be deleted")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._records.fields)
+
+    def __len__(self) -> int:
+        return len(self._records.fields)
+
+    def __contains__(self, key) -> bool:
+        return key in self._records.field_set
+
+    def __repr__(self) -> str:
+        return f"Row({dict(self)!r})"
+
+    def __reduce__(self):
+        # Pickled (e.g to a ProcessPoolExecutor worker) or deep-copied as a plain dict snapshot
+        return (dict, (dict(self),))
+
+
+class ColumnarRecords():
+    '''
+    Columnar store of examples: source fields are kept as the columns they came in (Python lists, or Arrow
+    columns read without copying) and every written field (the translations) goes to a column preallocated for all
+    rows. Rows are Row views of two slots instead of one dict per example
+    '''
+
+    def __init__(self, columns: Dict[str, object], num_rows: int, writable_fields: Iterable[str] = ()):
+        self.columns = columns
+        self.num_rows = num_rows
+        self.fields = list(columns.keys())
+        self.field_set = set(self.fields)
+        self.written = {}
+        self.order = None  # Row indices of this view, None for every row in order
+        for key in writable_fields:
+            self.column_for_write(key)
+
+    @classmethod
+    def from_data(cls, data, fields: List[str], writable_fields: Iterable[str] = ()) -> "ColumnarRecords":
+        '''
+        Build from a list of dicts, a pyarrow Table or a HF Dataset. A qas_id column is added from the row index
+        if there is none
+        '''
+        fields = list(fields) if "qas_id" in fields else list(fields) + ["qas_id"]
+        if isinstance(data, list):
+            present = data[0].keys() if data else ()
+            columns = {key: [example.get(key) for example in data] for key in fields if key in present}
+            num_rows = len(data)
+        else:
+            import pyarrow as pa
+
+            # with_format("arrow") honours the indices mapping of a selected/shuffled Dataset
+            table = data if isinstance(data, pa.Table) else data.with_format("arrow")[:]
+            columns = {key: table.column(key) for key in fields if key in table.column_names}
+            num_rows = table.num_rows
+        if "qas_id" not in columns:
+            columns["qas_id"] = range(num_rows)
+        return cls(columns, num_rows, writable_fields=writable_fields)
+
+    def source_value(self, key, idx: int):
+        column = self.columns.get(key, _UNSET)
+        if column is _UNSET:
+            raise KeyError(key)
+        value = column[idx]
+        # Arrow columns return scalars, only the accessed value is converted to Python
+        return value.as_py() if hasattr(value, "as_py") else value
+
+    def column_for_write(self, key) -> list:
+        written = self.written.get(key)
+        if written is None:
+            written = self.written[key] = [_UNSET] * self.num_rows
+            if key not in self.field_set:
+                self.fields.append(key)
+                self.field_set.add(key)
+        return written
+
+    def rows(self) -> List[Row]:
+        indices = self.order if self.order is not None else range(self.num_rows)
+        return [Row(self, idx) for idx in indices]
+
+    def __len__(self) -> int:
+        return len(self.order) if self.order is not None else self.num_rows
+
+    def __iter__(self) -> Iterator[Row]:
+        return iter(self.rows())
+
+    def select(self, rows: Iterable[Row]) -> "ColumnarRecords":
+        '''
+        A view of the given rows of this store in their order, the columns are shared
+        '''
+        view = ColumnarRecords.__new__(ColumnarRecords)
+        view.__dict__.update(self.__dict__)
+        view.order = [row._idx for row in rows]
+        return view
+
+    def column(self, key) -> list:
+        '''
+        Values of one field for the rows of this view, as a Python list
+        '''
+        rows = self.rows()
+        return [row[key] for row in rows]
+
+    def to_list(self) -> List[Dict]:
+        return [dict(row) for row in self.rows()]
+
+    def to_arrow(self):
+        '''
+        pyarrow Table of this view, the unwritten Arrow columns are gathered with take() without a round trip through
+        Python objects
+        '''
+        import pyarrow as pa
+
+        indices = self.order if self.order is not None else range(self.num_rows)
+        arrays = {}
+        for key in self.fields:
+            source = self.columns.get(key)
+            if key not in self.written and isinstance(source, (pa.Array, pa.ChunkedArray)):
+                arrays[key] = source.take(pa.array(indices, type=pa.int64())) if self.order is not None else source
+            else:
+                arrays[key] = pa.array(self.column(key))
+        return pa.table(arrays)
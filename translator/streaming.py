@@ -0,0 +1,96 @@
+import os
+
+from itertools import islice
+from typing import Iterable, Iterator, List, Dict
+
+
+def iter_chunks(iterable: Iterable, chunk_size: int) -> Iterator[List]:
+    '''
+    Lazily group an iterable into lists of at most chunk_size items
+    '''
+    assert chunk_size > 0, "chunk_size must be a positive number"
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _has_null_type(data_type) -> bool:
+    import pyarrow as pa
+
+    if pa.types.is_null(data_type):
+        return True
+    if pa.types.is_list(data_type) or pa.types.is_large_list(data_type):
+        return _has_null_type(data_type.value_type)
+    if pa.types.is_struct(data_type):
+        return any(_has_null_type(data_type.field(idx).type) for idx in range(data_type.num_fields))
+    return False
+
+
+class ParquetShardWriter():
+    '''
+    Write examples incrementally to numbered Parquet shards of at most shard_size rows, only one shard is held in
+    memory at a time. Every shard is written with the same schema so the shards can be read together: the given
+    schema, or the one inferred from the first shard. A field that was only empty so far (null or list<null>) takes
+    its type from the first shard that has a value, the shards written before read as that type
+    '''
+
+    def __init__(self, output_dir: str, shard_size: int = 10000, prefix: str = "translated", schema = None):
+        assert shard_size > 0, "shard_size must be a positive number"
+
+        self.output_dir = output_dir
+        self.shard_size = shard_size
+        self.prefix = prefix
+        self.schema = schema  # Optional pyarrow Schema of the shards
+
+        self.shard_paths = []
+        self.num_rows = 0
+        self._buffer = []
+
+        os.makedirs(output_dir, exist_ok=True)
+
+    def write(self, example: Dict) -> None:
+        self._buffer.append(example)
+        if len(self._buffer) >= self.shard_size:
+            self.flush()
+
+    def write_many(self, examples: Iterable[Dict]) -> None:
+        for example in examples:
+            self.write(example)
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        path = os.path.join(self.output_dir, f"{self.prefix}-{len(self.shard_paths):05d}.parquet")
+        if self.schema is not None and not any(_has_null_type(field.type) for field in self.schema):
+            table = pa.Table.from_pylist(self._buffer, schema=self.schema)
+        else:
+            table = pa.Table.from_pylist(self._buffer)
+            if self.schema is not None:
+                inferred = table.schema
+                self.schema = pa.schema([inferred.field(field.name)
+                                         if _has_null_type(field.type) and field.name in inferred.names
+                                         and not _has_null_type(inferred.field(field.name).type) else field
+                                         for field in self.schema])
+                table = pa.Table.from_pylist(self._buffer, schema=self.schema)
+            else:
+                self.schema = table.schema
+        pq.write_table(table, path)
+        self.shard_paths.append(path)
+        self.num_rows += len(self._buffer)
+        self._buffer = []
+
+    def close(self) -> List[str]:
+        self.flush()
+        return self.shard_paths
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -1,2 +1,5 @@
 from .super_call_wrapper import force_super_call, ForceBaseCallMeta
-from .utils import timeit, have_internet
\ No newline at end of file
+from .metrics import METRICS, MetricsRegistry
+from .utils import timeit, have_internet, ensure_internet
+from .planner import plan_chunks, example_size
+from .segmenter import segment_text, join_segments, SEGMENT_GRANULARITIES
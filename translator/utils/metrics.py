@@ -0,0 +1,176 @@
+import json
+import threading
+import time
+
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+
+
+# Seconds, suited to provider round-trips and per-stage timings
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+# Sizes, suited to items or characters per request
+SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000)
+
+
+class Histogram():
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * (len(self.buckets) + 1)  # The last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> Dict:
+        cumulative = 0
+        buckets = {}
+        for bound, bucket_count in zip(list(self.buckets) + [float("inf")], self.bucket_counts):
+            cumulative += bucket_count
+            buckets["+Inf" if bound == float("inf") else repr(bound)] = cumulative
+        return {"count": self.count, "sum": self.sum, "buckets": buckets}
+
+
+class MetricsRegistry():
+    '''
+    In-process counters, gauges and histograms with labels. Every update is a dict lookup under one lock so it is
+    cheap enough to leave on in production, set enabled = False to turn every update into a no-op.
+    Exposed as a JSON snapshot or in the Prometheus text format, optionally over HTTP with serve()
+    '''
+
+    def __init__(self, namespace: str = "translator"):
+        self.namespace = namespace
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._buckets = {}
+
+    @staticmethod
+    def _key(name: str, labels: Dict) -> Tuple:
+        return (name, tuple(sorted((key, str(value)) for key, value in labels.items())))
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self._buckets.get(name, DEFAULT_BUCKETS))
+            histogram.observe(value)
+
+    def set_buckets(self, name: str, buckets: Tuple[float, ...]) -> None:
+        '''
+        Use buckets instead of DEFAULT_BUCKETS for the histograms of name created from now on
+        '''
+        with self._lock:
+            self._buckets[name] = tuple(buckets)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start_time, **labels)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters = {}
+            self._gauges = {}
+            self._histograms = {}
+
+    def snapshot(self) -> Dict:
+        def entries(metrics, value_fn):
+            result = {}
+            for (name, labels), value in sorted(metrics.items()):
+                result.setdefault(name, []).append({"labels": dict(labels), "value": value_fn(value)})
+            return result
+
+        with self._lock:
+            return {"counters": entries(self._counters, lambda value: value),
+                    "gauges": entries(self._gauges, lambda value: value),
+                    "histograms": entries(self._histograms, lambda histogram: histogram.snapshot())}
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot())
+
+    def to_prometheus(self) -> str:
+        def format_labels(labels, extra=None):
+            items = list(labels.items()) + (list(extra.items()) if extra else [])
+            if not items:
+                return ""
+            return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+        snapshot = self.snapshot()
+        lines = []
+        for kind, prometheus_type in (("counters", "counter"), ("gauges", "gauge")):
+            for name, samples in snapshot[kind].items():
+                full_name = f"{self.namespace}_{name}"
+                lines.append(f"# TYPE {full_name} {prometheus_type}")
+                for sample in samples:
+                    lines.append(f"{full_name}{format_labels(sample['labels'])} {sample['value']}")
+        for name, samples in snapshot["histograms"].items():
+            full_name = f"{self.namespace}_{name}"
+            lines.append(f"# TYPE {full_name} histogram")
+            for sample in samples:
+                histogram = sample["value"]
+                for bound, cumulative in histogram["buckets"].items():
+                    lines.append(f"{full_name}_bucket{format_labels(sample['labels'], {'le': bound})} {cumulative}")
+                lines.append(f"{full_name}_sum{format_labels(sample['labels'])} {histogram['sum']}")
+                lines.append(f"{full_name}_count{format_labels(sample['labels'])} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = 9100, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+        '''
+        Serve /metrics (Prometheus text format) and /metrics.json from a daemon thread, call .shutdown() on the
+        returned server to stop it
+        '''
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics.json"):
+                    body, content_type = registry.to_json(), "application/json"
+                elif self.path.startswith("/metrics"):
+                    body, content_type = registry.to_prometheus(), "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+                body = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+# Process wide registry used by the engines, providers, cache and filters
+METRICS = MetricsRegistry()
@@ -0,0 +1,45 @@
+import heapq
+import math
+
+from typing import List, Dict
+
+
+def example_size(example: Dict, target_fields: List[str]) -> int:
+    '''
+    Number of characters of an example that will be sent for translation
+    '''
+    size = 0
+    for key in target_fields:
+        value = example.get(key)
+        if isinstance(value, str):
+            size += len(value)
+        elif isinstance(value, list):
+            size += sum(len(item) for item in value if isinstance(item, str))
+    return size
+
+
+def plan_chunks(examples: List[Dict], target_fields: List[str], max_example_per_thread: int) -> List[List[int]]:
+    '''
+    Split examples into the same number of chunks as fixed max_example_per_thread splitting, balanced by
+    character count with longest-processing-time-first bin packing: examples are taken from the longest to the
+    shortest and each one goes to the chunk with the least characters so far.
+    Return the example indices of each chunk (in input order within a chunk), the heaviest chunk first so the
+    longest work is scheduled first
+    '''
+    num_chunks = math.ceil(len(examples) / max_example_per_thread)
+    if num_chunks <= 1:
+        return [list(range(len(examples)))] if examples else []
+
+    sizes = [example_size(example, target_fields) for example in examples]
+    # (load, chunk_idx) so ties go to the lowest chunk index, which keeps the plan deterministic
+    loads = [(0, chunk_idx) for chunk_idx in range(num_chunks)]
+    chunks = [[] for _ in range(num_chunks)]
+    for example_idx in sorted(range(len(examples)), key=lambda idx: sizes[idx], reverse=True):
+        load, chunk_idx = heapq.heappop(loads)
+        chunks[chunk_idx].append(example_idx)
+        # Counting each example as one extra character keeps empty examples spread across chunks
+        heapq.heappush(loads, (load + sizes[example_idx] + 1, chunk_idx))
+
+    chunk_loads = {chunk_idx: load for load, chunk_idx in loads}
+    ordered_chunk_idx = sorted(range(num_chunks), key=lambda chunk_idx: chunk_loads[chunk_idx], reverse=True)
+    return [sorted(chunks[chunk_idx]) for chunk_idx in ordered_chunk_idx if chunks[chunk_idx]]
@@ -0,0 +1,66 @@
+from concurrent.futures import Executor, wait, FIRST_COMPLETED
+from typing import Callable, List, Dict, Any
+
+from tqdm.auto import tqdm
+
+from .metrics import METRICS
+
+
+def run_with_retries(executor: Executor,
+                     fn: Callable[[Any], Any],
+                     tasks: List[Any],
+                     max_retries: int = 3,
+                     max_in_flight: int = None,
+                     on_result: Callable[[int, Any], None] = None,
+                     desc: str = "Task",
+                     task: str = "task") -> List[Dict]:
+    '''
+    Run fn(task) for every task on executor and wait with concurrent.futures.wait(FIRST_COMPLETED), so the
+    calling thread sleeps until a future finishes instead of polling. A failed task is resubmitted at most
+    max_retries times and only once its previous attempt finished, so a result is never reported twice.
+    on_result(task_idx, result) is called on the calling thread as results arrive. At most max_in_flight tasks are
+    submitted at a time (all of them if None). desc is only used in logs, task labels the metrics and must come
+    from a small fixed set (e.g "chunk", "sub_task") to keep the number of series bounded.
+    Return the dead-letter list of tasks that still failed after max_retries, as {"idx", "task", "error"} dicts
+    '''
+    max_in_flight = max_in_flight or len(tasks)
+    attempts = [0] * len(tasks)
+    dead_letter = []
+    in_flight = {}
+    next_idx = 0
+
+    def submit(task_idx):
+        in_flight[executor.submit(fn, tasks[task_idx])] = task_idx
+
+    while next_idx < len(tasks) and len(in_flight) < max_in_flight:
+        submit(next_idx)
+        next_idx += 1
+
+    while in_flight:
+        METRICS.set_gauge("scheduler_in_flight", len(in_flight), task=task)
+        METRICS.set_gauge("scheduler_queued", len(tasks) - next_idx, task=task)
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            task_idx = in_flight.pop(future)
+            error = future.exception()
+            if error is None:
+                if on_result is not None:
+                    on_result(task_idx, future.result())
+            elif attempts[task_idx] < max_retries:
+                attempts[task_idx] += 1
+                METRICS.inc("task_retries_total", task=task)
+                tqdm.write(f"{desc} {task_idx} failed with the following error: {error}."
+                           f" Retrying ({attempts[task_idx]}/{max_retries})")
+                submit(task_idx)
+            else:
+                tqdm.write(f"{desc} {task_idx} failed {max_retries + 1} times with the following error: {error}."
+                           f" Moving it to the dead-letter list")
+                dead_letter.append({"idx": task_idx, "task": tasks[task_idx], "error": error})
+                METRICS.inc("dead_letter_total", task=task)
+
+        while next_idx < len(tasks) and len(in_flight) < max_in_flight:
+            submit(next_idx)
+            next_idx += 1
+
+    METRICS.set_gauge("scheduler_in_flight", 0, task=task)
+    return dead_letter
@@ -0,0 +1,81 @@
+import re
+
+from typing import List, Tuple
+
+
+SEGMENT_GRANULARITIES = ("sentence", "paragraph", None)
+
+# A sentence ends with . ? or ! followed by whitespace (not after abbreviations like e.g. or Mr.), a paragraph ends
+# at a line break. The separator is captured so it can be put back verbatim
+_BOUNDARY_PATTERN = re.compile(r'((?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=[.?!])\s+|\s*\n\s*)')
+_LAST_WHITESPACE_PATTERN = re.compile(r'\s+(?=\S*$)')
+
+
+def _hard_split(text: str, max_chars: int) -> Tuple[List[str], List[str]]:
+    '''
+    Split a sentence longer than max_chars at its last whitespace under the limit (or at the limit if there is none)
+    '''
+    pieces, separators = [], []
+    while len(text) > max_chars:
+        match = _LAST_WHITESPACE_PATTERN.search(text[:max_chars + 1])
+        cut = match.start() if match and match.start() > 0 else max_chars
+        pieces.append(text[:cut])
+        rest = text[cut:]
+        text = rest.lstrip()
+        separators.append(rest[:len(rest) - len(text)])
+    pieces.append(text)
+    return pieces, separators
+
+
+def segment_text(text: str,
+                 max_segment_chars: int = 15000,
+                 granularity: str = None) -> Tuple[List[str], List[str]]:
+    '''
+    Split text into segments that are translated (and cached) on their own, at sentence or paragraph granularity.
+    With granularity None the text is only split when it is longer than max_segment_chars. No segment is longer
+    than max_segment_chars.
+    Return (segments, glue) with len(glue) == len(segments) + 1, glue holds the original whitespace around and
+    between the segments so join_segments(segments, glue) == text
+    '''
+    assert granularity in SEGMENT_GRANULARITIES, f"granularity must be one of {SEGMENT_GRANULARITIES}"
+    assert max_segment_chars > 0, "max_segment_chars must be a positive number"
+
+    body = text.strip()
+    if not body:
+        return [], [text]
+    prefix = text[:len(text) - len(text.lstrip())]
+    suffix = text[len(text.rstrip()):]
+
+    parts = _BOUNDARY_PATTERN.split(body)
+    segments, separators = [], []
+    for idx, piece in enumerate(parts[0::2]):
+        if idx:
+            separators.append(parts[2 * idx - 1])
+        pieces, piece_separators = _hard_split(piece, max_segment_chars)
+        segments.extend(pieces)
+        separators.extend(piece_separators)
+
+    def mergeable(separator: str) -> bool:
+        if granularity == "sentence":
+            return False
+        if granularity == "paragraph":
+            return "\n" not in separator
+        return True
+
+    merged_segments, glue = [segments[0]], [prefix]
+    for segment, separator in zip(segments[1:], separators):
+        if mergeable(separator) and len(merged_segments[-1]) + len(separator) + len(segment) <= max_segment_chars:
+            merged_segments[-1] += separator + segment
+        else:
+            merged_segments.append(segment)
+            glue.append(separator)
+    glue.append(suffix)
+    return merged_segments, glue
+
+
+def join_segments(segments: List[str], glue: List[str]) -> str:
+    '''
+    Inverse of segment_text, segments may be the translated segments
+    '''
+    assert len(glue) == len(segments) + 1, f"Expected {len(segments) + 1} glue strings but got {len(glue)}"
+    return glue[0] + "".join(segment + separator for segment, separator in zip(segments, glue[1:]))
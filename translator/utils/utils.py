@@ -1,8 +1,8 @@
-import sys
 import time
 import socket
-sys.path.insert(0,r'./')
-from functools import wraps
+from functools import wraps, lru_cache
+
+from .metrics import METRICS
 
 
 def timeit(func):
@@ -12,6 +12,7 @@ def timeit(func):
         result = func(*args, **kwargs)
         end_time = time.perf_counter()
         total_time = end_time - start_time
+        METRICS.observe("stage_seconds", total_time, stage=func.__name__)
         print(f'Function {func.__name__} Took {total_time:.4f} seconds')
 
         return result
@@ -25,9 +26,25 @@ def have_internet(host="8.8.8.8", port=53, timeout=3) -> bool:
     Service: domain (DNS/TCP)
     """
     try:
-        socket.setdefaulttimeout(timeout)
-        socket.socket(socket.AF_INET, socket.SOCK_STREAM).connect((host, port))
-        return True
-    except socket.error as ex:
+        # The timeout only applies to this socket, the process wide default timeout is left untouched
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError as ex:
         print(ex)
         return False
+
+
+@lru_cache(maxsize=None)
+def _cached_internet_check(host: str, port: int, timeout: float) -> bool:
+    if not have_internet(host=host, port=port, timeout=timeout):
+        # Raising keeps a failed check out of the cache so the next call tries again
+        raise ConnectionError("Please provide internet connection as this script require external api calls")
+    return True
+
+
+def ensure_internet(host="8.8.8.8", port=53, timeout=5) -> None:
+    """
+    Explicit connectivity preflight, the first successful check is cached for the rest of the process
+    """
+    _cached_internet_check(host, port, timeout)
+